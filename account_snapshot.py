@@ -0,0 +1,101 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# fetcher(exchange) -> {'total_balance', 'unrealized_pnl', 'positions', ...}，失败时返回None或抛出异常
+AccountFetcher = Callable[[str], Optional[Dict[str, Any]]]
+
+
+class AccountSnapshotService:
+    """
+    账户快照服务
+
+    后台线程按固定间隔刷新各交易所的余额和持仓，接口只读取内存中的最新快照，
+    响应时间与交易所延迟无关，多个页面同时刷新也不会增加API调用。
+    用户数据流等推送来源可以通过update直接写入快照。
+    """
+
+    def __init__(self, fetcher: AccountFetcher, interval: Optional[float] = None):
+        """
+        Args:
+            fetcher: 拉取单个交易所账户信息的函数
+            interval: 刷新间隔秒数（默认读取 ACCOUNT_REFRESH_INTERVAL，缺省10）
+        """
+        self.fetcher = fetcher
+        self.interval = interval or float(os.getenv('ACCOUNT_REFRESH_INTERVAL', '10'))
+        self.snapshots: Dict[str, Dict[str, Any]] = {}
+        self.exchanges = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def track(self, exchange: str):
+        """开始刷新指定交易所（首次调用时立即刷新）"""
+        exchange = exchange.lower()
+        with self.lock:
+            if exchange in self.exchanges:
+                return
+            self.exchanges.add(exchange)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._loop, name='account-snapshot', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def get(self, exchange: str) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """
+        最新快照及其时长
+
+        Returns:
+            (账户信息, 距上次成功刷新的秒数)，尚无快照时为 (None, None)
+        """
+        exchange = exchange.lower()
+        self.track(exchange)
+        with self.lock:
+            snapshot = self.snapshots.get(exchange)
+        if not snapshot or snapshot.get('data') is None:
+            return None, None
+        return snapshot['data'], time.time() - snapshot['updated_at']
+
+    def update(self, exchange: str, data: Dict[str, Any]):
+        """写入一份新快照（后台刷新或推送）"""
+        with self.lock:
+            snapshot = self.snapshots.setdefault(exchange.lower(), {})
+            snapshot.update({'data': data, 'updated_at': time.time(), 'error': None})
+
+    def refresh(self, exchange: str):
+        """立即刷新一次，失败时保留上一份快照并记录错误"""
+        try:
+            data = self.fetcher(exchange)
+            if data is None:
+                raise Exception("No account data returned")
+            self.update(exchange, data)
+        except Exception as e:
+            logger.error(f"Account snapshot refresh failed for {exchange}: {str(e)}")
+            with self.lock:
+                snapshot = self.snapshots.setdefault(exchange, {})
+                snapshot.update({'error': str(e), 'error_at': time.time()})
+
+    def _loop(self):
+        while True:
+            self.wakeup.clear()
+            with self.lock:
+                exchanges = list(self.exchanges)
+            for exchange in exchanges:
+                self.refresh(exchange)
+            self.wakeup.wait(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """各交易所快照的时长及最近一次错误"""
+        now = time.time()
+        with self.lock:
+            return {
+                exchange: {
+                    'age': now - snapshot['updated_at'] if snapshot.get('updated_at') else None,
+                    'error': snapshot.get('error')
+                }
+                for exchange, snapshot in self.snapshots.items()
+            }
@@ -1,13 +1,12 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import json
 import pandas as pd
 import plotly
 import plotly.graph_objs as go
-from binance.client import Client
 import requests
 import hmac
 import hashlib
@@ -15,8 +14,24 @@ import time
 import logging
 import subprocess
 import signal
+import atexit
+import base64
+import csv
+import io
 from functools import lru_cache, wraps
-from trading_bot_manager import trading_bot_manager
+from trading_bot_manager import TradingBotManager
+from strategy_bot import StrategyBot
+from exchange_api import ExchangeAPI
+from kline_cache import kline_cache
+from candle_store import get_candle_store
+from lbank_trading.lbank_client import lbank_client
+from rate_limiter import get_rate_limiter, RateLimitExceeded
+from client_registry import client_registry
+from account_snapshot import AccountSnapshotService
+from persistence_queue import PersistenceQueue
+import pnl_rollup
+from db_config import get_database_url, engine_options, configure_sqlite
+from sqlalchemy import event
 from flask_migrate import Migrate
 from urllib.parse import urlencode
 
@@ -44,6 +59,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# LBank REST请求和Binance公开行情请求经过共享限流器
+get_rate_limiter('lbank').mount(lbank_client.session, pool_maxsize=lbank_client.pool_size)
+binance_public_session = requests.Session()
+get_rate_limiter('binance').mount(binance_public_session)
+
 def api_response(data=None, success=True, error=None, message=None, status_code=200):
     """统一的API响应格式"""
     response = {
@@ -89,10 +109,10 @@ def get_high_frequency_trading_status():
         # 获取当前交易所
         exchange = os.getenv('CURRENT_EXCHANGE', 'binance')
         
-        # 获取账户信息
-        account_info = get_account_balance(exchange)
+        # 获取账户快照
+        account_info, snapshot_age = account_snapshots.get(exchange)
         if not account_info:
-            raise Exception("Failed to get account information")
+            raise Exception("Account snapshot not available yet")
             
         # 获取市场状态
         market_state = analyze_market_conditions('BTCUSDT')  # 默认使用BTCUSDT
@@ -105,10 +125,13 @@ def get_high_frequency_trading_status():
             strategy='high_frequency'
         ).order_by(TradeHistory.timestamp.desc()).limit(10).all()
         
-        # 计算统计数据
+        # 统计最近10笔交易（未平仓的盈亏为空，按0计）
         total_trades = len(trades)
-        winning_trades = sum(1 for trade in trades if trade.pnl > 0)
-        total_profit = sum(trade.pnl for trade in trades)
+        winning_trades = sum(1 for trade in trades if (trade.pnl or 0) > 0)
+        total_profit = sum(trade.pnl or 0 for trade in trades)
+        
+        # 累计统计读取盈亏汇总表
+        all_time = pnl_stats(exchange=exchange, strategy='high_frequency')
         
         # 获取当前信号
         current_signal = None
@@ -121,11 +144,19 @@ def get_high_frequency_trading_status():
             'winning_trades': winning_trades,
             'win_rate': (winning_trades / total_trades * 100) if total_trades > 0 else 0,
             'total_profit': total_profit,
+            'all_time': {
+                'total_trades': all_time['total_trades'],
+                'winning_trades': all_time['winning_trades'],
+                'win_rate': all_time['win_rate'],
+                'total_profit': all_time['total_pnl'],
+                'max_drawdown': all_time['max_drawdown']
+            },
             'market_state': market_state,
             'account_info': {
                 'total_balance': account_info['total_balance'],
-                'available_balance': account_info['available_balance'],
-                'unrealized_pnl': account_info['unrealized_pnl']
+                'available_balance': account_info.get('available_balance', account_info['total_balance']),
+                'unrealized_pnl': account_info['unrealized_pnl'],
+                'snapshot_age': snapshot_age
             },
             'current_signal': current_signal,
             'recent_trades': [
@@ -186,57 +217,31 @@ def validate_params(*required_params):
 
 # Binance客户端获取函数
 def get_binance_client():
+    """获取缓存的Binance客户端：优先使用APIKey表中的活跃密钥，没有时使用环境变量"""
     try:
-        logger.info("Attempting to create Binance client...")
-        api_key = os.getenv('BINANCE_API_KEY')
-        api_secret = os.getenv('BINANCE_API_SECRET')
+        key = APIKey.query.filter_by(exchange='Binance', is_active=True).first()
+        if key:
+            api_key, api_secret = key.api_key, key.api_secret
+        else:
+            api_key = os.getenv('BINANCE_API_KEY')
+            api_secret = os.getenv('BINANCE_API_SECRET')
         
         if not api_key or not api_secret:
-            logger.error("Binance API credentials not found in environment variables")
-            raise ValueError("Binance API credentials not found in environment variables")
-        
-        logger.info("Creating Binance client with provided credentials...")
-        client = Client(api_key, api_secret)
+            logger.error("Binance API credentials not found")
+            raise ValueError("Binance API credentials not found")
         
-        # 测试API连接
-        try:
-            logger.info("Testing API connection...")
-            # 添加重试机制
-            max_retries = 3
-            retry_delay = 2  # 初始延迟2秒
-            
-            for attempt in range(max_retries):
-                try:
-                    client.get_account()
-                    logger.info("Successfully connected to Binance API")
-                    return client
-                except Exception as e:
-                    error_msg = str(e).lower()
-                    if "restricted location" in error_msg:
-                        logger.warning("Binance API is restricted in this location, but keeping the key active")
-                        # 返回一个特殊的客户端对象，标记为受限
-                        client.is_restricted = True
-                        return client
-                    else:
-                        if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                            wait_time = retry_delay * (2 ** attempt)  # 指数退避
-                            logger.warning(f"Attempt {attempt + 1} failed, waiting {wait_time} seconds before retry: {str(e)}")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            logger.error(f"Failed to connect to Binance API after {max_retries} attempts: {str(e)}")
-                            raise e
-        except Exception as e:
-            logger.error(f"Error testing API connection: {str(e)}")
-            raise e
+        # 客户端按密钥缓存复用，连通性由注册表在后台检查
+        return client_registry.get('binance', api_key, api_secret)
                 
     except Exception as e:
-        logger.error(f"Error creating Binance client: {str(e)}")
+        logger.error(f"Error getting Binance client: {str(e)}")
         raise
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///trading.db'
+# 数据库：默认本地SQLite（WAL），设置 DATABASE_URL 可切换到Postgres
+app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Add custom Jinja2 filter for parsing JSON strings
@@ -262,6 +267,12 @@ class APIKey(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
+@event.listens_for(APIKey, 'after_update')
+@event.listens_for(APIKey, 'after_delete')
+def invalidate_exchange_client(mapper, connection, target):
+    """密钥被修改或删除后丢弃缓存的客户端，下次使用时按新密钥重建"""
+    client_registry.invalidate(target.exchange)
+
 # 交易历史模型
 class TradeHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -276,9 +287,18 @@ class TradeHistory(db.Model):
     status = db.Column(db.String(20), nullable=False)  # OPEN, CLOSED, CANCELLED
     strategy = db.Column(db.String(20))
     strategy_params = db.Column(db.String(255))
-    pnl = db.Column(db.Float)  # 盈亏金额
+    # 盈亏金额；修改时加载旧值，汇总表据此撤回旧盈亏
+    pnl = db.column_property(db.Column(db.Float), active_history=True)
     pnl_percentage = db.Column(db.Float)  # 盈亏百分比
 
+    # 热点查询：按交易所/策略/机器人筛选并按时间排序，按时间范围统计
+    __table_args__ = (
+        db.Index('ix_trade_history_exchange_timestamp', 'exchange', 'timestamp'),
+        db.Index('ix_trade_history_strategy_timestamp', 'strategy', 'timestamp'),
+        db.Index('ix_trade_history_bot_id_timestamp', 'bot_id', 'timestamp'),
+        db.Index('ix_trade_history_timestamp', 'timestamp'),
+    )
+
 # 交易机器人配置模型
 class TradingBotConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -292,7 +312,11 @@ class TradingBotConfig(db.Model):
     stop_loss = db.Column(db.Float, nullable=False)  # 止损比例
     take_profit = db.Column(db.Float, nullable=False)  # 止盈比例
     max_daily_trades = db.Column(db.Integer, nullable=False)  # 每日最大交易次数
-    status = db.Column(db.String(20), default='STOPPED')  # 运行状态：RUNNING/STOPPED
+    status = db.Column(db.String(20), default='STOPPED')  # 运行状态：RUNNING/STOPPED/ERROR/STALLED
+    desired_status = db.Column(db.String(20), default='STOPPED')  # 目标状态：RUNNING/STOPPED，由监督器执行
+    heartbeat_at = db.Column(db.DateTime)  # 最近一次完成step的时间
+    last_error = db.Column(db.Text)  # 最近一次错误
+    restart_count = db.Column(db.Integer, default=0)  # 异常退出后的重启次数
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -304,8 +328,85 @@ class TradingBotLog(db.Model):
     details = db.Column(db.Text)  # 详细信息
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_trading_bot_log_bot_id_created_at', 'bot_id', 'created_at'),
+    )
+
+# 盈亏汇总模型：按 (机器人, 策略, 交易所, 交易对, 小时/日) 预聚合，由TradeHistory写入时增量更新
+class PnlRollup(db.Model):
+    __tablename__ = 'pnl_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket = db.Column(db.DateTime, nullable=False)  # 桶开始时间（UTC）
+    bot_id = db.Column(db.Integer, nullable=False, default=0)  # 0 表示手动交易
+    strategy = db.Column(db.String(20), nullable=False, default='')  # 空串表示无策略
+    exchange = db.Column(db.String(20), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    trades = db.Column(db.Integer, nullable=False, default=0)  # 交易笔数
+    closed = db.Column(db.Integer, nullable=False, default=0)  # 已计入盈亏的笔数
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    losses = db.Column(db.Integer, nullable=False, default=0)
+    pnl_sum = db.Column(db.Float, nullable=False, default=0.0)
+    gross_profit = db.Column(db.Float, nullable=False, default=0.0)
+    gross_loss = db.Column(db.Float, nullable=False, default=0.0)
+    pnl_peak = db.Column(db.Float, nullable=False, default=0.0)  # 桶内累计盈亏最高点
+    pnl_trough = db.Column(db.Float, nullable=False, default=0.0)  # 桶内累计盈亏最低点
+    max_drawdown = db.Column(db.Float, nullable=False, default=0.0)  # 桶内最大回撤
+
+    __table_args__ = (
+        db.UniqueConstraint('period', 'bucket', 'bot_id', 'strategy', 'exchange', 'symbol',
+                            name='uq_pnl_rollup_key'),
+        db.Index('ix_pnl_rollup_exchange_strategy', 'period', 'exchange', 'strategy', 'bucket'),
+        db.Index('ix_pnl_rollup_bot_id', 'period', 'bot_id', 'bucket'),
+    )
+
+def rollup_trade_values(trade):
+    return {
+        'timestamp': trade.timestamp or datetime.utcnow(),
+        'bot_id': trade.bot_id,
+        'strategy': trade.strategy,
+        'exchange': trade.exchange,
+        'symbol': trade.symbol
+    }
+
+@event.listens_for(TradeHistory, 'after_insert')
+def rollup_trade_insert(mapper, connection, target):
+    """新交易记录计入汇总（与交易记录在同一事务中）"""
+    pnl_rollup.record_trade(connection, PnlRollup.__table__, rollup_trade_values(target),
+                            opened=True, pnl=target.pnl)
+
+@event.listens_for(TradeHistory, 'after_update')
+def rollup_trade_update(mapper, connection, target):
+    """平仓或修改盈亏时更新汇总"""
+    history = db.inspect(target).attrs.pnl.history
+    if not history.has_changes():
+        return
+    previous_pnl = history.deleted[0] if history.deleted else None
+    pnl_rollup.record_trade(connection, PnlRollup.__table__, rollup_trade_values(target),
+                            pnl=target.pnl, previous_pnl=previous_pnl)
+
+def pnl_stats(period='day', start=None, end=None, **filters):
+    """
+    从盈亏汇总表读取统计（胜率、总盈亏、最大回撤等），耗时与桶数成正比
+
+    Args:
+        period: 使用的桶粒度 hour/day
+        start, end: 时间范围 [start, end)
+        filters: bot_id / strategy / exchange / symbol
+    """
+    query = db.session.query(PnlRollup.bucket, *[getattr(PnlRollup, field) for field in pnl_rollup.BUCKET_FIELDS]) \
+        .filter(PnlRollup.period == period)
+    for name, value in filters.items():
+        query = query.filter(getattr(PnlRollup, name) == value)
+    if start is not None:
+        query = query.filter(PnlRollup.bucket >= start)
+    if end is not None:
+        query = query.filter(PnlRollup.bucket < end)
+    return pnl_rollup.summarize(row._asdict() for row in query.order_by(PnlRollup.bucket))
+
 # 创建数据库表
 with app.app_context():
+    configure_sqlite(db.engine)
     db.create_all()
     
     # 检查是否需要添加默认API密钥
@@ -357,6 +458,103 @@ with app.app_context():
             logger.error(f"Error updating API key status: {str(e)}")
             db.session.rollback()
 
+# 交易记录和机器人日志异步批量写入，交易线程不等待数据库提交
+PERSISTED_MODELS = {
+    'trade_history': TradeHistory,
+    'trading_bot_log': TradingBotLog
+}
+
+def write_persisted_rows(rows):
+    """在一个事务中写入一批记录"""
+    with app.app_context():
+        try:
+            db.session.add_all([PERSISTED_MODELS[table](**values) for table, values in rows])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+# 后台写入线程在第一次写入时启动
+persistence_queue = PersistenceQueue(write_persisted_rows)
+atexit.register(persistence_queue.stop)
+
+def record_trade_history(**values):
+    """
+    异步写入交易记录，返回尚未持久化的记录对象
+
+    入队前先填入列的默认值（如timestamp），返回对象与写入数据库的记录一致；
+    id在写入数据库后才分配，返回对象的id为None。
+    """
+    for column in TradeHistory.__table__.columns:
+        if column.name not in values and column.default is not None and not column.primary_key:
+            default = column.default
+            values[column.name] = default.arg(None) if default.is_callable else default.arg
+    persistence_queue.put('trade_history', values)
+    return TradeHistory(**values)
+
+def log_bot_action(bot_id, action, details=None):
+    """异步写入机器人运行记录"""
+    persistence_queue.put('trading_bot_log', {
+        'bot_id': bot_id,
+        'action': action,
+        'details': details,
+        'created_at': datetime.utcnow()
+    })
+
+def utc_day_range(day=None):
+    """某一天（UTC，默认今天）的半开时间区间 [开始, 结束)，用于按时间范围走索引查询"""
+    day_start = datetime.combine(day or datetime.utcnow().date(), datetime.min.time())
+    return day_start, day_start + timedelta(days=1)
+
+# 交易记录分页：按 (timestamp, id) 倒序的游标分页，不做COUNT也没有OFFSET，任意深度的页耗时相同；
+# timestamp为空的记录排在最后，按id倒序，游标中时间部分留空
+MAX_PAGE_SIZE = 500
+
+def encode_trade_cursor(trade):
+    """由一页的最后一条记录生成下一页游标"""
+    timestamp = trade.timestamp.isoformat() if trade.timestamp is not None else ''
+    raw = f"{timestamp}|{trade.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_trade_cursor(cursor):
+    """解析游标，返回 (timestamp, id)，timestamp为空的记录返回 (None, id)，格式错误时抛出ValueError"""
+    try:
+        timestamp, trade_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(trade_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def paginate_trades(query, cursor=None, limit=50):
+    """
+    对TradeHistory查询做游标分页
+
+    Returns:
+        (本页记录, 下一页游标)，没有更多记录时游标为None
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    timestamp, trade_id = decode_trade_cursor(cursor) if cursor else (None, None)
+    untimed = query.filter(TradeHistory.timestamp.is_(None)).order_by(TradeHistory.id.desc())
+
+    if cursor and timestamp is None:
+        # 已翻到timestamp为空的记录
+        rows = untimed.filter(TradeHistory.id < trade_id).limit(limit + 1).all()
+    else:
+        timed = query.filter(TradeHistory.timestamp.isnot(None))
+        if cursor:
+            # 行值比较让索引从游标位置开始扫描；冗余的 timestamp <= 条件供不支持行值范围扫描的索引
+            # （如Postgres上不含id的 (exchange, timestamp) 索引）限定起点
+            timed = timed.filter(
+                TradeHistory.timestamp <= timestamp,
+                db.tuple_(TradeHistory.timestamp, TradeHistory.id) < (timestamp, trade_id)
+            )
+        rows = timed.order_by(TradeHistory.timestamp.desc(), TradeHistory.id.desc()).limit(limit + 1).all()
+        if len(rows) <= limit:
+            # 有时间戳的记录已取完，用timestamp为空的记录补足本页
+            rows += untimed.limit(limit + 1 - len(rows)).all()
+
+    next_cursor = encode_trade_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
 # 添加全局变量来跟踪交易机器人进程
 trading_bot_process = None
 
@@ -422,16 +620,18 @@ def dashboard():
 @log_request
 def trades():
     try:
-        page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor')
         per_page = 10
         
-        # 获取所有交易记录
-        trades = TradeHistory.query.order_by(TradeHistory.timestamp.desc()).paginate(
-            page=page, per_page=per_page, error_out=False)
+        # 获取交易记录（游标分页）
+        try:
+            trades, next_cursor = paginate_trades(TradeHistory.query, cursor, per_page)
+        except ValueError:
+            trades, next_cursor = paginate_trades(TradeHistory.query, None, per_page)
         
         # 处理交易记录数据
         processed_trades = []
-        for trade in trades.items:
+        for trade in trades:
             trade_dict = {
                 'id': trade.id,
                 'exchange': trade.exchange,
@@ -451,7 +651,7 @@ def trades():
         
         return render_template('trades.html', 
                              trades=processed_trades,
-                             pagination=trades)
+                             next_cursor=next_cursor)
     except Exception as e:
         logger.error(f"Error in trades route: {str(e)}")
         flash('获取交易记录失败', 'danger')
@@ -661,8 +861,15 @@ def get_trades():
         # 获取当前选择的交易所
         exchange = os.getenv('CURRENT_EXCHANGE', 'binance')
         
-        # 获取最近的50条交易记录，按交易所过滤
-        trades = TradeHistory.query.filter_by(exchange=exchange).order_by(TradeHistory.timestamp.desc()).limit(50).all()
+        # 按交易所过滤，游标分页（默认每页50条）
+        try:
+            trades, next_cursor = paginate_trades(
+                TradeHistory.query.filter_by(exchange=exchange),
+                request.args.get('cursor'),
+                request.args.get('limit', 50, type=int)
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         # 处理交易记录
         trade_list = []
@@ -684,7 +891,8 @@ def get_trades():
         return jsonify({
             'success': True,
             'data': {
-                'trades': trade_list
+                'trades': trade_list,
+                'next_cursor': next_cursor
             }
         })
     except Exception as e:
@@ -694,6 +902,78 @@ def get_trades():
             'error': '获取交易记录失败'
         })
 
+# 导出的列
+EXPORT_COLUMNS = ['id', 'bot_id', 'exchange', 'symbol', 'side', 'position_type', 'price', 'quantity',
+                  'timestamp', 'status', 'strategy', 'strategy_params', 'pnl', 'pnl_percentage']
+
+@app.route('/api/trades/export')
+@handle_errors
+def export_trades():
+    """
+    流式导出交易记录（NDJSON或CSV）
+
+    参数: format=ndjson|csv，可选 exchange、strategy、bot_id、start、end（YYYY-MM-DD，含end当天）。
+    逐批从数据库游标读取并边读边写，导出全部历史时内存占用不随记录数增长。
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return api_response(success=False, error=f"Unsupported format: {export_format}", status_code=400)
+
+    query = db.session.query(*[getattr(TradeHistory, column) for column in EXPORT_COLUMNS])
+    if request.args.get('exchange'):
+        query = query.filter(TradeHistory.exchange == request.args['exchange'])
+    if request.args.get('strategy'):
+        query = query.filter(TradeHistory.strategy == request.args['strategy'])
+    if request.args.get('bot_id'):
+        query = query.filter(TradeHistory.bot_id == request.args.get('bot_id', type=int))
+    try:
+        if request.args.get('start'):
+            start, _ = utc_day_range(datetime.strptime(request.args['start'], '%Y-%m-%d').date())
+            query = query.filter(TradeHistory.timestamp >= start)
+        if request.args.get('end'):
+            _, end = utc_day_range(datetime.strptime(request.args['end'], '%Y-%m-%d').date())
+            query = query.filter(TradeHistory.timestamp < end)
+    except ValueError as e:
+        return api_response(success=False, error=str(e), status_code=400)
+
+    rows = query.order_by(TradeHistory.timestamp, TradeHistory.id) \
+        .execution_options(stream_results=True).yield_per(1000)
+
+    def serialize(row):
+        values = dict(zip(EXPORT_COLUMNS, row))
+        values['timestamp'] = values['timestamp'].isoformat() if values['timestamp'] else None
+        return values
+
+    def generate_ndjson():
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(serialize(row), ensure_ascii=False))
+            if len(lines) >= 1000:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(serialize(row))
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f"trades_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    generate, mimetype = (generate_csv, 'text/csv') if export_format == 'csv' else (generate_ndjson, 'application/x-ndjson')
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/chart-data')
 @handle_errors
 @log_request
@@ -708,7 +988,7 @@ def chart_data():
         
         # 获取Binance交易数据
         if config['binance_api_key'] and config['binance_api_secret']:
-            client = Client(config['binance_api_key'], config['binance_api_secret'])
+            client = client_registry.get('binance', config['binance_api_key'], config['binance_api_secret'])
             trades = client.futures_account_trades()
             
             # 处理交易数据
@@ -840,15 +1120,22 @@ def check_api_keys():
         for key in active_keys:
             try:
                 if key.exchange == 'Binance':
+                    # 新建客户端时注册表已同步检查过一次，之后由后台线程定期检查，这里只读取结果
                     try:
-                        client = Client(key.api_key, key.api_secret)
-                        client.get_account()
+                        client = client_registry.get('binance', key.api_key, key.api_secret)
                     except Exception as e:
                         if "restricted location" in str(e).lower():
                             logger.warning("Binance API is restricted in this location, but keeping the key active")
                             continue
-                        else:
-                            raise e
+                        elif getattr(e, 'status_code', None) in (418, 429):
+                            raise RateLimitExceeded(str(e))
+                        raise
+                    if getattr(client, 'is_restricted', False):
+                        logger.warning("Binance API is restricted in this location, but keeping the key active")
+                        continue
+                    healthy, error = client_registry.health('binance', key.api_key)
+                    if healthy is False:
+                        raise Exception(error)
                 elif key.exchange == 'LBank':
                     timestamp = str(int(time.time() * 1000))
                     params = {
@@ -861,44 +1148,26 @@ def check_api_keys():
                         raise Exception("Failed to generate LBank signature")
                     params['sign'] = sign
                     
-                    # 添加错误处理和重试逻辑
-                    max_retries = 3
-                    retry_delay = 2  # 初始延迟2秒
-                    for attempt in range(max_retries):
-                        try:
-                            # 使用正确的 API 端点
-                            response = requests.get('https://api.lbank.info/v2/user/info', params=params)
-                            
-                            # 处理429错误（请求频率限制）
-                            if response.status_code == 429:
-                                if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                                    wait_time = retry_delay * (2 ** attempt)  # 指数退避
-                                    logger.warning(f"Rate limit hit, waiting {wait_time} seconds before retry")
-                                    time.sleep(wait_time)
-                                    continue
-                                else:
-                                    raise Exception("Rate limit exceeded after all retries")
-                            
-                            response.raise_for_status()  # 检查其他HTTP错误
-                            
-                            # 尝试解析JSON响应
-                            try:
-                                data = response.json()
-                                if data.get('error_code') != 0:  # LBank API 使用 error_code 表示错误
-                                    raise Exception(f"LBank API error: {data.get('error_code', 'Unknown error')}")
-                                break  # 如果成功，跳出重试循环
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to parse LBank API response: {response.text}")
-                                if attempt == max_retries - 1:  # 最后一次尝试
-                                    raise Exception("Invalid LBank API response format")
-                                continue
-                                
-                        except requests.RequestException as e:
-                            if attempt == max_retries - 1:  # 最后一次尝试
-                                raise Exception(f"LBank API request failed: {str(e)}")
-                            time.sleep(retry_delay * (2 ** attempt))  # 指数退避
-                            continue
+                    # 使用正确的 API 端点
+                    response = lbank_client.get('user/info', params=params)
+                    
+                    # 请求频率限制：限流器已记录并暂停后续请求，密钥本身不作废
+                    if response.status_code == 429:
+                        raise RateLimitExceeded("LBank rate limit hit while checking API key")
+                    response.raise_for_status()  # 检查其他HTTP错误
+                    
+                    # 尝试解析JSON响应
+                    try:
+                        data = response.json()
+                    except json.JSONDecodeError:
+                        logger.error(f"Failed to parse LBank API response: {response.text}")
+                        raise Exception("Invalid LBank API response format")
+                    if data.get('error_code') != 0:  # LBank API 使用 error_code 表示错误
+                        raise Exception(f"LBank API error: {data.get('error_code', 'Unknown error')}")
                             
+            except RateLimitExceeded as e:
+                logger.warning(f"Skipping API key check for {key.exchange}: {str(e)}")
+                continue
             except Exception as e:
                 logger.error(f"Invalid API key for {key.exchange}: {str(e)}")
                 key.is_active = False
@@ -969,8 +1238,8 @@ def execute_trade(exchange, symbol, side, quantity, price, strategy=None, strate
         # 确定交易方向（做多/做空）
         position_type = 'LONG' if side == 'BUY' else 'SHORT'
         
-        # 创建交易记录
-        trade = TradeHistory(
+        # 创建交易记录（异步写入）
+        trade = record_trade_history(
             bot_id=bot_id,
             exchange=exchange,
             symbol=symbol,
@@ -982,8 +1251,6 @@ def execute_trade(exchange, symbol, side, quantity, price, strategy=None, strate
             strategy=strategy,
             strategy_params=json.dumps(strategy_params)
         )
-        db.session.add(trade)
-        db.session.commit()
         
         # 记录日志
         strategy_name = STRATEGY_NAMES.get(strategy, '手动')
@@ -1011,10 +1278,15 @@ def strategy_logs():
 @app.route('/api/strategy-logs')
 def get_strategy_logs():
     try:
-        # 从交易历史中获取策略相关的交易记录
-        trades = TradeHistory.query.filter(
-            TradeHistory.strategy.isnot(None)
-        ).order_by(TradeHistory.timestamp.desc()).limit(100).all()
+        # 从交易历史中获取策略相关的交易记录（游标分页，默认每页100条）
+        try:
+            trades, next_cursor = paginate_trades(
+                TradeHistory.query.filter(TradeHistory.strategy.isnot(None)),
+                request.args.get('cursor'),
+                request.args.get('limit', 100, type=int)
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         logs = []
         for trade in trades:
@@ -1031,7 +1303,8 @@ def get_strategy_logs():
         
         return jsonify({
             'success': True,
-            'logs': logs
+            'logs': logs,
+            'next_cursor': next_cursor
         })
     except Exception as e:
         logger.error(f"Error getting strategy logs: {str(e)}")
@@ -1043,7 +1316,7 @@ def get_strategy_logs():
 def get_account_balance(exchange='Binance'):
     """获取账户余额和持仓信息"""
     try:
-        if exchange == 'Binance':
+        if exchange.lower() == 'binance':
             logger.info("Attempting to get Binance account balance...")
             client = get_binance_client()
             
@@ -1056,53 +1329,38 @@ def get_account_balance(exchange='Binance'):
                     'positions': []
                 }
             
-            # 添加重试机制
-            max_retries = 3
-            retry_delay = 2  # 初始延迟2秒
+            # 请求频率由共享限流器控制，这里不再休眠重试
+            logger.info("Getting futures account info...")
+            # 获取合约账户信息
+            futures_account = client.futures_account()
+            logger.info("Successfully retrieved futures account info")
             
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Attempt {attempt + 1} to get futures account info...")
-                    # 获取合约账户信息
-                    futures_account = client.futures_account()
-                    logger.info("Successfully retrieved futures account info")
-                    
-                    # 计算总权益和未实现盈亏
-                    total_balance = float(futures_account['totalWalletBalance'])
-                    unrealized_pnl = float(futures_account['totalUnrealizedProfit'])
-                    
-                    # 获取持仓信息
-                    positions = []
-                    for position in futures_account['positions']:
-                        if float(position['positionAmt']) != 0:  # 只显示有持仓的
-                            positions.append({
-                                'symbol': position['symbol'],
-                                'amount': float(position['positionAmt']),
-                                'entry_price': float(position['entryPrice']),
-                                'mark_price': float(position['markPrice']),
-                                'unrealized_pnl': float(position['unRealizedProfit']),
-                                'leverage': float(position['leverage']),
-                                'side': 'LONG' if float(position['positionAmt']) > 0 else 'SHORT'
-                            })
-                    
-                    logger.info(f"Successfully processed account data. Total balance: {total_balance}, Unrealized PNL: {unrealized_pnl}, Positions: {len(positions)}")
-                    return {
-                        'total_balance': total_balance,
-                        'unrealized_pnl': unrealized_pnl,
-                        'positions': positions
-                    }
-                    
-                except Exception as e:
-                    logger.error(f"Error in attempt {attempt + 1}: {str(e)}")
-                    if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                        wait_time = retry_delay * (2 ** attempt)  # 指数退避
-                        logger.warning(f"Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        raise e
+            # 计算总权益和未实现盈亏
+            total_balance = float(futures_account['totalWalletBalance'])
+            unrealized_pnl = float(futures_account['totalUnrealizedProfit'])
+            
+            # 获取持仓信息
+            positions = []
+            for position in futures_account['positions']:
+                if float(position['positionAmt']) != 0:  # 只显示有持仓的
+                    positions.append({
+                        'symbol': position['symbol'],
+                        'amount': float(position['positionAmt']),
+                        'entry_price': float(position['entryPrice']),
+                        'mark_price': float(position['markPrice']),
+                        'unrealized_pnl': float(position['unRealizedProfit']),
+                        'leverage': float(position['leverage']),
+                        'side': 'LONG' if float(position['positionAmt']) > 0 else 'SHORT'
+                    })
+            
+            logger.info(f"Successfully processed account data. Total balance: {total_balance}, Unrealized PNL: {unrealized_pnl}, Positions: {len(positions)}")
+            return {
+                'total_balance': total_balance,
+                'unrealized_pnl': unrealized_pnl,
+                'positions': positions
+            }
             
-        elif exchange == 'LBank':
+        elif exchange.lower() == 'lbank':
             logger.info("Attempting to get LBank account balance...")
             api_key = APIKey.query.filter_by(exchange='LBank', is_active=True).first()
             if not api_key:
@@ -1117,73 +1375,77 @@ def get_account_balance(exchange='Binance'):
             sign = generate_lbank_sign(params, api_key.api_secret)
             params['sign'] = sign
             
-            # 添加重试机制
-            max_retries = 3
-            retry_delay = 2  # 初始延迟2秒
+            # 获取合约账户信息
+            response = lbank_client.get('user/contract_account', params=params)
             
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Attempt {attempt + 1} to get LBank account info...")
-                    # 获取合约账户信息
-                    response = requests.get('https://api.lbank.info/v2/user/contract_account', params=params)
-                    
-                    # 处理429错误（请求频率限制）
-                    if response.status_code == 429:
-                        if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                            wait_time = retry_delay * (2 ** attempt)  # 指数退避
-                            logger.warning(f"Rate limit hit, waiting {wait_time} seconds before retry")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception("Rate limit exceeded after all retries")
-                    
-                    response.raise_for_status()  # 检查其他HTTP错误
-                    
-                    data = response.json()
-                    if not data['result']:
-                        raise Exception("Failed to get LBank account data")
-                    
-                    account_data = data['data']
-                    
-                    # 获取持仓信息
-                    positions_response = requests.get('https://api.lbank.info/v2/user/contract_position', params=params)
-                    positions_data = positions_response.json()
-                    
-                    positions = []
-                    if positions_data['result']:
-                        for position in positions_data['data']:
-                            if float(position['amount']) != 0:  # 只显示有持仓的
-                                positions.append({
-                                    'symbol': position['symbol'],
-                                    'amount': float(position['amount']),
-                                    'entry_price': float(position['entry_price']),
-                                    'mark_price': float(position['mark_price']),
-                                    'unrealized_pnl': float(position['unrealized_pnl']),
-                                    'leverage': float(position['leverage']),
-                                    'side': 'LONG' if position['side'] == 'buy' else 'SHORT'
-                                })
-                    
-                    logger.info(f"Successfully processed LBank account data. Total balance: {account_data['total_balance']}, Positions: {len(positions)}")
-                    return {
-                        'total_balance': float(account_data['total_balance']),
-                        'unrealized_pnl': float(account_data['unrealized_pnl']),
-                        'positions': positions
-                    }
-                    
-                except Exception as e:
-                    logger.error(f"Error in attempt {attempt + 1}: {str(e)}")
-                    if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                        wait_time = retry_delay * (2 ** attempt)  # 指数退避
-                        logger.warning(f"Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        raise e
+            # 请求频率限制：限流器已按Retry-After暂停后续请求
+            if response.status_code == 429:
+                raise RateLimitExceeded("LBank rate limit hit")
+            
+            response.raise_for_status()  # 检查其他HTTP错误
+            
+            data = response.json()
+            if not data['result']:
+                raise Exception("Failed to get LBank account data")
+            
+            account_data = data['data']
+            
+            # 获取持仓信息
+            positions_response = lbank_client.get('user/contract_position', params=params)
+            positions_data = positions_response.json()
+            
+            positions = []
+            if positions_data['result']:
+                for position in positions_data['data']:
+                    if float(position['amount']) != 0:  # 只显示有持仓的
+                        positions.append({
+                            'symbol': position['symbol'],
+                            'amount': float(position['amount']),
+                            'entry_price': float(position['entry_price']),
+                            'mark_price': float(position['mark_price']),
+                            'unrealized_pnl': float(position['unrealized_pnl']),
+                            'leverage': float(position['leverage']),
+                            'side': 'LONG' if position['side'] == 'buy' else 'SHORT'
+                        })
+            
+            logger.info(f"Successfully processed LBank account data. Total balance: {account_data['total_balance']}, Positions: {len(positions)}")
+            return {
+                'total_balance': float(account_data['total_balance']),
+                'unrealized_pnl': float(account_data['unrealized_pnl']),
+                'positions': positions
+            }
                 
     except Exception as e:
         logger.error(f"Error getting account balance: {str(e)}")
         return None
 
+def fetch_account_snapshot(exchange):
+    """在应用上下文中拉取账户信息，供快照服务的后台线程调用"""
+    with app.app_context():
+        return get_account_balance(exchange)
+
+# 账户快照：后台定期刷新，看板接口只读取内存中的最新快照
+account_snapshots = AccountSnapshotService(fetch_account_snapshot)
+
+BINANCE_FUTURES_KLINES_URL = 'https://fapi.binance.com/fapi/v1/klines'
+
+def fetch_public_klines(symbol, interval, limit, since=None):
+    """从Binance合约公开接口拉取K线（无需API密钥）"""
+    params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+    if since is not None:
+        params['startTime'] = since
+    response = binance_public_session.get(BINANCE_FUTURES_KLINES_URL, params=params, timeout=10)
+    response.raise_for_status()
+    return [[float(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])]
+            for k in response.json()]
+
+def get_cached_klines(symbol, timeframe, minute_bucket, limit=100):
+    """获取K线数据（按分钟分桶缓存，同一分钟内的重复请求不会访问交易所）"""
+    return kline_cache.get(
+        (symbol, timeframe, minute_bucket, limit),
+        lambda: get_candle_store('binance').get_candles(symbol, timeframe, limit, fetch_public_klines)
+    )
+
 def analyze_market_conditions(symbol, timeframe='1m'):
     """分析市场条件，返回市场状态和波动性"""
     try:
@@ -1631,8 +1893,8 @@ def execute_high_frequency_trade(exchange, symbol, side, quantity, price, strate
         # 确定交易方向（做多/做空）
         position_type = 'LONG' if side == 'BUY' else 'SHORT'
         
-        # 创建交易记录
-        trade = TradeHistory(
+        # 创建交易记录（异步写入）
+        trade = record_trade_history(
             exchange=exchange,
             symbol=symbol,
             side=side,
@@ -1649,8 +1911,6 @@ def execute_high_frequency_trade(exchange, symbol, side, quantity, price, strate
                 'strategy_signal': strategy_signal
             })
         )
-        db.session.add(trade)
-        db.session.commit()
         
         # 记录日志
         logger.info(f"执行高频交易: {exchange} {symbol} {side} {quantity}@{price}")
@@ -1691,9 +1951,9 @@ def high_frequency():
             logger.error(f"获取交易记录失败: {str(e)}")
             trades = []
         
-        # 获取账户信息
+        # 获取账户快照
         try:
-            account_info = get_account_balance(os.getenv('CURRENT_EXCHANGE', 'binance'))
+            account_info, _ = account_snapshots.get(os.getenv('CURRENT_EXCHANGE', 'binance'))
         except Exception as e:
             logger.error(f"获取账户信息失败: {str(e)}")
             account_info = None
@@ -1805,6 +2065,48 @@ def get_high_frequency_status():
             status_code=500
         )
 
+@app.route('/api/kline-cache/stats')
+@handle_errors
+def get_kline_cache_stats():
+    """获取K线缓存命中统计"""
+    return api_response(data=kline_cache.stats())
+
+@app.route('/api/lbank-client/stats')
+@handle_errors
+def get_lbank_client_stats():
+    """获取LBank REST请求耗时统计"""
+    return api_response(data=lbank_client.stats())
+
+@app.route('/api/rate-limits')
+@handle_errors
+def get_rate_limit_stats():
+    """获取各交易所限流器状态"""
+    return api_response(data={exchange: get_rate_limiter(exchange).stats() for exchange in ('binance', 'lbank')})
+
+@app.route('/api/account-snapshots')
+@handle_errors
+def get_account_snapshot_stats():
+    """获取各交易所账户快照的时长及最近一次刷新错误"""
+    return api_response(data=account_snapshots.stats())
+
+@app.route('/api/persistence-queue')
+@handle_errors
+def get_persistence_queue_stats():
+    """获取异步写入队列的积压、批次数及最近一次写入错误"""
+    return api_response(data=persistence_queue.stats())
+
+@app.route('/api/bot-supervisor')
+@handle_errors
+def get_bot_supervisor_stats():
+    """获取本进程的机器人监督器状态（是否持有监督锁、工作线程数、重启次数）"""
+    return api_response(data=bot_manager.stats())
+
+@app.route('/api/exchange-clients')
+@handle_errors
+def get_exchange_client_stats():
+    """获取缓存的交易所客户端及健康状态"""
+    return api_response(data=client_registry.stats())
+
 @app.route('/api/high-frequency/trade', methods=['POST'])
 @handle_errors
 @log_request
@@ -1842,7 +2144,6 @@ def execute_high_frequency_trade_api():
             return api_response(
                 data={
                     'trade': {
-                        'id': trade.id,
                         'exchange': trade.exchange,
                         'symbol': trade.symbol,
                         'side': trade.side,
@@ -2046,7 +2347,7 @@ def delete_trading_bot(bot_id):
             )
         
         # 检查机器人是否在运行
-        if bot.status == 'RUNNING':
+        if bot.status == 'RUNNING' or bot.desired_status == 'RUNNING':
             return api_response(
                 success=False,
                 error="请先停止机器人",
@@ -2105,8 +2406,83 @@ def validate_bot_data(data):
     
     return True
 
-# 初始化机器人管理器
-bot_manager = trading_bot_manager
+def load_bot_configs():
+    """读取全部机器人配置，供监督器比对目标状态"""
+    with app.app_context():
+        columns = TradingBotConfig.__table__.columns
+        return [{column.name: getattr(bot, column.name) for column in columns}
+                for bot in TradingBotConfig.query.all()]
+
+def save_bot_states(states):
+    """在一个事务中写回运行状态和心跳（不修改updated_at，避免被当作配置更新而重启）"""
+    with app.app_context():
+        try:
+            for bot_id, values in states.items():
+                TradingBotConfig.query.filter_by(id=bot_id).update(
+                    {**values, 'updated_at': TradingBotConfig.updated_at}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+def set_bot_desired_status(bot_id, desired_status):
+    """修改机器人目标状态，返回机器人是否存在"""
+    with app.app_context():
+        try:
+            updated = TradingBotConfig.query.filter_by(id=bot_id).update(
+                {'desired_status': desired_status, 'updated_at': TradingBotConfig.updated_at},
+                synchronize_session=False)
+            db.session.commit()
+            return updated > 0
+        except Exception:
+            db.session.rollback()
+            raise
+
+# 各交易所共用的ExchangeAPI，按 (交易所, 密钥) 缓存，K线存储和限流器本就按交易所共享
+bot_exchange_apis = {}
+
+def get_bot_exchange_api(exchange):
+    """获取机器人使用的ExchangeAPI：优先使用APIKey表中的活跃密钥，没有时使用环境变量"""
+    with app.app_context():
+        key = APIKey.query.filter(db.func.lower(APIKey.exchange) == exchange.lower(),
+                                  APIKey.is_active == True).first()
+    if key:
+        api_key, api_secret = key.api_key, key.api_secret
+    else:
+        api_key = os.getenv(f'{exchange.upper()}_API_KEY')
+        api_secret = os.getenv(f'{exchange.upper()}_API_SECRET')
+    if not api_key or not api_secret:
+        raise ValueError(f"{exchange} API credentials not found")
+
+    cache_key = (exchange.lower(), api_key)
+    if cache_key not in bot_exchange_apis:
+        bot_exchange_apis[cache_key] = ExchangeAPI(exchange, api_key, api_secret)
+    return bot_exchange_apis[cache_key]
+
+def build_trading_bot(config):
+    """由机器人配置构建策略机器人（在机器人自己的工作线程中调用）"""
+    return StrategyBot(config, get_bot_exchange_api(config['exchange']), record_trade_history)
+
+# 机器人监督器：接口只修改数据库中的目标状态，持有监督锁的进程为每个机器人运行一个工作线程
+bot_manager = TradingBotManager(load_bot_configs, save_bot_states, set_bot_desired_status, build_trading_bot)
+
+def start_bot_supervisor():
+    """
+    启动机器人监督器
+
+    只由Web入口调用（app.run、gunicorn worker启动、第一个请求），导入app的迁移和脚本不会运行机器人；
+    设置 BOT_SUPERVISOR_ENABLED=0 时本进程只修改目标状态，不运行机器人。
+    """
+    if os.getenv('BOT_SUPERVISOR_ENABLED', '1') != '1':
+        logger.info("Bot supervisor disabled by BOT_SUPERVISOR_ENABLED")
+        return
+    if bot_manager.thread is None:
+        atexit.register(bot_manager.shutdown)
+    bot_manager.start()
+
+@app.before_first_request
+def start_background_services():
+    start_bot_supervisor()
 
 @app.route('/api/bot/start/<int:bot_id>', methods=['POST'])
 @handle_errors
@@ -2116,6 +2492,7 @@ def start_bot(bot_id):
     try:
         success = bot_manager.start_bot(bot_id)
         if success:
+            log_bot_action(bot_id, 'START')
             return api_response(
                 message="机器人启动成功"
             )
@@ -2143,6 +2520,7 @@ def stop_bot(bot_id):
     try:
         success = bot_manager.stop_bot(bot_id)
         if success:
+            log_bot_action(bot_id, 'STOP')
             return api_response(
                 message="机器人停止成功"
             )
@@ -2162,13 +2540,20 @@ def stop_bot(bot_id):
             status_code=500
         )
 
+def get_bot_performance_stats(bot_id):
+    """机器人的累计统计及今日盈亏（读取盈亏汇总表）"""
+    day_start, day_end = utc_day_range()
+    performance = pnl_stats(bot_id=bot_id)
+    performance['daily_pnl'] = pnl_stats(start=day_start, end=day_end, bot_id=bot_id)['total_pnl']
+    return performance
+
 @app.route('/api/bot/performance/<int:bot_id>')
 @handle_errors
 @log_request
 def get_bot_performance(bot_id):
     """获取机器人性能统计"""
     try:
-        performance = bot_manager.get_bot_performance(bot_id)
+        performance = get_bot_performance_stats(bot_id)
         if performance:
             return api_response(
                 data=performance
@@ -2202,7 +2587,7 @@ def get_bot_status(bot_id):
                 status_code=404
             )
             
-        performance = bot_manager.get_bot_performance(bot_id)
+        performance = get_bot_performance_stats(bot_id)
         
         return api_response(
             data={
@@ -2211,6 +2596,10 @@ def get_bot_status(bot_id):
                 'exchange': bot.exchange,
                 'trading_pair': bot.trading_pair,
                 'status': bot.status,
+                'desired_status': bot.desired_status,
+                'heartbeat_at': bot.heartbeat_at.isoformat() if bot.heartbeat_at else None,
+                'last_error': bot.last_error,
+                'restart_count': bot.restart_count,
                 'strategies': bot.strategies,
                 'funds': bot.funds,
                 'performance': performance
@@ -2351,10 +2740,10 @@ def get_account_data():
         exchange = os.getenv('CURRENT_EXCHANGE', 'binance')
         logger.info(f"Getting account data for exchange: {exchange}")
         
-        # 获取账户信息
-        account_info = get_account_balance(exchange)
+        # 读取账户快照（由后台线程刷新，不在请求中访问交易所）
+        account_info, snapshot_age = account_snapshots.get(exchange)
         if not account_info:
-            logger.error(f"Failed to get account info for exchange: {exchange}")
+            logger.warning(f"No account snapshot yet for exchange: {exchange}")
             # 返回一个默认的响应，而不是错误
             return api_response(
                 data={
@@ -2362,21 +2751,16 @@ def get_account_data():
                     'unrealized_pnl': 0.0,
                     'daily_pnl': 0.0,
                     'positions': [],
-                    'status': 'error',
-                    'message': 'Unable to fetch account data',
-                    'exchange': exchange
+                    'status': 'pending',
+                    'message': account_snapshots.stats().get(exchange.lower(), {}).get('error') or 'Account data is loading',
+                    'exchange': exchange,
+                    'snapshot_age': None
                 }
             )
             
-        # 获取今日交易记录
-        today = datetime.utcnow().date()
-        today_trades = TradeHistory.query.filter(
-            db.func.date(TradeHistory.timestamp) == today,
-            TradeHistory.exchange == exchange
-        ).all()
-        
-        # 计算今日盈亏
-        daily_pnl = sum(trade.pnl or 0 for trade in today_trades)
+        # 今日盈亏读取盈亏汇总表的日桶
+        day_start, day_end = utc_day_range()
+        daily_pnl = pnl_stats(start=day_start, end=day_end, exchange=exchange)['total_pnl']
         
         # 确保所有数值都是浮点数，并处理可能的None值
         response_data = {
@@ -2393,7 +2777,8 @@ def get_account_data():
                 'side': pos.get('side', 'NONE')
             } for pos in account_info.get('positions', [])],
             'status': 'success',
-            'exchange': exchange
+            'exchange': exchange,
+            'snapshot_age': snapshot_age
         }
         
         logger.info(f"Successfully retrieved account data for {exchange}")
@@ -2413,5 +2798,6 @@ def get_account_data():
         )
 
 if __name__ == '__main__':
+    start_bot_supervisor()
     # 确保在VPS上运行时使用正确的配置
     app.run(host='0.0.0.0', port=5000, debug=False) 
\ No newline at end of file
@@ -0,0 +1,361 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+
+import ccxt.async_support as ccxt_async
+
+from candle_store import get_candle_store
+from exchange_api import (
+    BINANCE_BATCH_CANCEL_LIMIT,
+    BINANCE_BATCH_ORDER_LIMIT,
+    DEFAULT_LEVERAGE,
+    binance_batch_order_params,
+    binance_kline_params,
+    binance_order_params,
+    binance_protective_orders,
+    chunked,
+    floor_quantity,
+    get_order_id,
+    order_result,
+    parse_batch_results,
+    parse_binance_account,
+    parse_binance_trades,
+    parse_binance_trading_rules,
+    parse_depth,
+    parse_klines,
+    parse_lbank_balance,
+    parse_lbank_trades,
+    parse_lbank_trading_rules,
+    round_to_tick,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncExchangeAPI:
+    """
+    异步交易所接口
+
+    基于 ccxt.async_support，方法与返回格式与 ExchangeAPI 一致，均为协程；
+    请求参数与响应解析复用 exchange_api 中的同一组函数，K线与同步接口共用共享K线存储。
+    """
+
+    def __init__(self, exchange: str, api_key: str, api_secret: str):
+        self.exchange = exchange.lower()
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.client = None
+        self.candle_store = get_candle_store(self.exchange)
+        self.trading_rules: Dict[str, Dict] = {}  # 交易对 -> 交易规则，首次使用时拉取
+        self.initialize_client()
+
+    def initialize_client(self):
+        """初始化交易所客户端"""
+        config = {
+            'apiKey': self.api_key,
+            'secret': self.api_secret,
+            'enableRateLimit': True
+        }
+        if self.exchange == 'binance':
+            self.client = ccxt_async.binance(config)
+        elif self.exchange == 'lbank':
+            self.client = ccxt_async.lbank(config)
+        else:
+            logger.error(f"Unsupported exchange: {self.exchange}")
+            raise ValueError(f"Unsupported exchange: {self.exchange}")
+        logger.info(f"Successfully initialized async {self.exchange} client")
+
+    async def close(self):
+        """关闭底层HTTP会话"""
+        await self.client.close()
+
+    async def get_account_balance(self) -> Dict:
+        """获取账户余额"""
+        try:
+            if self.exchange == 'binance':
+                return parse_binance_account(await self.client.fapiPrivateV2GetAccount())
+            elif self.exchange == 'lbank':
+                return parse_lbank_balance(await self.client.fetch_balance())
+        except Exception as e:
+            logger.error(f"Error getting account balance: {str(e)}")
+            raise
+
+    async def get_market_data(self, symbol: str, interval: str = '1m', limit: int = 100) -> List[Dict]:
+        """获取市场数据（经共享K线存储增量更新）"""
+        loop = asyncio.get_running_loop()
+
+        def fetcher(symbol: str, interval: str, limit: int, since: Optional[int] = None) -> List[List[float]]:
+            # 共享K线存储是同步接口，在线程池中运行，拉取请求交回事件循环执行
+            return asyncio.run_coroutine_threadsafe(
+                self._fetch_klines(symbol, interval, limit, since), loop
+            ).result()
+
+        try:
+            return await loop.run_in_executor(
+                None, self.candle_store.get_candles, symbol, interval, limit, fetcher
+            )
+        except Exception as e:
+            logger.error(f"Error getting market data: {str(e)}")
+            raise
+
+    async def _fetch_klines(self, symbol: str, interval: str, limit: int,
+                            since: Optional[int] = None) -> List[List[float]]:
+        """从交易所拉取K线，since为起始开盘时间（毫秒）"""
+        if self.exchange == 'binance':
+            klines = await self.client.fapiPublicGetKlines(binance_kline_params(symbol, interval, limit, since))
+        elif self.exchange == 'lbank':
+            klines = await self.client.fetch_ohlcv(symbol, interval, since=since, limit=limit)
+        else:
+            raise ValueError(f"Unsupported exchange: {self.exchange}")
+        return parse_klines(klines)
+
+    async def place_order(self, symbol: str, side: str, quantity: float,
+                          order_type: str = 'MARKET', price: Optional[float] = None,
+                          stop_price: Optional[float] = None,
+                          stop_loss: Optional[float] = None,
+                          take_profit: Optional[float] = None,
+                          leverage: Optional[int] = None) -> Dict:
+        """下单（quantity为基础资产数量，leverage缺省为DEFAULT_LEVERAGE）"""
+        try:
+            if self.exchange == 'binance':
+                # 设置杠杆
+                await self.client.fapiPrivatePostLeverage({
+                    'symbol': symbol,
+                    'leverage': leverage or DEFAULT_LEVERAGE
+                })
+
+                # 主订单
+                order = await self.client.fapiPrivatePostOrder(
+                    binance_order_params(symbol, side, order_type, quantity, price, stop_price)
+                )
+
+                # 设置止损、止盈
+                protective = binance_protective_orders(symbol, side, stop_loss, take_profit)
+                if protective:
+                    await asyncio.gather(*(self.client.fapiPrivatePostOrder(params) for params in protective))
+
+                logger.info(f"Order placed successfully: {json.dumps(order)}")
+                return order
+            elif self.exchange == 'lbank':
+                # LBank下单
+                order = await self.client.create_order(
+                    symbol=symbol,
+                    type=order_type.lower(),
+                    side=side.lower(),
+                    amount=quantity,
+                    price=price
+                )
+                logger.info(f"Order placed successfully: {json.dumps(order)}")
+                return order
+
+        except Exception as e:
+            logger.error(f"Error placing order: {str(e)}")
+            raise
+
+    async def cancel_order(self, symbol: str, order_id: str) -> Dict:
+        """取消订单"""
+        try:
+            if self.exchange == 'binance':
+                result = await self.client.fapiPrivateDeleteOrder({
+                    'symbol': symbol,
+                    'orderId': order_id
+                })
+                logger.info(f"Order cancelled successfully: {json.dumps(result)}")
+                return result
+            elif self.exchange == 'lbank':
+                result = await self.client.cancel_order(order_id, symbol)
+                logger.info(f"Order cancelled successfully: {json.dumps(result)}")
+                return result
+        except Exception as e:
+            logger.error(f"Error cancelling order: {str(e)}")
+            raise
+
+    async def place_orders(self, symbol: str, orders: List[Dict]) -> List[Dict]:
+        """
+        批量下单
+
+        Binance使用合约batchOrders接口，每批5个，各批并发发送；
+        其他交易所并发逐个下单。单个订单失败不影响其余订单。
+
+        Returns:
+            与orders一一对应的结果列表：{'success', 'order', 'error'}
+        """
+        if not orders:
+            return []
+        try:
+            if self.exchange == 'binance':
+                batches = await asyncio.gather(*(
+                    self._place_binance_batch(symbol, chunk)
+                    for chunk in chunked(orders, BINANCE_BATCH_ORDER_LIMIT)
+                ))
+                results = [result for batch in batches for result in batch]
+            else:
+                results = await self._run_parallel([
+                    self.place_order(
+                        symbol=symbol,
+                        side=order['side'],
+                        quantity=order['quantity'],
+                        order_type=order.get('order_type', 'LIMIT'),
+                        price=order.get('price')
+                    )
+                    for order in orders
+                ])
+            failed = sum(1 for result in results if not result['success'])
+            logger.info(f"Batch placed {len(orders) - failed}/{len(orders)} orders for {symbol}")
+            return results
+        except Exception as e:
+            logger.error(f"Error placing batch orders: {str(e)}")
+            raise
+
+    async def _place_binance_batch(self, symbol: str, orders: List[Dict]) -> List[Dict]:
+        try:
+            batch = [
+                binance_batch_order_params(
+                    symbol, order,
+                    await self.round_quantity(symbol, order['quantity']),
+                    await self.round_price(symbol, order['price']) if order.get('price') is not None else None
+                )
+                for order in orders
+            ]
+            response = await self.client.fapiPrivatePostBatchOrders({'batchOrders': json.dumps(batch)})
+        except Exception as e:
+            # 整批被拒绝（网络错误、限流等），该批每个订单都记为失败
+            return [order_result(error=str(e)) for _ in orders]
+        return parse_batch_results(response)
+
+    async def cancel_orders(self, symbol: str, order_ids: List[str]) -> List[Dict]:
+        """
+        批量撤单
+
+        Binance使用合约batchOrders撤单接口，每批10个；其他交易所并发逐个撤单。
+
+        Returns:
+            与order_ids一一对应的结果列表：{'success', 'order', 'error'}
+        """
+        if not order_ids:
+            return []
+        try:
+            if self.exchange == 'binance':
+                results = []
+                for chunk in chunked(list(order_ids), BINANCE_BATCH_CANCEL_LIMIT):
+                    try:
+                        response = await self.client.fapiPrivateDeleteBatchOrders({
+                            'symbol': symbol,
+                            'orderIdList': json.dumps([int(order_id) for order_id in chunk])
+                        })
+                        results.extend(parse_batch_results(response))
+                    except Exception as e:
+                        results.extend(order_result(error=str(e)) for _ in chunk)
+            else:
+                results = await self._run_parallel([self.cancel_order(symbol, order_id) for order_id in order_ids])
+            failed = sum(1 for result in results if not result['success'])
+            logger.info(f"Batch cancelled {len(order_ids) - failed}/{len(order_ids)} orders for {symbol}")
+            return results
+        except Exception as e:
+            logger.error(f"Error cancelling batch orders: {str(e)}")
+            raise
+
+    async def cancel_all_orders(self, symbol: str) -> List[Dict]:
+        """撤销交易对的全部挂单，结果格式同cancel_orders"""
+        try:
+            if self.exchange == 'binance':
+                open_orders = await self.client.fapiPrivateGetOpenOrders({'symbol': symbol})
+            else:
+                open_orders = await self.client.fetch_open_orders(symbol)
+            return await self.cancel_orders(symbol, [get_order_id(order) for order in open_orders])
+        except Exception as e:
+            logger.error(f"Error cancelling all orders: {str(e)}")
+            raise
+
+    @staticmethod
+    async def _run_parallel(calls: List) -> List[Dict]:
+        """无批量接口时并发逐个调用，按输入顺序返回每项结果"""
+        responses = await asyncio.gather(*calls, return_exceptions=True)
+        return [
+            order_result(error=str(response)) if isinstance(response, Exception) else order_result(order=response)
+            for response in responses
+        ]
+
+    async def get_order_status(self, symbol: str, order_id: str) -> Dict:
+        """获取订单状态"""
+        try:
+            if self.exchange == 'binance':
+                return await self.client.fapiPrivateGetOrder({
+                    'symbol': symbol,
+                    'orderId': order_id
+                })
+            elif self.exchange == 'lbank':
+                return await self.client.fetch_order(order_id, symbol)
+        except Exception as e:
+            logger.error(f"Error getting order status: {str(e)}")
+            raise
+
+    async def get_trading_rules(self, symbol: str) -> Dict:
+        """获取交易规则"""
+        try:
+            if self.exchange == 'binance':
+                return parse_binance_trading_rules(await self.client.fapiPublicGetExchangeInfo(), symbol)
+            elif self.exchange == 'lbank':
+                markets = await self.client.load_markets()
+                return parse_lbank_trading_rules(markets.get(symbol))
+        except Exception as e:
+            logger.error(f"Error getting trading rules: {str(e)}")
+            raise
+
+    async def round_quantity(self, symbol: str, quantity: float) -> float:
+        """按交易对的数量步长向下取整，低于最小下单量时返回0"""
+        if self.exchange == 'lbank':
+            await self.client.load_markets()
+            return float(self.client.amount_to_precision(symbol, quantity))
+        return floor_quantity(quantity, await self._rules(symbol))
+
+    async def round_price(self, symbol: str, price: float) -> float:
+        """按交易对的价格精度取整"""
+        if self.exchange == 'lbank':
+            await self.client.load_markets()
+            return float(self.client.price_to_precision(symbol, price))
+        return round_to_tick(price, await self._rules(symbol))
+
+    async def _rules(self, symbol: str) -> Dict:
+        rules = self.trading_rules.get(symbol)
+        if rules is None:
+            rules = self.trading_rules[symbol] = await self.get_trading_rules(symbol) or {}
+        return rules
+
+    async def get_funding_rate(self, symbol: str) -> float:
+        """获取资金费率"""
+        try:
+            if self.exchange == 'binance':
+                funding_rate = await self.client.fapiPublicGetFundingRate({'symbol': symbol, 'limit': 1})
+                return float(funding_rate[0]['fundingRate'])
+            elif self.exchange == 'lbank':
+                # LBank可能不支持资金费率
+                return 0.0
+        except Exception as e:
+            logger.error(f"Error getting funding rate: {str(e)}")
+            raise
+
+    async def get_market_depth(self, symbol: str, limit: int = 20) -> Dict:
+        """获取市场深度"""
+        try:
+            if self.exchange == 'binance':
+                return parse_depth(await self.client.fapiPublicGetDepth({'symbol': symbol, 'limit': limit}))
+            elif self.exchange == 'lbank':
+                return parse_depth(await self.client.fetch_order_book(symbol, limit))
+        except Exception as e:
+            logger.error(f"Error getting market depth: {str(e)}")
+            raise
+
+    async def get_recent_trades(self, symbol: str, limit: int = 50) -> List[Dict]:
+        """获取最近成交"""
+        try:
+            if self.exchange == 'binance':
+                return parse_binance_trades(
+                    await self.client.fapiPrivateGetUserTrades({'symbol': symbol, 'limit': limit})
+                )
+            elif self.exchange == 'lbank':
+                return parse_lbank_trades(await self.client.fetch_my_trades(symbol, limit=limit))
+        except Exception as e:
+            logger.error(f"Error getting recent trades: {str(e)}")
+            raise
@@ -0,0 +1,177 @@
+"""
+交易记录热点查询基准测试
+
+在临时SQLite库中由 app 的模型建表（含 TradeHistory 上的索引），写入数百万条 trade_history
+记录并重建盈亏汇总表，然后通过Flask测试客户端请求各接口、直接调用 app 中读取汇总表的函数，
+输出每个用例实际执行的SQL的查询计划和耗时，超过阈值时以非零状态退出。
+
+用法: python benchmark_queries.py [--rows 2000000] [--threshold-ms 50] [--db 路径]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+EXCHANGES = ['binance', 'lbank']
+STRATEGIES = ['scalping', 'supertrend', 'rsi', 'bollinger_bands', 'high_frequency', None]
+
+
+def seed(app_module, rows, days=365, batch=50000):
+    """写入rows条随机交易记录（时间均匀分布在最近days天内），再由交易记录重建盈亏汇总表"""
+    db, TradeHistory, PnlRollup = app_module.db, app_module.TradeHistory, app_module.PnlRollup
+    now = datetime.utcnow()
+    span = days * 86400
+    for start in range(0, rows, batch):
+        data = []
+        for _ in range(min(batch, rows - start)):
+            side = random.choice(('BUY', 'SELL'))
+            data.append({
+                'bot_id': random.choice((None, 1, 2, 3, 4, 5)),
+                'exchange': random.choice(EXCHANGES),
+                'symbol': 'BTCUSDT',
+                'side': side,
+                'position_type': 'LONG' if side == 'BUY' else 'SHORT',
+                'price': random.uniform(20000, 70000),
+                'quantity': random.uniform(0.001, 0.1),
+                'timestamp': now - timedelta(seconds=random.uniform(0, span)),
+                'status': 'CLOSED',
+                'strategy': random.choice(STRATEGIES),
+                'pnl': random.gauss(0, 10),
+            })
+        # 核心层批量插入，不触发逐条更新汇总表的ORM事件
+        db.session.execute(TradeHistory.__table__.insert(), data)
+        db.session.commit()
+        print(f"\r写入 {start + len(data)}/{rows}", end='', flush=True)
+    print()
+
+    # 与迁移 add_pnl_rollup 相同的回填方式
+    trade_history = TradeHistory.__table__
+    with db.engine.begin() as connection:
+        trades = connection.execute(
+            db.select(*[trade_history.c[name] for name in ('timestamp', 'bot_id', 'strategy', 'exchange', 'symbol', 'pnl')])
+            .where(trade_history.c.timestamp.isnot(None))
+            .order_by(trade_history.c.timestamp, trade_history.c.id)
+        ).mappings().all()
+        app_module.pnl_rollup.rebuild(connection, PnlRollup.__table__, trades)
+        connection.exec_driver_sql('ANALYZE')
+
+
+def build_cases(app_module, client):
+    """用例名称 -> 无参调用，均经由 app 自身的接口或函数"""
+    # 深翻页游标：约300天前的位置
+    deep_cursor = app_module.encode_trade_cursor(
+        SimpleNamespace(timestamp=datetime.utcnow() - timedelta(days=300), id=2 ** 62)
+    )
+    export_day = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+    day_start, day_end = app_module.utc_day_range()
+
+    def get(path):
+        def call():
+            response = client.get(path)
+            response.get_data()  # 流式响应读完为止
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} -> {response.status_code}")
+        return call
+
+    return {
+        '/trades 首页': get('/trades'),
+        '/trades 游标深翻页': get(f'/trades?cursor={deep_cursor}'),
+        '/api/trades 按交易所': get('/api/trades'),
+        '/api/trades 游标深翻页': get(f'/api/trades?cursor={deep_cursor}'),
+        '/api/strategy-logs 策略交易': get('/api/strategy-logs'),
+        '/api/strategy-logs 游标深翻页': get(f'/api/strategy-logs?cursor={deep_cursor}'),
+        '/api/trades/export 机器人单日': get(f'/api/trades/export?bot_id=3&start={export_day}&end={export_day}'),
+        '/api/account-data 今日盈亏': lambda: app_module.pnl_stats(start=day_start, end=day_end, exchange='binance'),
+        '机器人性能统计': lambda: app_module.get_bot_performance_stats(3),
+    }
+
+
+def capture_sql(engine, func):
+    """执行一次func，返回期间执行的 (SQL, 参数) 列表"""
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def query_plans(engine, statements):
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith('SELECT'):
+                continue
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append(' | '.join(row[-1] for row in rows))
+    return plans
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='交易记录热点查询基准测试')
+    parser.add_argument('--rows', type=int, default=2000000, help='写入的记录数')
+    parser.add_argument('--threshold-ms', type=float, default=50.0, help='单个用例耗时上限（中位数，毫秒，含接口序列化）')
+    parser.add_argument('--repeat', type=int, default=20, help='每个用例执行次数')
+    parser.add_argument('--db', help='数据库路径（默认使用临时文件，已存在时跳过写入）')
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+    exists = os.path.exists(path)
+    # app在导入时按DATABASE_URL建表，基准测试进程不运行机器人
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    os.environ['BOT_SUPERVISOR_ENABLED'] = '0'
+    import app as app_module
+
+    with app_module.app.app_context():
+        if not exists:
+            seed(app_module, args.rows)
+        engine = app_module.db.engine
+        count = app_module.TradeHistory.query.count()
+        print(f"数据库: {path}，记录数: {count}\n")
+
+        client = app_module.app.test_client()
+        failed = []
+        for name, func in build_cases(app_module, client).items():
+            try:
+                plans = query_plans(engine, capture_sql(engine, func))
+                p50, worst = measure(func, args.repeat)
+            except Exception as e:
+                failed.append(name)
+                print(f"[ERROR] {name}: {str(e)}")
+                continue
+            status = 'OK' if p50 <= args.threshold_ms else 'SLOW'
+            if status == 'SLOW':
+                failed.append(name)
+            print(f"[{status}] {name}: p50 {p50:.2f}ms, max {worst:.2f}ms")
+            for plan in plans:
+                print(f"       {plan}")
+
+    if failed:
+        print(f"\n{len(failed)} 个用例失败或超过 {args.threshold_ms}ms: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\n全部用例在 {args.threshold_ms}ms 以内")
+
+
+if __name__ == '__main__':
+    main()
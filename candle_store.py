@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 列顺序：开盘时间(ms)、开、高、低、收、量
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+INTERVAL_UNITS_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+}
+
+# fetcher(symbol, interval, limit, since) -> [[timestamp, open, high, low, close, volume], ...]
+Fetcher = Callable[[str, str, int, Optional[int]], List[List[float]]]
+
+
+def interval_to_ms(interval: str) -> int:
+    """将K线周期（如 1m/15m/4h/1d）转换为毫秒"""
+    try:
+        return int(interval[:-1]) * INTERVAL_UNITS_MS[interval[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Unsupported interval: {interval}")
+
+
+class CandleSeries:
+    """单个(交易对, 周期)的K线环形缓冲区"""
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros((capacity, len(COLUMNS)), dtype=np.float64)
+        self.start = 0
+        self.count = 0
+        self.last_refresh = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        if self.count == 0:
+            return None
+        return int(self.data[(self.start + self.count - 1) % self.capacity, 0])
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    def grow(self, capacity: int):
+        """扩容并保持时间顺序"""
+        if capacity <= self.capacity:
+            return
+        window = self.window(self.count)
+        self.data = np.zeros((capacity, len(COLUMNS)), dtype=np.float64)
+        self.data[:len(window)] = window
+        self.start = 0
+
+    def merge(self, rows: np.ndarray):
+        """合并按时间升序的K线：同一时间戳覆盖（未收盘K线会持续变化），更新的时间戳追加"""
+        for row in rows:
+            last_ts = self.last_timestamp
+            if last_ts is not None and row[0] < last_ts:
+                continue
+            if last_ts is not None and row[0] == last_ts:
+                self.data[(self.start + self.count - 1) % self.capacity] = row
+                continue
+            if self.count < self.capacity:
+                self.data[(self.start + self.count) % self.capacity] = row
+                self.count += 1
+            else:
+                self.data[self.start] = row
+                self.start = (self.start + 1) % self.capacity
+
+    def window(self, limit: int) -> np.ndarray:
+        """返回最近limit根K线的副本（按时间升序）"""
+        n = min(limit, self.count)
+        first = (self.start + self.count - n) % self.capacity
+        if first + n <= self.capacity:
+            return self.data[first:first + n].copy()
+        return np.concatenate((self.data[first:], self.data[:first + n - self.capacity]))
+
+
+class CandleStore:
+    """
+    共享K线存储
+
+    按(交易对, 周期)维护NumPy环形缓冲区，只向交易所增量拉取
+    最后一根已存K线之后的数据（含最后一根，用于刷新未收盘K线），
+    重叠窗口直接从内存返回。同一交易所的所有调用方共享同一份数据。
+    """
+
+    def __init__(self, capacity: int = 1000, max_age: float = 1.0, max_fetch: int = 1000):
+        """
+        Args:
+            capacity: 每个序列的初始容量，请求更大窗口时自动扩容
+            max_age: 距上次拉取不超过该秒数时直接使用内存数据
+            max_fetch: 单次增量请求的最大K线数量，缺口更大时整体重新拉取
+        """
+        self.capacity = capacity
+        self.max_age = max_age
+        self.max_fetch = max_fetch
+        self.series: Dict[Tuple[str, str], CandleSeries] = {}
+        self.lock = threading.Lock()
+
+    def _get_series(self, symbol: str, interval: str) -> CandleSeries:
+        key = (symbol, interval)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = CandleSeries(self.capacity)
+                self.series[key] = series
+            return series
+
+    @staticmethod
+    def _to_array(candles: List[List[float]]) -> np.ndarray:
+        if not candles:
+            return np.empty((0, len(COLUMNS)), dtype=np.float64)
+        rows = np.asarray([c[:len(COLUMNS)] for c in candles], dtype=np.float64)
+        return rows[np.argsort(rows[:, 0], kind='stable')]
+
+    def _refresh(self, series: CandleSeries, symbol: str, interval: str, limit: int, fetcher: Fetcher):
+        """按需从交易所补齐数据（调用方持有series.lock）"""
+        now = time.time()
+        if series.count >= limit and now - series.last_refresh < self.max_age:
+            return
+
+        interval_ms = interval_to_ms(interval)
+        last_ts = series.last_timestamp
+        missing = None
+        if last_ts is not None and series.count >= limit:
+            missing = int((now * 1000 - last_ts) // interval_ms) + 2
+
+        if missing is not None and missing <= min(self.max_fetch, series.capacity):
+            rows = self._to_array(fetcher(symbol, interval, missing, last_ts))
+            if len(rows) and rows[0, 0] > last_ts:
+                # 增量数据与已有数据不衔接，整体重新拉取
+                logger.warning(f"Candle gap detected for {symbol} {interval}, reloading window")
+                series.clear()
+                rows = self._to_array(fetcher(symbol, interval, limit, None))
+        else:
+            series.clear()
+            rows = self._to_array(fetcher(symbol, interval, limit, None))
+
+        series.grow(max(limit, len(rows)))
+        series.merge(rows)
+        series.last_refresh = now
+
+    def get_array(self, symbol: str, interval: str, limit: int, fetcher: Fetcher) -> np.ndarray:
+        """返回最近limit根K线，形状为(n, 6)，列顺序见COLUMNS"""
+        series = self._get_series(symbol, interval)
+        with series.lock:
+            self._refresh(series, symbol, interval, limit, fetcher)
+            return series.window(limit)
+
+    def get_candles(self, symbol: str, interval: str, limit: int, fetcher: Fetcher) -> List[Dict]:
+        """返回最近limit根K线，格式与 ExchangeAPI.get_market_data 一致"""
+        window = self.get_array(symbol, interval, limit, fetcher)
+        return [{
+            'timestamp': int(row[0]),
+            'open': float(row[1]),
+            'high': float(row[2]),
+            'low': float(row[3]),
+            'close': float(row[4]),
+            'volume': float(row[5])
+        } for row in window]
+
+
+# 按交易所共享的K线存储（K线为公开数据，与API密钥无关）
+_stores: Dict[str, CandleStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_candle_store(exchange: str) -> CandleStore:
+    """获取指定交易所的共享K线存储"""
+    with _stores_lock:
+        store = _stores.get(exchange)
+        if store is None:
+            store = CandleStore()
+            _stores[exchange] = store
+        return store
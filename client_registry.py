@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from binance.client import Client
+
+from rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+def _build_binance(api_key: str, api_secret: str) -> Client:
+    client = Client(api_key, api_secret)
+    get_rate_limiter('binance').mount(client.session)
+    return client
+
+
+def _check_binance(client: Client):
+    client.get_account()
+
+
+# 交易所 -> (创建客户端, 健康检查)
+CLIENT_FACTORIES: Dict[str, Tuple[Callable[[str, str], Any], Callable[[Any], None]]] = {
+    'binance': (_build_binance, _check_binance),
+}
+
+
+class ClientEntry:
+    """缓存的客户端及其健康状态"""
+
+    def __init__(self, client: Any, secret_hash: str):
+        self.client = client
+        self.secret_hash = secret_hash
+        self.created_at = time.time()
+        self.checked_at: Optional[float] = None
+        self.healthy: Optional[bool] = None
+        self.error: Optional[str] = None
+
+
+class ClientRegistry:
+    """
+    交易所客户端注册表
+
+    每个 (交易所, API key) 只创建一个已认证的客户端并长期复用，
+    健康检查在后台线程中定期执行，不占用请求路径。
+    密钥的secret变化时自动重建，密钥被修改或删除时由调用方调用invalidate清除。
+    """
+
+    def __init__(self, health_interval: float = 300):
+        self.health_interval = health_interval
+        self.entries: Dict[Tuple[str, str], ClientEntry] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    @staticmethod
+    def _hash(api_secret: str) -> str:
+        return hashlib.sha256(api_secret.encode()).hexdigest()
+
+    def get(self, exchange: str, api_key: str, api_secret: str) -> Any:
+        """获取缓存的客户端，不存在或secret已变化时新建"""
+        exchange = exchange.lower()
+        if exchange not in CLIENT_FACTORIES:
+            raise ValueError(f"Unsupported exchange: {exchange}")
+        key = (exchange, api_key)
+        secret_hash = self._hash(api_secret)
+
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry.secret_hash == secret_hash:
+            return entry.client
+
+        # 创建客户端会请求交易所（Client初始化时ping），在锁外执行，避免阻塞其他交易所和密钥
+        logger.info(f"Creating {exchange} client for key {api_key[:6]}...")
+        build, _ = CLIENT_FACTORIES[exchange]
+        created = ClientEntry(build(api_key, api_secret), secret_hash)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.secret_hash == secret_hash:
+                # 其他线程已并发创建并发布，使用已发布的客户端
+                return entry.client
+            entry = self.entries[key] = created
+        # 新建的客户端先同步检查一次（识别受限地区等），之后只在后台检查
+        self.check(exchange, api_key)
+        self._ensure_health_thread()
+        return entry.client
+
+    def invalidate(self, exchange: str, api_key: Optional[str] = None):
+        """清除指定交易所（及API key）的缓存客户端"""
+        exchange = exchange.lower()
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == exchange and api_key in (None, k[1])]:
+                del self.entries[key]
+                logger.info(f"Invalidated {exchange} client for key {key[1][:6]}...")
+
+    def check(self, exchange: str, api_key: str) -> Optional[bool]:
+        """立即对缓存的客户端做一次健康检查，返回是否健康（未缓存时为None）"""
+        with self.lock:
+            entry = self.entries.get((exchange.lower(), api_key))
+        if entry is None:
+            return None
+        _, health_check = CLIENT_FACTORIES[exchange.lower()]
+        try:
+            health_check(entry.client)
+            entry.healthy, entry.error = True, None
+        except Exception as e:
+            if getattr(e, 'status_code', None) in (418, 429):
+                # 被限流不代表密钥失效，保留上次的检查结果
+                logger.warning(f"Health check rate limited for {exchange} key {api_key[:6]}...")
+                return entry.healthy
+            if "restricted location" in str(e).lower():
+                # 受限地区仍保留客户端，由调用方按受限处理
+                entry.client.is_restricted = True
+                entry.healthy, entry.error = True, None
+            else:
+                entry.healthy, entry.error = False, str(e)
+                logger.warning(f"Health check failed for {exchange} key {api_key[:6]}...: {str(e)}")
+        entry.checked_at = time.time()
+        return entry.healthy
+
+    def health(self, exchange: str, api_key: str) -> Tuple[Optional[bool], Optional[str]]:
+        """最近一次健康检查的结果（不请求交易所）：(是否健康, 错误)，未缓存或未检查时为 (None, None)"""
+        with self.lock:
+            entry = self.entries.get((exchange.lower(), api_key))
+        if entry is None:
+            return None, None
+        return entry.healthy, entry.error
+
+    def _ensure_health_thread(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._health_loop, name='client-health', daemon=True)
+            self.thread.start()
+
+    def _health_loop(self):
+        while not self.stop_event.wait(self.health_interval):
+            with self.lock:
+                keys = list(self.entries)
+            for exchange, api_key in keys:
+                self.check(exchange, api_key)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """各缓存客户端的健康状态"""
+        with self.lock:
+            return {
+                f"{exchange}:{api_key[:6]}": {
+                    'healthy': entry.healthy,
+                    'error': entry.error,
+                    'restricted': bool(getattr(entry.client, 'is_restricted', False)),
+                    'created_at': entry.created_at,
+                    'checked_at': entry.checked_at
+                }
+                for (exchange, api_key), entry in self.entries.items()
+            }
+
+
+# 全局客户端注册表
+client_registry = ClientRegistry()
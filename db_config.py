@@ -0,0 +1,65 @@
+import logging
+import os
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = 'sqlite:///trading.db'
+
+
+def get_database_url() -> str:
+    """数据库地址：读取 DATABASE_URL，缺省为本地SQLite"""
+    url = os.getenv('DATABASE_URL') or DEFAULT_DATABASE_URL
+    # 部分托管平台提供的是 postgres:// 前缀，SQLAlchemy 1.4 只识别 postgresql://
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    按数据库类型给出引擎参数
+
+    SQLite: 连接可跨线程使用（Flask请求线程和后台写入线程），锁等待交给busy_timeout。
+    Postgres: 连接池大小、溢出、回收时间可通过环境变量调整，取连接前先ping，
+    避免数据库重启或空闲断开后拿到失效连接。
+    """
+    if is_sqlite(url):
+        return {'connect_args': {'check_same_thread': False}}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_sqlite(engine: Engine):
+    """
+    为SQLite引擎的每个新连接设置 WAL / busy_timeout / synchronous=NORMAL
+
+    WAL模式下读不阻塞写、写不阻塞读，仪表盘查询不再和机器人写入争同一把锁；
+    写写冲突时等待busy_timeout毫秒而不是立即报 database is locked。
+    非SQLite引擎不做任何处理。
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    busy_timeout = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+    logger.info(f"SQLite configured with WAL, busy_timeout={busy_timeout}ms")
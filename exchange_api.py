@@ -1,4 +1,5 @@
 import logging
+import math
 import time
 import hmac
 import hashlib
@@ -7,7 +8,10 @@ from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from typing import Dict, List, Optional, Union
 import json
+from concurrent.futures import ThreadPoolExecutor
 import ccxt
+from candle_store import get_candle_store
+from rate_limiter import get_rate_limiter
 
 # 配置日志
 logging.basicConfig(
@@ -20,12 +24,233 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Binance合约批量接口单次上限：batchOrders下单5个，撤单10个
+BINANCE_BATCH_ORDER_LIMIT = 5
+BINANCE_BATCH_CANCEL_LIMIT = 10
+# 无批量接口时并行发送的最大线程数
+PARALLEL_ORDER_WORKERS = 5
+# 未指定杠杆时下单使用的合约杠杆
+DEFAULT_LEVERAGE = 20
+
+
+def chunked(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def order_result(order: Optional[Dict] = None, error: Optional[str] = None) -> Dict:
+    """批量接口的单个订单结果"""
+    return {'success': error is None, 'order': order, 'error': error}
+
+
+def parse_batch_results(response: List[Dict]) -> List[Dict]:
+    """Binance批量接口的返回数组与请求顺序一致，失败项为 {'code', 'msg'}"""
+    return [
+        order_result(error=item.get('msg', str(item))) if 'code' in item and 'orderId' not in item
+        else order_result(order=item)
+        for item in response
+    ]
+
+
+def get_order_id(order: Dict) -> str:
+    """订单id（Binance为orderId，ccxt为id）"""
+    return str(order.get('orderId', order.get('id')))
+
+
+def parse_binance_positions(positions: List[Dict]) -> List[Dict]:
+    """处理Binance持仓信息"""
+    active_positions = []
+    for position in positions:
+        if float(position['positionAmt']) != 0:
+            active_positions.append({
+                'symbol': position['symbol'],
+                'amount': float(position['positionAmt']),
+                'entry_price': float(position['entryPrice']),
+                'mark_price': float(position['markPrice']),
+                'unrealized_pnl': float(position['unRealizedProfit']),
+                'leverage': float(position['leverage']),
+                'side': 'LONG' if float(position['positionAmt']) > 0 else 'SHORT'
+            })
+    return active_positions
+
+
+def parse_lbank_positions(balance: Dict) -> List[Dict]:
+    """处理LBank持仓信息"""
+    active_positions = []
+    for currency, amount in balance['total'].items():
+        if currency != 'USDT' and amount > 0:
+            active_positions.append({
+                'symbol': f"{currency}/USDT",
+                'amount': float(amount),
+                'entry_price': 0.0,  # LBank可能不支持
+                'mark_price': float(balance['info'].get('markPrice', 0)),
+                'unrealized_pnl': 0.0,  # LBank可能不支持
+                'leverage': 1.0,  # LBank可能不支持
+                'side': 'LONG'
+            })
+    return active_positions
+
+
+def parse_binance_account(account: Dict) -> Dict:
+    """Binance合约账户 -> 余额与持仓"""
+    return {
+        'total_balance': float(account['totalWalletBalance']),
+        'unrealized_pnl': float(account['totalUnrealizedProfit']),
+        'available_balance': float(account['availableBalance']),
+        'positions': parse_binance_positions(account['positions'])
+    }
+
+
+def parse_lbank_balance(balance: Dict) -> Dict:
+    """LBank账户余额 -> 余额与持仓"""
+    return {
+        'total_balance': float(balance['total']['USDT']),
+        'unrealized_pnl': 0.0,  # LBank可能不支持
+        'available_balance': float(balance['free']['USDT']),
+        'positions': parse_lbank_positions(balance)
+    }
+
+
+def binance_kline_params(symbol: str, interval: str, limit: int, since: Optional[int] = None) -> Dict:
+    params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+    if since is not None:
+        params['startTime'] = since
+    return params
+
+
+def parse_klines(klines: List) -> List[List[float]]:
+    """K线 -> [开盘时间, 开, 高, 低, 收, 量]"""
+    return [[float(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])]
+            for k in klines]
+
+
+def binance_order_params(symbol: str, side: str, order_type: str, quantity: float,
+                         price: Optional[float] = None, stop_price: Optional[float] = None) -> Dict:
+    """Binance合约下单参数（未设置的价格不发送）"""
+    params = {
+        'symbol': symbol,
+        'side': side,
+        'type': order_type,
+        'quantity': quantity,
+        'price': price,
+        'stopPrice': stop_price
+    }
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def binance_protective_orders(symbol: str, side: str, stop_loss: Optional[float] = None,
+                              take_profit: Optional[float] = None) -> List[Dict]:
+    """开仓后的止损、止盈平仓单参数"""
+    close_side = 'SELL' if side == 'BUY' else 'BUY'
+    orders = []
+    if stop_loss:
+        orders.append({'symbol': symbol, 'side': close_side, 'type': 'STOP_MARKET',
+                       'stopPrice': stop_loss, 'closePosition': 'true'})
+    if take_profit:
+        orders.append({'symbol': symbol, 'side': close_side, 'type': 'TAKE_PROFIT_MARKET',
+                       'stopPrice': take_profit, 'closePosition': 'true'})
+    return orders
+
+
+def binance_batch_order_params(symbol: str, order: Dict, quantity: float, price: Optional[float]) -> Dict:
+    """batchOrders中的单个订单（数量、价格已按交易规则取整）"""
+    order_type = order.get('order_type', 'LIMIT')
+    params = {
+        'symbol': symbol,
+        'side': order['side'],
+        'type': order_type,
+        'quantity': str(quantity)
+    }
+    if price is not None:
+        params['price'] = str(price)
+    if order_type == 'LIMIT':
+        params['timeInForce'] = order.get('time_in_force', 'GTC')
+    return params
+
+
+def parse_binance_trading_rules(exchange_info: Dict, symbol: str) -> Optional[Dict]:
+    symbol_info = next((s for s in exchange_info['symbols'] if s['symbol'] == symbol), None)
+    if not symbol_info:
+        return None
+    return {
+        'min_qty': float(symbol_info['filters'][1]['minQty']),
+        'max_qty': float(symbol_info['filters'][1]['maxQty']),
+        'step_size': float(symbol_info['filters'][1]['stepSize']),
+        'min_price': float(symbol_info['filters'][0]['minPrice']),
+        'max_price': float(symbol_info['filters'][0]['maxPrice']),
+        'tick_size': float(symbol_info['filters'][0]['tickSize'])
+    }
+
+
+def parse_lbank_trading_rules(market: Optional[Dict]) -> Optional[Dict]:
+    if not market:
+        return None
+    return {
+        'min_qty': float(market['limits']['amount']['min']),
+        'max_qty': float(market['limits']['amount']['max']),
+        'step_size': float(market['precision']['amount']),
+        'min_price': float(market['limits']['price']['min']),
+        'max_price': float(market['limits']['price']['max']),
+        'tick_size': float(market['precision']['price'])
+    }
+
+
+def floor_quantity(quantity: float, rules: Dict) -> float:
+    """按数量步长向下取整，低于最小下单量时返回0"""
+    step = rules.get('step_size')
+    if step:
+        quantity = round(math.floor(quantity / step + 1e-9) * step, 8)
+    if quantity < rules.get('min_qty', 0):
+        return 0.0
+    return quantity
+
+
+def round_to_tick(price: float, rules: Dict) -> float:
+    """按价格精度取整"""
+    tick = rules.get('tick_size')
+    if tick:
+        price = round(round(price / tick) * tick, 8)
+    return price
+
+
+def parse_depth(depth: Dict) -> Dict:
+    return {
+        'bids': [[float(price), float(qty)] for price, qty in depth['bids']],
+        'asks': [[float(price), float(qty)] for price, qty in depth['asks']]
+    }
+
+
+def parse_binance_trades(trades: List[Dict]) -> List[Dict]:
+    return [{
+        'id': trade['id'],
+        'price': float(trade['price']),
+        'qty': float(trade['qty']),
+        'quote_qty': float(trade['quoteQty']),
+        'time': trade['time'],
+        'side': trade['side'],
+        'realized_pnl': float(trade['realizedPnl'])
+    } for trade in trades]
+
+
+def parse_lbank_trades(trades: List[Dict]) -> List[Dict]:
+    return [{
+        'id': trade['id'],
+        'price': float(trade['price']),
+        'qty': float(trade['amount']),
+        'quote_qty': float(trade['cost']),
+        'time': trade['timestamp'],
+        'side': trade['side'],
+        'realized_pnl': 0.0  # LBank可能不支持
+    } for trade in trades]
+
+
 class ExchangeAPI:
     def __init__(self, exchange: str, api_key: str, api_secret: str):
         self.exchange = exchange.lower()
         self.api_key = api_key
         self.api_secret = api_secret
         self.client = None
+        self.candle_store = get_candle_store(self.exchange)
+        self.trading_rules: Dict[str, Dict] = {}  # 交易对 -> 交易规则，首次使用时拉取
         self.initialize_client()
 
     def initialize_client(self):
@@ -33,6 +258,7 @@ class ExchangeAPI:
         try:
             if self.exchange == 'binance':
                 self.client = Client(self.api_key, self.api_secret)
+                get_rate_limiter('binance').mount(self.client.session)
                 logger.info(f"Successfully initialized {self.exchange} client")
             elif self.exchange == 'lbank':
                 self.client = ccxt.lbank({
@@ -40,6 +266,7 @@ class ExchangeAPI:
                     'secret': self.api_secret,
                     'enableRateLimit': True
                 })
+                get_rate_limiter('lbank').mount(self.client.session)
                 logger.info(f"Successfully initialized {self.exchange} client")
             else:
                 logger.error(f"Unsupported exchange: {self.exchange}")
@@ -52,128 +279,52 @@ class ExchangeAPI:
         """获取账户余额"""
         try:
             if self.exchange == 'binance':
-                account = self.client.futures_account()
-                return {
-                    'total_balance': float(account['totalWalletBalance']),
-                    'unrealized_pnl': float(account['totalUnrealizedProfit']),
-                    'available_balance': float(account['availableBalance']),
-                    'positions': self._get_positions(account['positions'])
-                }
+                return parse_binance_account(self.client.futures_account())
             elif self.exchange == 'lbank':
-                balance = self.client.fetch_balance()
-                return {
-                    'total_balance': float(balance['total']['USDT']),
-                    'unrealized_pnl': 0.0,  # LBank可能不支持
-                    'available_balance': float(balance['free']['USDT']),
-                    'positions': self._get_lbank_positions(balance)
-                }
+                return parse_lbank_balance(self.client.fetch_balance())
         except Exception as e:
             logger.error(f"Error getting account balance: {str(e)}")
             raise
 
-    def _get_positions(self, positions: List[Dict]) -> List[Dict]:
-        """处理Binance持仓信息"""
-        active_positions = []
-        for position in positions:
-            if float(position['positionAmt']) != 0:
-                active_positions.append({
-                    'symbol': position['symbol'],
-                    'amount': float(position['positionAmt']),
-                    'entry_price': float(position['entryPrice']),
-                    'mark_price': float(position['markPrice']),
-                    'unrealized_pnl': float(position['unRealizedProfit']),
-                    'leverage': float(position['leverage']),
-                    'side': 'LONG' if float(position['positionAmt']) > 0 else 'SHORT'
-                })
-        return active_positions
-
-    def _get_lbank_positions(self, balance: Dict) -> List[Dict]:
-        """处理LBank持仓信息"""
-        active_positions = []
-        for currency, amount in balance['total'].items():
-            if currency != 'USDT' and amount > 0:
-                active_positions.append({
-                    'symbol': f"{currency}/USDT",
-                    'amount': float(amount),
-                    'entry_price': 0.0,  # LBank可能不支持
-                    'mark_price': float(balance['info'].get('markPrice', 0)),
-                    'unrealized_pnl': 0.0,  # LBank可能不支持
-                    'leverage': 1.0,  # LBank可能不支持
-                    'side': 'LONG'
-                })
-        return active_positions
-
     def get_market_data(self, symbol: str, interval: str = '1m', limit: int = 100) -> List[Dict]:
-        """获取市场数据"""
+        """获取市场数据（经共享K线存储增量更新）"""
         try:
-            if self.exchange == 'binance':
-                klines = self.client.futures_klines(
-                    symbol=symbol,
-                    interval=interval,
-                    limit=limit
-                )
-                return [{
-                    'timestamp': k[0],
-                    'open': float(k[1]),
-                    'high': float(k[2]),
-                    'low': float(k[3]),
-                    'close': float(k[4]),
-                    'volume': float(k[5])
-                } for k in klines]
-            elif self.exchange == 'lbank':
-                ohlcv = self.client.fetch_ohlcv(symbol, interval, limit=limit)
-                return [{
-                    'timestamp': candle[0],
-                    'open': float(candle[1]),
-                    'high': float(candle[2]),
-                    'low': float(candle[3]),
-                    'close': float(candle[4]),
-                    'volume': float(candle[5])
-                } for candle in ohlcv]
+            return self.candle_store.get_candles(symbol, interval, limit, self._fetch_klines)
         except Exception as e:
             logger.error(f"Error getting market data: {str(e)}")
             raise
 
+    def _fetch_klines(self, symbol: str, interval: str, limit: int,
+                      since: Optional[int] = None) -> List[List[float]]:
+        """从交易所拉取K线，since为起始开盘时间（毫秒）"""
+        if self.exchange == 'binance':
+            klines = self.client.futures_klines(**binance_kline_params(symbol, interval, limit, since))
+        elif self.exchange == 'lbank':
+            klines = self.client.fetch_ohlcv(symbol, interval, since=since, limit=limit)
+        else:
+            raise ValueError(f"Unsupported exchange: {self.exchange}")
+        return parse_klines(klines)
+
     def place_order(self, symbol: str, side: str, quantity: float, 
                    order_type: str = 'MARKET', price: Optional[float] = None,
                    stop_price: Optional[float] = None, 
                    stop_loss: Optional[float] = None,
-                   take_profit: Optional[float] = None) -> Dict:
-        """下单"""
+                   take_profit: Optional[float] = None,
+                   leverage: Optional[int] = None) -> Dict:
+        """下单（quantity为基础资产数量，leverage缺省为DEFAULT_LEVERAGE）"""
         try:
             if self.exchange == 'binance':
                 # 设置杠杆
-                self.client.futures_change_leverage(symbol=symbol, leverage=20)
+                self.client.futures_change_leverage(symbol=symbol, leverage=leverage or DEFAULT_LEVERAGE)
                 
                 # 主订单
                 order = self.client.futures_create_order(
-                    symbol=symbol,
-                    side=side,
-                    type=order_type,
-                    quantity=quantity,
-                    price=price,
-                    stopPrice=stop_price
+                    **binance_order_params(symbol, side, order_type, quantity, price, stop_price)
                 )
                 
-                # 设置止损
-                if stop_loss:
-                    self.client.futures_create_order(
-                        symbol=symbol,
-                        side='SELL' if side == 'BUY' else 'BUY',
-                        type='STOP_MARKET',
-                        stopPrice=stop_loss,
-                        closePosition=True
-                    )
-                
-                # 设置止盈
-                if take_profit:
-                    self.client.futures_create_order(
-                        symbol=symbol,
-                        side='SELL' if side == 'BUY' else 'BUY',
-                        type='TAKE_PROFIT_MARKET',
-                        stopPrice=take_profit,
-                        closePosition=True
-                    )
+                # 设置止损、止盈
+                for params in binance_protective_orders(symbol, side, stop_loss, take_profit):
+                    self.client.futures_create_order(**params)
                 
                 logger.info(f"Order placed successfully: {json.dumps(order)}")
                 return order
@@ -211,6 +362,118 @@ class ExchangeAPI:
             logger.error(f"Error cancelling order: {str(e)}")
             raise
 
+    def place_orders(self, symbol: str, orders: List[Dict]) -> List[Dict]:
+        """
+        批量下单
+
+        Binance使用合约batchOrders接口，每批5个，各批并行发送；
+        其他交易所并行逐个下单。单个订单失败不影响其余订单。
+
+        Args:
+            symbol: 交易对
+            orders: 订单列表，每项包含 side、quantity，可选 order_type（默认LIMIT）、price
+
+        Returns:
+            与orders一一对应的结果列表：{'success', 'order', 'error'}
+        """
+        if not orders:
+            return []
+        try:
+            if self.exchange == 'binance':
+                chunks = chunked(orders, BINANCE_BATCH_ORDER_LIMIT)
+                with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                    batches = list(executor.map(lambda chunk: self._place_binance_batch(symbol, chunk), chunks))
+                results = [result for batch in batches for result in batch]
+            else:
+                results = self._run_parallel(
+                    lambda order: self.place_order(
+                        symbol=symbol,
+                        side=order['side'],
+                        quantity=order['quantity'],
+                        order_type=order.get('order_type', 'LIMIT'),
+                        price=order.get('price')
+                    ),
+                    orders
+                )
+            failed = sum(1 for result in results if not result['success'])
+            logger.info(f"Batch placed {len(orders) - failed}/{len(orders)} orders for {symbol}")
+            return results
+        except Exception as e:
+            logger.error(f"Error placing batch orders: {str(e)}")
+            raise
+
+    def _place_binance_batch(self, symbol: str, orders: List[Dict]) -> List[Dict]:
+        batch = [
+            binance_batch_order_params(
+                symbol, order,
+                self.round_quantity(symbol, order['quantity']),
+                self.round_price(symbol, order['price']) if order.get('price') is not None else None
+            )
+            for order in orders
+        ]
+        try:
+            response = self.client.futures_place_batch_order(batchOrders=batch)
+        except Exception as e:
+            # 整批被拒绝（网络错误、限流等），该批每个订单都记为失败
+            return [order_result(error=str(e)) for _ in orders]
+        return parse_batch_results(response)
+
+    def cancel_orders(self, symbol: str, order_ids: List[str]) -> List[Dict]:
+        """
+        批量撤单
+
+        Binance使用合约batchOrders撤单接口，每批10个；其他交易所并行逐个撤单。
+
+        Returns:
+            与order_ids一一对应的结果列表：{'success', 'order', 'error'}
+        """
+        if not order_ids:
+            return []
+        try:
+            if self.exchange == 'binance':
+                results = []
+                for chunk in chunked(list(order_ids), BINANCE_BATCH_CANCEL_LIMIT):
+                    try:
+                        response = self.client.futures_cancel_orders(
+                            symbol=symbol,
+                            orderIdList=json.dumps([int(order_id) for order_id in chunk])
+                        )
+                        results.extend(parse_batch_results(response))
+                    except Exception as e:
+                        results.extend(order_result(error=str(e)) for _ in chunk)
+            else:
+                results = self._run_parallel(lambda order_id: self.cancel_order(symbol, order_id), order_ids)
+            failed = sum(1 for result in results if not result['success'])
+            logger.info(f"Batch cancelled {len(order_ids) - failed}/{len(order_ids)} orders for {symbol}")
+            return results
+        except Exception as e:
+            logger.error(f"Error cancelling batch orders: {str(e)}")
+            raise
+
+    def cancel_all_orders(self, symbol: str) -> List[Dict]:
+        """撤销交易对的全部挂单，结果格式同cancel_orders"""
+        try:
+            if self.exchange == 'binance':
+                open_orders = self.client.futures_get_open_orders(symbol=symbol)
+            else:
+                open_orders = self.client.fetch_open_orders(symbol)
+            return self.cancel_orders(symbol, [get_order_id(order) for order in open_orders])
+        except Exception as e:
+            logger.error(f"Error cancelling all orders: {str(e)}")
+            raise
+
+    @staticmethod
+    def _run_parallel(func, items: List) -> List[Dict]:
+        """无批量接口时并行逐个调用，按输入顺序返回每项结果"""
+        def call(item):
+            try:
+                return order_result(order=func(item))
+            except Exception as e:
+                return order_result(error=str(e))
+
+        with ThreadPoolExecutor(max_workers=min(PARALLEL_ORDER_WORKERS, len(items))) as executor:
+            return list(executor.map(call, items))
+
     def get_order_status(self, symbol: str, order_id: str) -> Dict:
         """获取订单状态"""
         try:
@@ -231,33 +494,31 @@ class ExchangeAPI:
         """获取交易规则"""
         try:
             if self.exchange == 'binance':
-                exchange_info = self.client.futures_exchange_info()
-                symbol_info = next((s for s in exchange_info['symbols'] if s['symbol'] == symbol), None)
-                if symbol_info:
-                    return {
-                        'min_qty': float(symbol_info['filters'][1]['minQty']),
-                        'max_qty': float(symbol_info['filters'][1]['maxQty']),
-                        'step_size': float(symbol_info['filters'][1]['stepSize']),
-                        'min_price': float(symbol_info['filters'][0]['minPrice']),
-                        'max_price': float(symbol_info['filters'][0]['maxPrice']),
-                        'tick_size': float(symbol_info['filters'][0]['tickSize'])
-                    }
+                return parse_binance_trading_rules(self.client.futures_exchange_info(), symbol)
             elif self.exchange == 'lbank':
-                markets = self.client.load_markets()
-                market = markets.get(symbol)
-                if market:
-                    return {
-                        'min_qty': float(market['limits']['amount']['min']),
-                        'max_qty': float(market['limits']['amount']['max']),
-                        'step_size': float(market['precision']['amount']),
-                        'min_price': float(market['limits']['price']['min']),
-                        'max_price': float(market['limits']['price']['max']),
-                        'tick_size': float(market['precision']['price'])
-                    }
+                return parse_lbank_trading_rules(self.client.load_markets().get(symbol))
         except Exception as e:
             logger.error(f"Error getting trading rules: {str(e)}")
             raise
 
+    def round_quantity(self, symbol: str, quantity: float) -> float:
+        """按交易对的数量步长向下取整，低于最小下单量时返回0"""
+        if self.exchange == 'lbank':
+            return float(self.client.amount_to_precision(symbol, quantity))
+        return floor_quantity(quantity, self._rules(symbol))
+
+    def round_price(self, symbol: str, price: float) -> float:
+        """按交易对的价格精度取整"""
+        if self.exchange == 'lbank':
+            return float(self.client.price_to_precision(symbol, price))
+        return round_to_tick(price, self._rules(symbol))
+
+    def _rules(self, symbol: str) -> Dict:
+        rules = self.trading_rules.get(symbol)
+        if rules is None:
+            rules = self.trading_rules[symbol] = self.get_trading_rules(symbol) or {}
+        return rules
+
     def get_funding_rate(self, symbol: str) -> float:
         """获取资金费率"""
         try:
@@ -275,17 +536,9 @@ class ExchangeAPI:
         """获取市场深度"""
         try:
             if self.exchange == 'binance':
-                depth = self.client.futures_order_book(symbol=symbol, limit=limit)
-                return {
-                    'bids': [[float(price), float(qty)] for price, qty in depth['bids']],
-                    'asks': [[float(price), float(qty)] for price, qty in depth['asks']]
-                }
+                return parse_depth(self.client.futures_order_book(symbol=symbol, limit=limit))
             elif self.exchange == 'lbank':
-                depth = self.client.fetch_order_book(symbol, limit)
-                return {
-                    'bids': [[float(price), float(qty)] for price, qty in depth['bids']],
-                    'asks': [[float(price), float(qty)] for price, qty in depth['asks']]
-                }
+                return parse_depth(self.client.fetch_order_book(symbol, limit))
         except Exception as e:
             logger.error(f"Error getting market depth: {str(e)}")
             raise
@@ -294,27 +547,9 @@ class ExchangeAPI:
         """获取最近成交"""
         try:
             if self.exchange == 'binance':
-                trades = self.client.futures_account_trades(symbol=symbol, limit=limit)
-                return [{
-                    'id': trade['id'],
-                    'price': float(trade['price']),
-                    'qty': float(trade['qty']),
-                    'quote_qty': float(trade['quoteQty']),
-                    'time': trade['time'],
-                    'side': trade['side'],
-                    'realized_pnl': float(trade['realizedPnl'])
-                } for trade in trades]
+                return parse_binance_trades(self.client.futures_account_trades(symbol=symbol, limit=limit))
             elif self.exchange == 'lbank':
-                trades = self.client.fetch_my_trades(symbol, limit=limit)
-                return [{
-                    'id': trade['id'],
-                    'price': float(trade['price']),
-                    'qty': float(trade['amount']),
-                    'quote_qty': float(trade['cost']),
-                    'time': trade['timestamp'],
-                    'side': trade['side'],
-                    'realized_pnl': 0.0  # LBank可能不支持
-                } for trade in trades]
+                return parse_lbank_trades(self.client.fetch_my_trades(symbol, limit=limit))
         except Exception as e:
             logger.error(f"Error getting recent trades: {str(e)}")
             raise 
\ No newline at end of file
@@ -4,4 +4,9 @@ timeout = 120
 accesslog = "/root/AI-Trade/logs/gunicorn.access.log"
 errorlog = "/root/AI-Trade/logs/gunicorn.error.log"
 capture_output = True
-enable_stdio_inheritance = True 
\ No newline at end of file
+enable_stdio_inheritance = True 
+
+def post_worker_init(worker):
+    # worker启动后立即启动机器人监督器，不必等待第一个请求
+    from app import start_bot_supervisor
+    start_bot_supervisor()
@@ -0,0 +1,205 @@
+import logging
+import math
+from collections import deque
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+class RollingWindow:
+    """滚动窗口统计（均值/样本标准差），每根K线O(1)更新"""
+
+    # 每推入多少个值后用窗口内数据重新求和，消除累计浮点误差
+    RESYNC_INTERVAL = 1000
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.shift = None  # 以首个值为偏移量求平方和，避免大数相减的精度损失
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.pushes = 0
+
+    def _next_sums(self, value: float) -> Tuple[int, float, float]:
+        """计算推入value之后的计数和偏移累加和（不修改状态）"""
+        shift = value if self.shift is None else self.shift
+        x = value - shift
+        total = self.sum + x
+        total_sq = self.sum_sq + x * x
+        count = len(self.values) + 1
+        if count > self.window:
+            dropped = self.values[0] - shift
+            total -= dropped
+            total_sq -= dropped * dropped
+            count = self.window
+        return count, total, total_sq
+
+    def push(self, value: float):
+        """推入一个已收盘的值"""
+        if self.shift is None:
+            self.shift = value
+        _, self.sum, self.sum_sq = self._next_sums(value)
+        self.values.append(value)
+        self.pushes += 1
+        if self.pushes % self.RESYNC_INTERVAL == 0:
+            self._resync()
+
+    def _resync(self):
+        """按窗口内数据重新计算累加和"""
+        self.sum = math.fsum(v - self.shift for v in self.values)
+        self.sum_sq = math.fsum((v - self.shift) ** 2 for v in self.values)
+
+    def preview(self, value: float) -> Tuple[float, float]:
+        """返回推入value后的(均值, 标准差)，窗口未满时为NaN，与pandas rolling一致"""
+        count, total, total_sq = self._next_sums(value)
+        if count < self.window:
+            return NAN, NAN
+        shift = value if self.shift is None else self.shift
+        mean = total / count + shift
+        if count < 2:
+            return mean, NAN
+        var = (total_sq - total * total / count) / (count - 1)
+        return mean, math.sqrt(max(var, 0.0))
+
+
+class EMAState:
+    """指数移动平均状态，等价于 pandas ewm(span=n, adjust=False)"""
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1)
+        self.value = None
+
+    def preview(self, x: float) -> float:
+        if self.value is None or math.isnan(self.value):
+            return x
+        return (1 - self.alpha) * self.value + self.alpha * x
+
+    def push(self, x: float):
+        self.value = self.preview(x)
+
+
+class IncrementalIndicatorEngine:
+    """
+    增量技术指标引擎
+
+    为单个交易对保存滚动和与EMA状态，新K线收盘时O(1)更新，
+    输出与 StrategyEngine 原先基于 pandas 的计算结果一致的字段：
+    MA20/MA50/MA200、RSI、MACD/Signal/Histogram、布林带。
+
+    传入的K线列表中最后一根视为尚未收盘，只做预览计算不写入状态，
+    因此同一根K线在多次轮询中反复更新也不会污染状态。
+    EMA从引擎首次看到的K线开始递推，与pandas在固定窗口上
+    重新递推的结果差异随窗口长度指数衰减（200根时相对价格约1e-7量级）。
+    """
+
+    def __init__(self,
+                 ma_periods: Tuple[int, ...] = (20, 50, 200),
+                 rsi_period: int = 14,
+                 macd_fast: int = 12,
+                 macd_slow: int = 26,
+                 macd_signal: int = 9,
+                 bb_period: int = 20,
+                 bb_std: float = 2):
+        self.ma_periods = tuple(ma_periods)
+        self.rsi_period = rsi_period
+        self.bb_period = bb_period
+        self.bb_std = bb_std
+        self.macd_fast = macd_fast
+        self.macd_slow = macd_slow
+        self.macd_signal = macd_signal
+        self.reset()
+
+    def reset(self):
+        """清空所有状态"""
+        self.ma_windows = {period: RollingWindow(period) for period in self.ma_periods}
+        self.bb_window = RollingWindow(self.bb_period)
+        self.gain_window = RollingWindow(self.rsi_period)
+        self.loss_window = RollingWindow(self.rsi_period)
+        self.ema_fast = EMAState(self.macd_fast)
+        self.ema_slow = EMAState(self.macd_slow)
+        self.ema_signal = EMAState(self.macd_signal)
+        self.last_close = None
+        self.last_timestamp = None
+
+    def _gain_loss(self, close: float) -> Tuple[float, float]:
+        # 与 delta.where(delta > 0, 0) 一致：第一根K线的差值(NaN)按0处理
+        if self.last_close is None:
+            return 0.0, 0.0
+        delta = close - self.last_close
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def _push(self, candle: Dict):
+        """写入一根已收盘K线"""
+        close = float(candle['close'])
+        gain, loss = self._gain_loss(close)
+        for window in self.ma_windows.values():
+            window.push(close)
+        self.bb_window.push(close)
+        self.gain_window.push(gain)
+        self.loss_window.push(loss)
+
+        macd = self.ema_fast.preview(close) - self.ema_slow.preview(close)
+        self.ema_fast.push(close)
+        self.ema_slow.push(close)
+        self.ema_signal.push(macd)
+
+        self.last_close = close
+        self.last_timestamp = candle['timestamp']
+
+    def _snapshot(self, candle: Dict) -> Dict:
+        """计算以candle为最新K线时的全部指标（不修改状态）"""
+        close = float(candle['close'])
+        result = {k: v for k, v in candle.items() if k != 'timestamp'}
+
+        for period, window in self.ma_windows.items():
+            result[f'MA{period}'] = window.preview(close)[0]
+
+        gain, loss = self._gain_loss(close)
+        avg_gain = self.gain_window.preview(gain)[0]
+        avg_loss = self.loss_window.preview(loss)[0]
+        if math.isnan(avg_gain) or math.isnan(avg_loss) or (avg_gain == 0 and avg_loss == 0):
+            result['RSI'] = NAN
+        elif avg_loss == 0:
+            result['RSI'] = 100.0
+        else:
+            result['RSI'] = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        macd = self.ema_fast.preview(close) - self.ema_slow.preview(close)
+        signal = self.ema_signal.preview(macd)
+        result['MACD'] = macd
+        result['Signal'] = signal
+        result['Histogram'] = macd - signal
+
+        bb_middle, bb_std = self.bb_window.preview(close)
+        result['BB_middle'] = bb_middle
+        result['BB_std'] = bb_std
+        result['BB_upper'] = bb_middle + bb_std * self.bb_std
+        result['BB_lower'] = bb_middle - bb_std * self.bb_std
+        return result
+
+    def update(self, market_data: List[Dict]) -> Dict:
+        """
+        合并最新K线并返回最后一根K线的指标
+
+        Args:
+            market_data: 按时间升序排列的K线列表（包含timestamp/open/high/low/close/volume）
+        """
+        if not market_data:
+            raise ValueError("market_data is empty")
+
+        # 与已有状态不衔接（首次调用、数据断档或时间回退）时重新播种
+        if (self.last_timestamp is None
+                or market_data[0]['timestamp'] > self.last_timestamp
+                or market_data[-1]['timestamp'] <= self.last_timestamp):
+            if self.last_timestamp is not None:
+                logger.info("Indicator state out of sync, reseeding from %d candles", len(market_data))
+            self.reset()
+
+        for candle in market_data[:-1]:
+            if self.last_timestamp is None or candle['timestamp'] > self.last_timestamp:
+                self._push(candle)
+
+        return self._snapshot(market_data[-1])
+
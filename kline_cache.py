@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    """正在进行中的一次加载，其余并发请求等待其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class KlineCache:
+    """
+    K线缓存
+
+    带TTL的LRU缓存，超过max_size时淘汰最久未使用的条目。
+    同一个key同时只会有一次加载，其余并发请求等待该次加载结果。
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.inflight: Dict[Hashable, _InFlight] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """读取缓存，未命中时调用loader加载（空结果不缓存）"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                self.misses += 1
+                call = _InFlight()
+                self.inflight[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = loader()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+                if call.error is None and call.result:
+                    self.entries[key] = (time.monotonic(), call.result)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_size:
+                        self.entries.popitem(last=False)
+            call.event.set()
+
+        return call.result
+
+    def clear(self):
+        """清空缓存（不影响进行中的加载）"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': self.hits / total if total > 0 else 0,
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'inflight': len(self.inflight)
+            }
+
+
+# 全局K线缓存实例
+kline_cache = KlineCache()
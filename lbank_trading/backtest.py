@@ -3,12 +3,14 @@ import numpy as np
 import talib
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-import requests
 import json
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
 from dataclasses import dataclass
 import seaborn as sns
+from .data_store import HistoricalDataStore, DEFAULT_DATA_DIR
+from .lbank_client import lbank_client
+from .indicator_cache import IndicatorCache
 
 @dataclass
 class BacktestResult:
@@ -23,28 +25,100 @@ class BacktestResult:
     trades: List[Dict]
     equity_curve: pd.Series
 
+def derive_trades(signals: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    由信号列推导开平仓位置，等价于逐根K线的状态机：
+    空仓时遇到非零信号开仓，持仓时遇到反向信号平仓（平仓当根不再开仓），
+    第0根K线不参与交易。
+    
+    把非零信号按方向划分为连续段，平仓总发生在下一段的第一个信号上；
+    若该段只有一个信号，则下一次开仓落在再下一段。因此某段是否开仓只取决于
+    它与上一个"长度>=2的段（或第0段）"之间相隔的段数的奇偶。
+    
+    Returns:
+        (开仓下标, 平仓下标, 持仓方向)，最后一笔可能未平仓，此时平仓下标少一个
+    """
+    signals = np.asarray(signals)
+    idx = np.flatnonzero(signals[1:] != 0) + 1
+    return trades_from_points(idx, signals[idx])
+
+def trades_from_points(idx: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    derive_trades 的稀疏版本
+    
+    Args:
+        idx: 非零信号所在下标（升序，不含第0根K线）
+        values: 对应的信号值
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if len(idx) == 0:
+        return empty, empty, empty
+    
+    sides = np.sign(values).astype(np.int64)
+    run_starts = np.flatnonzero(np.r_[True, sides[1:] != sides[:-1]])
+    run_lengths = np.diff(np.r_[run_starts, len(sides)])
+    n_runs = len(run_starts)
+    
+    run_ids = np.arange(n_runs)
+    anchors = np.where((run_lengths >= 2) | (run_ids == 0), run_ids, 0)
+    anchors = np.maximum.accumulate(anchors)
+    has_entry = (run_ids - anchors) % 2 == 0
+    
+    # 上一段也开过仓时，本段第一个信号用于平仓，开仓顺延到第二个信号
+    prev_has_entry = np.r_[False, has_entry[:-1]]
+    entry_runs = run_ids[has_entry]
+    entry_pos = run_starts[entry_runs] + prev_has_entry[entry_runs]
+    exit_runs = entry_runs[entry_runs + 1 < n_runs] + 1
+    
+    return idx[entry_pos], idx[run_starts[exit_runs]], values[entry_pos]
+
+# 策略默认参数，与优化器的参数空间对应
+DEFAULT_PARAMETERS = {
+    'fast_ema': 12,
+    'slow_ema': 26,
+    'rsi_period': 14,
+    'rsi_overbought': 70,
+    'rsi_oversold': 30,
+    'bb_period': 20,
+    'bb_std': 2.0,
+    'stop_loss': 0.02,
+    'take_profit': 0.03
+}
+
 class BacktestEngine:
     def __init__(self, 
                  start_date: str,
                  end_date: str,
                  trading_pair: str,
                  initial_capital: float = 10000,
-                 commission: float = 0.001):
+                 commission: float = 0.001,
+                 interval: str = 'minute1',
+                 data: Optional[pd.DataFrame] = None,
+                 data_dir: str = DEFAULT_DATA_DIR,
+                 indicator_cache: Optional[IndicatorCache] = None):
         """
         初始化回测引擎
         
         Args:
             start_date: 回测开始日期 (YYYY-MM-DD)
-            end_date: 回测结束日期 (YYYY-MM-DD)
+            end_date: 回测结束日期 (YYYY-MM-DD，不含)
             trading_pair: 交易对
             initial_capital: 初始资金
             commission: 手续费率
+            interval: K线周期
+            data: 已加载的K线数据，传入时不再读取本地存储或请求API
+            data_dir: 本地历史数据目录
+            indicator_cache: 指标缓存，必须与data对应同一份数据，多次回测共享以避免重复计算
         """
         self.start_date = datetime.strptime(start_date, '%Y-%m-%d')
         self.end_date = datetime.strptime(end_date, '%Y-%m-%d')
         self.trading_pair = trading_pair
         self.initial_capital = initial_capital
         self.commission = commission
+        self.interval = interval
+        self.data_dir = data_dir
+        self.params = dict(DEFAULT_PARAMETERS)
+        self.indicator_cache = indicator_cache
         
         # 回测结果
         self.positions = []
@@ -53,13 +127,20 @@ class BacktestEngine:
         self.current_capital = initial_capital
         
         # 加载历史数据
-        self.data = self._load_historical_data()
+        self.data = data if data is not None else self._load_historical_data()
         
     def _load_historical_data(self) -> pd.DataFrame:
-        """加载历史K线数据"""
+        """加载历史K线数据（优先读取本地存储）"""
+        df = HistoricalDataStore(self.data_dir).load_frame(
+            self.trading_pair, self.interval, self.start_date, self.end_date
+        )
+        if not df.empty:
+            return df
+        
+        logging.warning(f"No local data for {self.trading_pair} {self.interval}, falling back to LBank API")
+        
         # 这里使用LBank的API获取历史数据
         # 实际使用时需要替换为真实的API调用
-        url = f"https://api.lbank.info/v2/kline"
         params = {
             "symbol": self.trading_pair,
             "size": 1000,
@@ -67,7 +148,7 @@ class BacktestEngine:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = lbank_client.get('kline', params=params)
             data = response.json()
             
             # 转换为DataFrame
@@ -88,54 +169,87 @@ class BacktestEngine:
             logging.error(f"Error loading historical data: {e}")
             return pd.DataFrame()
             
+    def set_parameters(self, params: Dict):
+        """
+        设置策略参数，未指定的参数保持默认值
+        
+        stop_loss/take_profit 目前只记录，信号回测按反向信号平仓。
+        """
+        unknown = set(params) - set(DEFAULT_PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown parameters: {sorted(unknown)}")
+        self.params.update(params)
+            
+    def _cached(self, name: str, params: Tuple, compute) -> np.ndarray:
+        """通过指标缓存计算，未设置缓存时直接计算"""
+        if self.indicator_cache is None:
+            return compute()
+        return self.indicator_cache.get(name, params, compute)
+        
     def calculate_indicators(self) -> pd.DataFrame:
         """计算技术指标"""
-        df = self.data.copy()
+        df = self.data.copy(deep=False)
+        params = self.params
+        close = self._cached('close', (), lambda: np.ascontiguousarray(self.data['close'], dtype=np.float64))
         
         # 计算EMA
-        df['fast_ema'] = talib.EMA(df['close'], timeperiod=12)
-        df['slow_ema'] = talib.EMA(df['close'], timeperiod=26)
+        df['fast_ema'] = self._cached('ema', (params['fast_ema'],),
+                                      lambda: talib.EMA(close, timeperiod=params['fast_ema']))
+        df['slow_ema'] = self._cached('ema', (params['slow_ema'],),
+                                      lambda: talib.EMA(close, timeperiod=params['slow_ema']))
         
         # 计算RSI
-        df['rsi'] = talib.RSI(df['close'], timeperiod=14)
-        
-        # 计算布林带
-        df['bb_upper'], df['bb_middle'], df['bb_lower'] = talib.BBANDS(
-            df['close'],
-            timeperiod=20,
-            nbdevup=2,
-            nbdevdn=2
-        )
+        df['rsi'] = self._cached('rsi', (params['rsi_period'],),
+                                 lambda: talib.RSI(close, timeperiod=params['rsi_period']))
+        
+        # 计算布林带：中轨和标准差只依赖周期，按倍数组合上下轨
+        bb_middle = self._cached('sma', (params['bb_period'],),
+                                 lambda: talib.SMA(close, timeperiod=params['bb_period']))
+        bb_dev = self._cached('stddev', (params['bb_period'],),
+                              lambda: talib.STDDEV(close, timeperiod=params['bb_period'], nbdev=1))
+        df['bb_upper'] = bb_middle + params['bb_std'] * bb_dev
+        df['bb_middle'] = bb_middle
+        df['bb_lower'] = bb_middle - params['bb_std'] * bb_dev
         
         return df
         
     def generate_signals(self, df: pd.DataFrame) -> pd.DataFrame:
         """生成交易信号"""
-        df['signal'] = 0
+        params = self.params
         
         # 趋势信号
-        df['trend_signal'] = np.where(df['fast_ema'] > df['slow_ema'], 1, -1)
+        trend_signal = self._cached(
+            'trend_signal', (params['fast_ema'], params['slow_ema']),
+            lambda: np.where(df['fast_ema'].to_numpy() > df['slow_ema'].to_numpy(), 1, -1).astype(np.int8)
+        )
         
         # RSI信号
-        df['rsi_signal'] = 0
-        df.loc[df['rsi'] < 30, 'rsi_signal'] = 1
-        df.loc[df['rsi'] > 70, 'rsi_signal'] = -1
+        def rsi_signal():
+            rsi = df['rsi'].to_numpy()
+            return np.where(rsi < params['rsi_oversold'], 1,
+                            np.where(rsi > params['rsi_overbought'], -1, 0)).astype(np.int8)
+        rsi_signal = self._cached(
+            'rsi_signal', (params['rsi_period'], params['rsi_oversold'], params['rsi_overbought']), rsi_signal
+        )
         
         # 布林带信号
-        df['bb_signal'] = 0
-        df.loc[df['close'] < df['bb_lower'], 'bb_signal'] = 1
-        df.loc[df['close'] > df['bb_upper'], 'bb_signal'] = -1
+        close = df['close'].to_numpy()
+        bb_signal = np.where(close < df['bb_lower'].to_numpy(), 1,
+                             np.where(close > df['bb_upper'].to_numpy(), -1, 0))
         
         # 综合信号
+        df['trend_signal'] = trend_signal
+        df['rsi_signal'] = rsi_signal
+        df['bb_signal'] = bb_signal
         df['signal'] = np.where(
-            (df['trend_signal'] == 1) & 
-            (df['rsi_signal'] == 1) & 
-            (df['bb_signal'] == 1),
+            (trend_signal == 1) & 
+            (rsi_signal == 1) & 
+            (bb_signal == 1),
             1,
             np.where(
-                (df['trend_signal'] == -1) & 
-                (df['rsi_signal'] == -1) & 
-                (df['bb_signal'] == -1),
+                (trend_signal == -1) & 
+                (rsi_signal == -1) & 
+                (bb_signal == -1),
                 -1,
                 0
             )
@@ -149,61 +263,51 @@ class BacktestEngine:
         df = self.calculate_indicators()
         df = self.generate_signals(df)
         
-        # 初始化回测变量
-        position = 0
-        entry_price = 0
-        entry_time = None
-        
-        # 遍历数据
-        for i in range(1, len(df)):
-            current_price = df['close'].iloc[i]
-            current_time = df.index[i]
-            signal = df['signal'].iloc[i]
-            
-            # 开仓
-            if signal != 0 and position == 0:
-                position = signal
-                entry_price = current_price
-                entry_time = current_time
-                self.positions.append({
-                    'type': 'entry',
-                    'time': current_time,
-                    'price': current_price,
-                    'position': position
-                })
-                
-            # 平仓
-            elif position != 0 and (
-                (position == 1 and signal == -1) or
-                (position == -1 and signal == 1)
-            ):
-                # 计算收益
-                pnl = (current_price - entry_price) * position
-                commission = abs(pnl) * self.commission
-                net_pnl = pnl - commission
-                
-                # 更新资金
-                self.current_capital += net_pnl
-                
-                # 记录交易
-                self.trades.append({
-                    'entry_time': entry_time,
-                    'exit_time': current_time,
-                    'entry_price': entry_price,
-                    'exit_price': current_price,
-                    'position': position,
-                    'pnl': pnl,
-                    'commission': commission,
-                    'net_pnl': net_pnl
-                })
-                
-                # 重置仓位
-                position = 0
-                entry_price = 0
-                entry_time = None
-                
-            # 记录权益曲线
-            self.equity_curve.append(self.current_capital)
+        prices = df['close'].to_numpy()
+        signals = df['signal'].to_numpy()
+        times = df.index
+        
+        # 由信号序列直接推导开平仓位置
+        entry_idx, exit_idx, positions = derive_trades(signals)
+        
+        # 记录开仓
+        for i, position in zip(entry_idx, positions):
+            self.positions.append({
+                'type': 'entry',
+                'time': times[i],
+                'price': prices[i],
+                'position': position
+            })
+        
+        # 计算已平仓交易的收益
+        n_closed = len(exit_idx)
+        entry_price = prices[entry_idx[:n_closed]]
+        exit_price = prices[exit_idx]
+        position = positions[:n_closed]
+        pnl = (exit_price - entry_price) * position
+        commission = np.abs(pnl) * self.commission
+        net_pnl = pnl - commission
+        
+        for k in range(n_closed):
+            self.trades.append({
+                'entry_time': times[entry_idx[k]],
+                'exit_time': times[exit_idx[k]],
+                'entry_price': entry_price[k],
+                'exit_price': exit_price[k],
+                'position': position[k],
+                'pnl': pnl[k],
+                'commission': commission[k],
+                'net_pnl': net_pnl[k]
+            })
+        
+        # 权益曲线：首个元素放入当前资金再累加，保证与逐笔累加的舍入一致
+        if len(df) > 1:
+            capital_changes = np.zeros(len(df))
+            capital_changes[0] = self.current_capital
+            capital_changes[exit_idx] = net_pnl
+            equity = np.cumsum(capital_changes)[1:]
+            self.current_capital = equity[-1]
+            self.equity_curve.extend(equity.tolist())
             
         # 计算回测结果
         return self._calculate_results()
@@ -313,6 +417,7 @@ class BacktestEngine:
         print(f"夏普比率: {result.sharpe_ratio:.2f}")
         
 if __name__ == "__main__":
+    # 使用包内相对导入，需在仓库根目录以模块方式运行：python -m lbank_trading.backtest
     # 设置日志
     logging.basicConfig(level=logging.INFO)
     
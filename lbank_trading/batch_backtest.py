@@ -0,0 +1,172 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import talib
+
+from .backtest import trades_from_points
+from .indicator_cache import IndicatorCache
+
+# 参与信号计算的参数（参数矩阵的列顺序）；stop_loss/take_profit 不影响信号回测，不在此列
+BATCH_PARAMETERS = (
+    'fast_ema',
+    'slow_ema',
+    'rsi_period',
+    'rsi_overbought',
+    'rsi_oversold',
+    'bb_period',
+    'bb_std'
+)
+
+METRICS = (
+    'total_trades',
+    'winning_trades',
+    'losing_trades',
+    'win_rate',
+    'profit_factor',
+    'total_return',
+    'max_drawdown',
+    'sharpe_ratio'
+)
+
+# 每个分块中信号矩阵的最大元素数（参数组数 x K线数），约对应几百MB的临时布尔矩阵
+DEFAULT_MAX_CELLS = 32 * 1024 * 1024
+
+
+class BatchBacktester:
+    """
+    批量回测
+
+    参数组按行堆叠为二维矩阵（列顺序见BATCH_PARAMETERS），
+    每个分块一次性在价格数组上计算所有参数组的信号矩阵，再逐行由稀疏的信号点推导交易和收益。
+    结果与 BacktestEngine 逐组回测得到的统计一致。
+    """
+
+    def __init__(self,
+                 data: pd.DataFrame,
+                 initial_capital: float = 10000,
+                 commission: float = 0.001,
+                 indicator_cache: Optional[IndicatorCache] = None,
+                 max_cells: int = DEFAULT_MAX_CELLS):
+        """
+        Args:
+            data: K线数据
+            initial_capital: 初始资金
+            commission: 手续费率
+            indicator_cache: 指标缓存，可与同一份数据上的 BacktestEngine 共享
+            max_cells: 每个分块信号矩阵的元素上限，控制内存占用
+        """
+        self.data = data
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.indicator_cache = indicator_cache if indicator_cache is not None else IndicatorCache()
+        self.max_cells = max_cells
+        self.close = self.indicator_cache.get(
+            'close', (), lambda: np.ascontiguousarray(data['close'], dtype=np.float64)
+        )
+
+    @property
+    def chunk_size(self) -> int:
+        """每个分块的参数组数"""
+        return max(1, self.max_cells // max(len(self.close), 1))
+
+    def _ema(self, period: int) -> np.ndarray:
+        return self.indicator_cache.get('ema', (period,), lambda: talib.EMA(self.close, timeperiod=period))
+
+    def _rsi(self, period: int) -> np.ndarray:
+        return self.indicator_cache.get('rsi', (period,), lambda: talib.RSI(self.close, timeperiod=period))
+
+    def _bands(self, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        middle = self.indicator_cache.get('sma', (period,), lambda: talib.SMA(self.close, timeperiod=period))
+        dev = self.indicator_cache.get('stddev', (period,),
+                                       lambda: talib.STDDEV(self.close, timeperiod=period, nbdev=1))
+        return middle, dev
+
+    def evaluate(self, params: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        批量回测
+
+        Args:
+            params: 形状为(参数组数, len(BATCH_PARAMETERS))的参数矩阵
+
+        Returns:
+            各统计指标（见METRICS）的一维数组，与参数矩阵的行一一对应
+        """
+        params = np.asarray(params, dtype=np.float64).reshape(-1, len(BATCH_PARAMETERS))
+        results = {name: np.zeros(len(params)) for name in METRICS}
+        for start in range(0, len(params), self.chunk_size):
+            self._evaluate_chunk(params[start:start + self.chunk_size], results, start)
+        return results
+
+    def _signal_matrix(self, params: np.ndarray) -> np.ndarray:
+        """计算分块内所有参数组的信号矩阵，相同的指标条件只计算一次"""
+        close = self.close
+        trend_keys, trend_rows = np.unique(params[:, [0, 1]], axis=0, return_inverse=True)
+        rsi_keys, rsi_rows = np.unique(params[:, [2, 3, 4]], axis=0, return_inverse=True)
+        bb_keys, bb_rows = np.unique(params[:, [5, 6]], axis=0, return_inverse=True)
+
+        trend_up = np.stack([self._ema(int(f)) > self._ema(int(s)) for f, s in trend_keys])
+        rsi_long = np.empty((len(rsi_keys), len(close)), dtype=bool)
+        rsi_short = np.empty_like(rsi_long)
+        for k, (period, ob, os_) in enumerate(rsi_keys):
+            rsi = self._rsi(int(period))
+            rsi_long[k] = rsi < os_
+            rsi_short[k] = rsi > ob
+        bb_long = np.empty((len(bb_keys), len(close)), dtype=bool)
+        bb_short = np.empty_like(bb_long)
+        for k, (period, std) in enumerate(bb_keys):
+            middle, dev = self._bands(int(period))
+            bb_long[k] = close < middle - std * dev
+            bb_short[k] = close > middle + std * dev
+
+        trend_rows, rsi_rows, bb_rows = trend_rows.ravel(), rsi_rows.ravel(), bb_rows.ravel()
+        longs = trend_up[trend_rows] & rsi_long[rsi_rows] & bb_long[bb_rows]
+        shorts = ~trend_up[trend_rows] & rsi_short[rsi_rows] & bb_short[bb_rows]
+        signals = longs.view(np.int8) - shorts.view(np.int8)
+        # 第0根K线不参与交易
+        signals[:, 0] = 0
+        return signals
+
+    def _evaluate_chunk(self, params: np.ndarray, results: Dict[str, np.ndarray], offset: int):
+        prices = self.close
+        signals = self._signal_matrix(params)
+        rows, cols = np.nonzero(signals)
+        bounds = np.searchsorted(rows, np.arange(len(params) + 1))
+
+        for k in range(len(params)):
+            idx = cols[bounds[k]:bounds[k + 1]]
+            entry_idx, exit_idx, positions = trades_from_points(idx, signals[k, idx])
+            n_closed = len(exit_idx)
+            if n_closed == 0:
+                continue
+
+            pnl = (prices[exit_idx] - prices[entry_idx[:n_closed]]) * positions[:n_closed]
+            net_pnl = pnl - np.abs(pnl) * self.commission
+            for name, value in zip(METRICS, self._statistics(net_pnl)):
+                results[name][offset + k] = value
+
+    def _statistics(self, net_pnl: np.ndarray) -> Tuple[float, ...]:
+        """由已平仓交易的净收益计算统计指标，口径与 BacktestEngine._calculate_results 一致"""
+        total_trades = len(net_pnl)
+        wins = net_pnl > 0
+        winning_trades = int(wins.sum())
+        losing_trades = total_trades - winning_trades
+
+        total_profit = net_pnl[wins].sum()
+        total_loss = abs(net_pnl[~wins].sum())
+        profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
+
+        # 权益只在平仓时变化，首个点为初始资金
+        equity = np.cumsum(np.r_[self.initial_capital, net_pnl])
+        total_return = (equity[-1] - self.initial_capital) / self.initial_capital
+        rolling_max = np.maximum.accumulate(equity)
+        max_drawdown = abs(((equity - rolling_max) / rolling_max).min())
+
+        if total_trades > 1:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sharpe_ratio = np.sqrt(252) * net_pnl.mean() / net_pnl.std(ddof=1)
+        else:
+            sharpe_ratio = 0
+
+        return (total_trades, winning_trades, losing_trades, winning_trades / total_trades,
+                profit_factor, total_return, max_drawdown, sharpe_ratio)
@@ -0,0 +1,229 @@
+import os
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from .lbank_client import lbank_client
+
+# 列顺序：开盘时间(ms)、开、高、低、收、量
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+DEFAULT_DATA_DIR = os.getenv('BACKTEST_DATA_DIR', 'data/klines')
+
+LBANK_KLINE_URL = 'https://api.lbank.info/v2/kline.do'
+
+# LBank K线类型及对应的秒数
+LBANK_INTERVALS = {
+    'minute1': 60,
+    'minute5': 5 * 60,
+    'minute15': 15 * 60,
+    'minute30': 30 * 60,
+    'hour1': 60 * 60,
+    'hour4': 4 * 60 * 60,
+    'hour8': 8 * 60 * 60,
+    'hour12': 12 * 60 * 60,
+    'day1': 24 * 60 * 60,
+    'week1': 7 * 24 * 60 * 60,
+}
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+DateLike = Union[str, datetime]
+
+
+def _to_ms(value: DateLike) -> int:
+    """日期(YYYY-MM-DD或datetime，按UTC)转换为毫秒时间戳"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def to_frame(data: np.ndarray) -> pd.DataFrame:
+    """(n, 6)数组转换为回测引擎使用的DataFrame（以时间为索引，不拷贝数值列）"""
+    index = pd.to_datetime(data[:, 0], unit='ms')
+    index.name = 'timestamp'
+    return pd.DataFrame(data[:, 1:], index=index, columns=COLUMNS[1:], copy=False)
+
+
+def to_array(df: pd.DataFrame) -> np.ndarray:
+    """回测DataFrame转换回(n, 6)数组，列顺序见COLUMNS"""
+    data = np.empty((len(df), len(COLUMNS)), dtype=np.float64)
+    data[:, 0] = (df.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    data[:, 1:] = df[COLUMNS[1:]].to_numpy(dtype=np.float64)
+    return data
+
+
+class HistoricalDataStore:
+    """
+    本地历史K线存储
+
+    目录结构：{root}/{symbol}/{interval}/{YYYY-MM-DD}.npy，
+    每个文件是一天的(n, 6) float64数组，列顺序见COLUMNS。
+    读取时以内存映射方式打开，只加载查询区间覆盖的分区。
+    """
+
+    def __init__(self, root: str = DEFAULT_DATA_DIR):
+        self.root = root
+
+    def _partition_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol, interval)
+
+    def _partition_path(self, symbol: str, interval: str, day_ms: int) -> str:
+        day = datetime.fromtimestamp(day_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+        return os.path.join(self._partition_dir(symbol, interval), f"{day}.npy")
+
+    def days(self, symbol: str, interval: str) -> List[str]:
+        """已存储的日期分区"""
+        directory = self._partition_dir(symbol, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.npy'))
+
+    def write(self, symbol: str, interval: str, rows: np.ndarray) -> int:
+        """按天写入K线，与已有分区合并（同一时间戳以新数据为准），返回写入的行数"""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+        if len(rows) == 0:
+            return 0
+        os.makedirs(self._partition_dir(symbol, interval), exist_ok=True)
+
+        day_keys = (rows[:, 0] // DAY_MS).astype(np.int64)
+        for day in np.unique(day_keys):
+            path = self._partition_path(symbol, interval, int(day) * DAY_MS)
+            new_rows = rows[day_keys == day]
+            if os.path.exists(path):
+                new_rows = np.concatenate((np.load(path), new_rows))
+            # 倒序去重保留最后写入的数据，再按时间排序
+            _, keep = np.unique(new_rows[::-1, 0], return_index=True)
+            merged = new_rows[::-1][keep]
+
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, merged)
+            os.replace(tmp_path, path)
+        return len(rows)
+
+    def load(self, symbol: str, interval: str, start: DateLike, end: DateLike) -> np.ndarray:
+        """
+        读取[start, end)区间的K线
+
+        只打开区间覆盖的日期分区；区间落在单个分区内时返回内存映射视图，不发生拷贝。
+        """
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        parts = []
+        for day in range(start_ms // DAY_MS, (end_ms - 1) // DAY_MS + 1):
+            path = self._partition_path(symbol, interval, day * DAY_MS)
+            if not os.path.exists(path):
+                continue
+            part = np.load(path, mmap_mode='r')
+            ts = part[:, 0]
+            lo = np.searchsorted(ts, start_ms, side='left')
+            hi = np.searchsorted(ts, end_ms, side='left')
+            if hi > lo:
+                parts.append(part[lo:hi])
+
+        if not parts:
+            return np.empty((0, len(COLUMNS)), dtype=np.float64)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def load_frame(self, symbol: str, interval: str, start: DateLike, end: DateLike) -> pd.DataFrame:
+        """读取区间K线为回测引擎使用的DataFrame（以时间为索引，不拷贝数值列）"""
+        return to_frame(self.load(symbol, interval, start, end))
+
+    def download(self, symbol: str, interval: str, start: DateLike, end: DateLike,
+                 batch_size: int = 2000, pause: float = 0.2) -> int:
+        """从LBank批量下载[start, end)区间的K线并写入本地，返回下载的行数"""
+        if interval not in LBANK_INTERVALS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        step_ms = LBANK_INTERVALS[interval] * 1000
+        cursor, end_ms = _to_ms(start), _to_ms(end)
+        total = 0
+
+        while cursor < end_ms:
+            response = lbank_client.get(LBANK_KLINE_URL, params={
+                'symbol': symbol,
+                'size': batch_size,
+                'type': interval,
+                'time': cursor // 1000
+            }, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+            if not data.get('result', True):
+                raise Exception(f"LBank API error: {data.get('error_code', 'Unknown error')}")
+
+            # LBank返回 [秒级时间戳, 开, 高, 低, 收, 量]
+            rows = np.asarray([k[:6] for k in data.get('data') or []], dtype=np.float64).reshape(-1, len(COLUMNS))
+            if len(rows) == 0:
+                break
+            rows[:, 0] *= 1000
+            rows = rows[(rows[:, 0] >= cursor) & (rows[:, 0] < end_ms)]
+            if len(rows) == 0:
+                break
+
+            total += self.write(symbol, interval, rows)
+            cursor = int(rows[:, 0].max()) + step_ms
+            logging.info(f"Downloaded {total} {interval} candles for {symbol} up to "
+                         f"{datetime.fromtimestamp(cursor / 1000, tz=timezone.utc)}")
+            time.sleep(pause)
+
+        return total
+
+    def import_csv(self, symbol: str, interval: str, path: str) -> int:
+        """
+        从CSV导入K线
+
+        CSV需包含 timestamp/open/high/low/close/volume 列，
+        timestamp可以是毫秒时间戳或可解析的日期时间字符串（按UTC）。
+        """
+        df = pd.read_csv(path)
+        if not pd.api.types.is_numeric_dtype(df['timestamp']):
+            timestamps = pd.to_datetime(df['timestamp'], utc=True)
+            df['timestamp'] = (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)
+        return self.write(symbol, interval, df[COLUMNS].to_numpy(dtype=np.float64))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回测历史数据管理')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='数据目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    download_parser = subparsers.add_parser('download', help='从LBank批量下载K线')
+    download_parser.add_argument('--symbol', required=True, help='交易对，如 btc_usdt')
+    download_parser.add_argument('--interval', default='minute1', choices=sorted(LBANK_INTERVALS))
+    download_parser.add_argument('--start', required=True, help='开始日期 YYYY-MM-DD')
+    download_parser.add_argument('--end', required=True, help='结束日期 YYYY-MM-DD（不含）')
+
+    import_parser = subparsers.add_parser('import', help='从CSV导入K线')
+    import_parser.add_argument('--symbol', required=True)
+    import_parser.add_argument('--interval', default='minute1')
+    import_parser.add_argument('--file', required=True, help='CSV文件路径')
+
+    list_parser = subparsers.add_parser('list', help='列出已存储的日期分区')
+    list_parser.add_argument('--symbol', required=True)
+    list_parser.add_argument('--interval', default='minute1')
+
+    args = parser.parse_args()
+    store = HistoricalDataStore(args.data_dir)
+
+    if args.command == 'download':
+        count = store.download(args.symbol, args.interval, args.start, args.end)
+        print(f"已下载 {count} 根K线")
+    elif args.command == 'import':
+        count = store.import_csv(args.symbol, args.interval, args.file)
+        print(f"已导入 {count} 根K线")
+    elif args.command == 'list':
+        for day in store.days(args.symbol, args.interval):
+            print(day)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import numpy as np
+
+# 默认内存预算：256MB，约可容纳一年1分钟K线的60列float64指标
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class IndicatorCache:
+    """
+    指标缓存
+
+    针对同一份K线数据，按(指标名, 参数)缓存计算好的NumPy数组，
+    总占用超过max_bytes时淘汰最久未使用的条目。
+    缓存的数组设为只读，调用方需要修改时应自行拷贝。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, Hashable], np.ndarray]" = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name: str, params: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """读取指标，未命中时调用compute计算并缓存"""
+        key = (name, params)
+        with self.lock:
+            array = self.entries.get(key)
+            if array is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return array
+            self.misses += 1
+
+        array = np.asarray(compute())
+        array.setflags(write=False)
+        if array.nbytes > self.max_bytes:
+            return array
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = array
+                self.nbytes += array.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return array
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total > 0 else 0,
+                'size': len(self.entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes
+            }
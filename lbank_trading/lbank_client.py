@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+LBANK_BASE_URL = 'https://api.lbank.info/v2'
+
+
+class LBankClient:
+    """
+    LBank REST客户端
+
+    所有请求共用一个带连接池的 requests.Session，保持长连接，
+    避免每次调用都重新建立TCP+TLS连接；并按接口记录请求耗时。
+    """
+
+    def __init__(self,
+                 base_url: str = LBANK_BASE_URL,
+                 pool_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None,
+                 latency_samples: int = 1000):
+        """
+        Args:
+            base_url: API根地址
+            pool_size: 连接池大小（默认读取 LBANK_POOL_SIZE，缺省10）
+            connect_timeout: 连接超时秒数（默认读取 LBANK_CONNECT_TIMEOUT，缺省3.05）
+            read_timeout: 读取超时秒数（默认读取 LBANK_READ_TIMEOUT，缺省10）
+            latency_samples: 每个接口保留的耗时样本数
+        """
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size or int(os.getenv('LBANK_POOL_SIZE', '10'))
+        self.timeout = (
+            connect_timeout or float(os.getenv('LBANK_CONNECT_TIMEOUT', '3.05')),
+            read_timeout or float(os.getenv('LBANK_READ_TIMEOUT', '10'))
+        )
+        self.latency_samples = latency_samples
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.lock = threading.Lock()
+        self.latency: Dict[str, deque] = {}
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def url(self, path: str) -> str:
+        if path.startswith('http'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """发送请求，path可以是相对base_url的路径或完整URL；未指定timeout时使用默认超时"""
+        kwargs.setdefault('timeout', self.timeout)
+        endpoint = path.split('?')[0].replace(self.base_url, '').lstrip('/')
+        started = time.perf_counter()
+        error = False
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+            error = response.status_code >= 400
+            return response
+        except requests.RequestException:
+            error = True
+            raise
+        finally:
+            self._record(f"{method.upper()} {endpoint}", time.perf_counter() - started, error)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def _record(self, endpoint: str, elapsed: float, error: bool):
+        with self.lock:
+            samples = self.latency.get(endpoint)
+            if samples is None:
+                samples = self.latency[endpoint] = deque(maxlen=self.latency_samples)
+                self.counts[endpoint] = {'requests': 0, 'errors': 0}
+            samples.append(elapsed)
+            self.counts[endpoint]['requests'] += 1
+            self.counts[endpoint]['errors'] += int(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """各接口的请求数、错误数及耗时分位数（毫秒）"""
+        with self.lock:
+            snapshot = {endpoint: (list(samples), dict(self.counts[endpoint]))
+                        for endpoint, samples in self.latency.items()}
+        endpoints = {}
+        for endpoint, (samples, counts) in snapshot.items():
+            values = np.array(samples) * 1000
+            endpoints[endpoint] = {
+                **counts,
+                'latency_p50_ms': float(np.percentile(values, 50)),
+                'latency_p99_ms': float(np.percentile(values, 99)),
+                'latency_max_ms': float(values.max())
+            }
+        return {'pool_size': self.pool_size, 'timeout': list(self.timeout), 'endpoints': endpoints}
+
+    def close(self):
+        self.session.close()
+
+
+# 全局LBank客户端实例
+lbank_client = LBankClient()
@@ -1,6 +1,9 @@
+import os
+import shutil
+import tempfile
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 from dataclasses import dataclass
 import logging
 from sklearn.model_selection import ParameterGrid
@@ -14,6 +17,9 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
 from .backtest import BacktestEngine, BacktestResult
+from .data_store import DEFAULT_DATA_DIR, to_array, to_frame
+from .indicator_cache import IndicatorCache, DEFAULT_MAX_BYTES
+from .batch_backtest import BatchBacktester, BATCH_PARAMETERS, DEFAULT_MAX_CELLS
 
 @dataclass
 class OptimizationResult:
@@ -27,7 +33,11 @@ class StrategyOptimizer:
                  trading_pair: str,
                  start_date: str,
                  end_date: str,
-                 initial_capital: float = 10000):
+                 initial_capital: float = 10000,
+                 interval: str = 'minute1',
+                 data_dir: str = DEFAULT_DATA_DIR,
+                 data: Optional[pd.DataFrame] = None,
+                 indicator_cache_bytes: int = DEFAULT_MAX_BYTES):
         """
         初始化策略优化器
         
@@ -36,11 +46,31 @@ class StrategyOptimizer:
             start_date: 优化开始日期
             end_date: 优化结束日期
             initial_capital: 初始资金
+            interval: K线周期
+            data_dir: 本地历史数据目录
+            data: 已加载的K线数据，传入时不再重新加载
+            indicator_cache_bytes: 指标缓存的内存上限（并行优化时每个工作进程各自一份）
         """
         self.trading_pair = trading_pair
         self.start_date = start_date
         self.end_date = end_date
         self.initial_capital = initial_capital
+        self.interval = interval
+        
+        # 只加载一次历史数据，所有试验共享
+        if data is None:
+            data = BacktestEngine(
+                start_date=start_date,
+                end_date=end_date,
+                trading_pair=trading_pair,
+                initial_capital=initial_capital,
+                interval=interval,
+                data_dir=data_dir
+            ).data
+        self.data = data
+        
+        # 同一份数据上的指标按参数缓存，参数相同的试验直接复用
+        self.indicator_cache = IndicatorCache(indicator_cache_bytes)
         
         # 定义参数空间
         self.param_space = {
@@ -58,10 +88,9 @@ class StrategyOptimizer:
         # 初始化优化历史
         self.optimization_history = []
         
-    def objective(self, trial: optuna.Trial) -> float:
-        """优化目标函数"""
-        # 生成参数
-        params = {
+    def suggest_parameters(self, trial: optuna.Trial) -> Dict[str, Any]:
+        """从试验中采样一组参数"""
+        return {
             'fast_ema': trial.suggest_int('fast_ema', 5, 20),
             'slow_ema': trial.suggest_int('slow_ema', 20, 50),
             'rsi_period': trial.suggest_int('rsi_period', 10, 30),
@@ -73,12 +102,16 @@ class StrategyOptimizer:
             'take_profit': trial.suggest_float('take_profit', 0.02, 0.04)
         }
         
-        # 运行回测
+    def evaluate(self, params: Dict[str, Any]) -> Dict[str, float]:
+        """用一组参数运行回测，返回评分及主要指标"""
         backtest = BacktestEngine(
             start_date=self.start_date,
             end_date=self.end_date,
             trading_pair=self.trading_pair,
-            initial_capital=self.initial_capital
+            initial_capital=self.initial_capital,
+            interval=self.interval,
+            data=self.data,
+            indicator_cache=self.indicator_cache
         )
         
         # 设置参数
@@ -87,41 +120,68 @@ class StrategyOptimizer:
         # 运行回测
         result = backtest.run_backtest()
         
-        # 计算优化目标（综合评分）
-        score = self._calculate_score(result)
-        
-        # 记录优化历史
-        self.optimization_history.append({
-            'params': params,
-            'score': score,
+        return {
+            'score': self._calculate_score(result),
             'total_return': result.total_return,
             'max_drawdown': result.max_drawdown,
             'sharpe_ratio': result.sharpe_ratio,
             'win_rate': result.win_rate
-        })
+        }
+        
+    def objective(self, trial: optuna.Trial) -> float:
+        """优化目标函数"""
+        params = self.suggest_parameters(trial)
+        metrics = self.evaluate(params)
+        
+        # 记录优化历史
+        self.optimization_history.append({'params': params, **metrics})
         
-        return score
+        return metrics['score']
         
     def _calculate_score(self, result: BacktestResult) -> float:
         """计算策略评分"""
-        # 综合评分公式
-        score = (
-            result.total_return * 0.3 +  # 总收益率权重
-            (1 - result.max_drawdown) * 0.2 +  # 最大回撤权重
-            result.sharpe_ratio * 0.2 +  # 夏普比率权重
-            result.win_rate * 0.2 +  # 胜率权重
-            (result.profit_factor - 1) * 0.1  # 盈亏比权重
+        return calculate_score(
+            result.total_return,
+            result.max_drawdown,
+            result.sharpe_ratio,
+            result.win_rate,
+            result.profit_factor
         )
         
-        return score
+    def optimize(self,
+                 n_trials: int = 100,
+                 n_jobs: int = 1,
+                 seed: Optional[int] = None,
+                 storage: Optional[str] = None,
+                 study_name: Optional[str] = None) -> OptimizationResult:
+        """
+        运行优化过程
+        
+        Args:
+            n_trials: 试验次数
+            n_jobs: 工作进程数，-1表示使用全部CPU核心
+            seed: 采样器随机种子，种子与n_jobs相同时结果可复现
+            storage: Optuna日志文件路径，指定时研究持久化到本地，重复运行会在原研究上继续
+            study_name: 研究名称，默认由交易对、周期和日期区间生成
+        """
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
         
-    def optimize(self, n_trials: int = 100) -> OptimizationResult:
-        """运行优化过程"""
         # 创建优化研究
-        study = optuna.create_study(direction='maximize')
+        study = optuna.create_study(
+            direction='maximize',
+            sampler=optuna.samplers.TPESampler(seed=seed, constant_liar=n_jobs > 1),
+            storage=_journal_storage(storage) if storage else None,
+            study_name=study_name or f"{self.trading_pair}_{self.interval}_{self.start_date}_{self.end_date}",
+            load_if_exists=True
+        )
         
         # 运行优化
-        study.optimize(self.objective, n_trials=n_trials)
+        if n_jobs <= 1:
+            study.optimize(self.objective, n_trials=n_trials)
+            logging.info(f"Indicator cache: {self.indicator_cache.stats()}")
+        else:
+            self._optimize_parallel(study, n_trials, n_jobs)
         
         # 获取最佳结果
         best_params = study.best_params
@@ -137,6 +197,120 @@ class StrategyOptimizer:
             optimization_history=history_df
         )
         
+    def _optimize_parallel(self, study: optuna.Study, n_trials: int, n_jobs: int):
+        """
+        多进程并行优化
+        
+        K线数据写入临时.npy文件，各工作进程以只读内存映射方式共享同一份数据。
+        主进程每轮向研究申请n_jobs个试验并分发给工作进程，全部完成后按试验顺序回报结果，
+        采样顺序只取决于种子和n_jobs，与各进程的完成先后无关。
+        """
+        tmp_dir = tempfile.mkdtemp(prefix='optimizer_')
+        try:
+            data_path = os.path.join(tmp_dir, 'ohlcv.npy')
+            np.save(data_path, to_array(self.data))
+            
+            with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                initializer=_init_worker,
+                initargs=(data_path, self.trading_pair, self.start_date, self.end_date,
+                          self.initial_capital, self.interval, self.indicator_cache.max_bytes)
+            ) as pool:
+                remaining = n_trials
+                while remaining > 0:
+                    trials = [study.ask() for _ in range(min(n_jobs, remaining))]
+                    batch = [self.suggest_parameters(trial) for trial in trials]
+                    futures = [pool.submit(_evaluate_in_worker, params) for params in batch]
+                    
+                    for trial, params, future in zip(trials, batch, futures):
+                        try:
+                            metrics = future.result()
+                        except Exception:
+                            study.tell(trial, state=optuna.trial.TrialState.FAIL)
+                            raise
+                        study.tell(trial, metrics['score'])
+                        self.optimization_history.append({'params': params, **metrics})
+                    
+                    remaining -= len(trials)
+                    logging.info(f"Completed {n_trials - remaining}/{n_trials} trials, best score: {study.best_value:.4f}")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+    def grid_search(self,
+                    param_space: Optional[Dict[str, Any]] = None,
+                    top_k: int = 1000,
+                    max_cells: int = DEFAULT_MAX_CELLS) -> OptimizationResult:
+        """
+        网格搜索：批量回测参数空间中的全部组合
+        
+        组合按块生成为参数矩阵交给 BatchBacktester 向量化计算，内存占用由max_cells限制。
+        stop_loss/take_profit 不影响信号回测，不展开，使用默认值。
+        
+        Args:
+            param_space: 参数网格，默认使用 self.param_space 中的信号参数
+            top_k: all_results 中保留的最优组合数量；optimization_history 包含全部组合
+            max_cells: 每个分块信号矩阵的元素上限
+        """
+        param_space = param_space or self.param_space
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}")
+        missing = [name for name in BATCH_PARAMETERS if name not in param_space]
+        if missing:
+            raise ValueError(f"Parameter grid is missing {missing}")
+        values = [np.asarray(list(param_space[name]), dtype=np.float64) for name in BATCH_PARAMETERS]
+        is_int = [all(isinstance(v, (int, np.integer)) for v in param_space[name]) for name in BATCH_PARAMETERS]
+        shape = tuple(len(v) for v in values)
+        empty = [name for name, size in zip(BATCH_PARAMETERS, shape) if size == 0]
+        if empty:
+            raise ValueError(f"Parameter grid has no values for {empty}")
+        total = int(np.prod(shape))
+        
+        tester = BatchBacktester(
+            self.data,
+            initial_capital=self.initial_capital,
+            indicator_cache=self.indicator_cache,
+            max_cells=max_cells
+        )
+        
+        frames = []
+        for start in range(0, total, tester.chunk_size):
+            # 按下标直接还原该块的参数组合，不生成完整网格
+            positions = np.unravel_index(np.arange(start, min(start + tester.chunk_size, total)), shape)
+            matrix = np.column_stack([v[pos] for v, pos in zip(values, positions)])
+            metrics = tester.evaluate(matrix)
+            metrics['score'] = calculate_score(
+                metrics['total_return'],
+                metrics['max_drawdown'],
+                metrics['sharpe_ratio'],
+                metrics['win_rate'],
+                metrics['profit_factor']
+            )
+            frame = pd.DataFrame(matrix, columns=BATCH_PARAMETERS)
+            for name, value in metrics.items():
+                frame[name] = value
+            frames.append(frame)
+            logging.info(f"Grid search: {min(start + tester.chunk_size, total)}/{total} combinations")
+        
+        history_df = pd.concat(frames, ignore_index=True)
+        for name, integer in zip(BATCH_PARAMETERS, is_int):
+            if integer:
+                history_df[name] = history_df[name].astype(np.int64)
+        
+        top = history_df.nlargest(top_k, 'score')
+        top_params = top[list(BATCH_PARAMETERS)].to_dict('list')
+        top_metrics = top[['score', 'total_return', 'max_drawdown', 'sharpe_ratio', 'win_rate']].to_dict('list')
+        all_results = [{
+            'params': {name: top_params[name][i] for name in BATCH_PARAMETERS},
+            **{name: top_metrics[name][i] for name in top_metrics}
+        } for i in range(len(top))]
+        
+        return OptimizationResult(
+            best_params=all_results[0]['params'],
+            best_score=all_results[0]['score'],
+            all_results=all_results,
+            optimization_history=history_df
+        )
+        
     def plot_optimization_results(self, result: OptimizationResult):
         """绘制优化结果图表"""
         # 设置图表风格
@@ -206,6 +380,49 @@ class StrategyOptimizer:
             optimization_history=pd.DataFrame(data['all_results'])
         )
         
+def calculate_score(total_return, max_drawdown, sharpe_ratio, win_rate, profit_factor):
+    """综合评分，参数可以是标量或等长的NumPy数组"""
+    return (
+        total_return * 0.3 +  # 总收益率权重
+        (1 - max_drawdown) * 0.2 +  # 最大回撤权重
+        sharpe_ratio * 0.2 +  # 夏普比率权重
+        win_rate * 0.2 +  # 胜率权重
+        (profit_factor - 1) * 0.1  # 盈亏比权重
+    )
+
+
+def _journal_storage(path: str) -> optuna.storages.JournalStorage:
+    """基于本地日志文件的Optuna存储，支持多进程同时读写"""
+    try:
+        from optuna.storages.journal import JournalFileBackend
+    except ImportError:  # optuna < 4.0
+        from optuna.storages import JournalFileStorage as JournalFileBackend
+    return optuna.storages.JournalStorage(JournalFileBackend(path))
+
+
+# 工作进程内的优化器，由_init_worker在进程启动时创建
+_worker_optimizer: Optional[StrategyOptimizer] = None
+
+
+def _init_worker(data_path: str, trading_pair: str, start_date: str, end_date: str,
+                 initial_capital: float, interval: str, indicator_cache_bytes: int):
+    """工作进程初始化：以只读内存映射方式打开共享K线数据"""
+    global _worker_optimizer
+    _worker_optimizer = StrategyOptimizer(
+        trading_pair=trading_pair,
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=initial_capital,
+        interval=interval,
+        data=to_frame(np.load(data_path, mmap_mode='r')),
+        indicator_cache_bytes=indicator_cache_bytes
+    )
+
+
+def _evaluate_in_worker(params: Dict[str, Any]) -> Dict[str, float]:
+    return _worker_optimizer.evaluate(params)
+
+
 if __name__ == "__main__":
     # 设置日志
     logging.basicConfig(level=logging.INFO)
@@ -219,7 +436,7 @@ if __name__ == "__main__":
     )
     
     # 运行优化
-    result = optimizer.optimize(n_trials=100)
+    result = optimizer.optimize(n_trials=100, n_jobs=-1, seed=42)
     
     # 绘制结果
     optimizer.plot_optimization_results(result)
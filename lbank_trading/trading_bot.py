@@ -3,16 +3,22 @@ import time
 import json
 import hmac
 import hashlib
-import requests
+import math
+import threading
 import websocket
 import pandas as pd
 import numpy as np
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
-import talib
 import logging
 from typing import Dict, List, Optional
 
+try:
+    from .lbank_client import lbank_client
+except ImportError:  # 直接以脚本方式运行
+    from lbank_client import lbank_client
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -23,6 +29,218 @@ logging.basicConfig(
     ]
 )
 
+class KlineRingBuffer:
+    """
+    固定容量的K线环形缓冲区，列顺序：开盘时间(ms)、开、高、低、收、量
+
+    同一开盘时间的推送覆盖最后一根（未收盘K线持续变化），
+    更新的开盘时间追加一根，此时上一根视为已收盘；更早的推送忽略。
+    """
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros((capacity, 6), dtype=np.float64)
+        self.start = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def last(self) -> Optional[np.ndarray]:
+        if self.count == 0:
+            return None
+        return self.data[(self.start + self.count - 1) % len(self.data)]
+
+    def merge(self, bar: List[float]) -> Optional[np.ndarray]:
+        """
+        合并一根K线
+
+        Returns:
+            因新K线到来而收盘的上一根K线（副本），否则为None
+        """
+        last = self.last
+        if last is not None and bar[0] == last[0]:
+            last[:] = bar
+            return None
+        if last is not None and bar[0] < last[0]:
+            return None
+
+        closed = None if last is None else last.copy()
+        capacity = len(self.data)
+        if self.count < capacity:
+            self.data[(self.start + self.count) % capacity] = bar
+            self.count += 1
+        else:
+            self.data[self.start] = bar
+            self.start = (self.start + 1) % capacity
+        return closed
+
+    def to_array(self) -> np.ndarray:
+        """按时间顺序排列的副本"""
+        index = (self.start + np.arange(self.count)) % len(self.data)
+        return self.data[index]
+
+
+class _EMAState:
+    """EMA增量状态，与talib.EMA一致：前period个值的简单平均作为初值"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.seed_sum = 0.0
+        self.count = 0
+        self.value = None
+
+    def preview(self, x: float) -> Optional[float]:
+        if self.value is not None:
+            return self.value + self.alpha * (x - self.value)
+        if self.count + 1 == self.period:
+            return (self.seed_sum + x) / self.period
+        return None
+
+    def push(self, x: float):
+        result = self.preview(x)
+        if self.value is None:
+            self.seed_sum += x
+            self.count += 1
+        self.value = result
+
+
+class _RSIState:
+    """RSI增量状态，与talib.RSI一致：前period个涨跌幅的平均作为初值，之后Wilder平滑"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.last_close = None
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.count = 0
+        self.avg_gain = None
+        self.avg_loss = None
+
+    def _next(self, x: float):
+        if self.last_close is None:
+            return None, None
+        delta = x - self.last_close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        n = self.period
+        if self.avg_gain is not None:
+            return (self.avg_gain * (n - 1) + gain) / n, (self.avg_loss * (n - 1) + loss) / n
+        if self.count + 1 == n:
+            return (self.gain_sum + gain) / n, (self.loss_sum + loss) / n
+        return None, None
+
+    def preview(self, x: float) -> Optional[float]:
+        avg_gain, avg_loss = self._next(x)
+        if avg_gain is None:
+            return None
+        total = avg_gain + avg_loss
+        return 100.0 * avg_gain / total if total > 0 else 0.0
+
+    def push(self, x: float):
+        avg_gain, avg_loss = self._next(x)
+        if self.last_close is not None and self.avg_gain is None:
+            delta = x - self.last_close
+            self.gain_sum += max(delta, 0.0)
+            self.loss_sum += max(-delta, 0.0)
+            self.count += 1
+        self.avg_gain, self.avg_loss = avg_gain, avg_loss
+        self.last_close = x
+
+
+class _BandState:
+    """布林带增量状态，与talib.BBANDS一致：简单均线 ± nbdev倍总体标准差"""
+
+    def __init__(self, period: int, nbdev: float):
+        self.period = period
+        self.nbdev = nbdev
+        self.values = deque(maxlen=period)
+        self.shift = None  # 以首个值为偏移量累加，避免大数相减的精度损失
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    def preview(self, x: float):
+        if len(self.values) + 1 < self.period:
+            return None, None, None
+        shift = x if self.shift is None else self.shift
+        d = x - shift
+        total, total_sq = self.sum + d, self.sum_sq + d * d
+        if len(self.values) == self.period:
+            dropped = self.values[0] - shift
+            total -= dropped
+            total_sq -= dropped * dropped
+        mean = total / self.period
+        std = math.sqrt(max(total_sq / self.period - mean * mean, 0.0))
+        middle = mean + shift
+        return middle + self.nbdev * std, middle, middle - self.nbdev * std
+
+    def push(self, x: float):
+        if self.shift is None:
+            self.shift = x
+        if len(self.values) == self.period:
+            dropped = self.values[0] - self.shift
+            self.sum -= dropped
+            self.sum_sq -= dropped * dropped
+        d = x - self.shift
+        self.sum += d
+        self.sum_sq += d * d
+        self.values.append(x)
+
+
+class StreamingIndicators:
+    """
+    流式计算EMA/RSI/布林带
+
+    已收盘K线的收盘价通过push写入状态，每根O(1)；
+    未收盘K线只通过preview预览，不修改状态。
+    """
+
+    def __init__(self, fast_ema: int, slow_ema: int, rsi_period: int, bb_period: int, bb_std: float):
+        self.fast_ema = _EMAState(fast_ema)
+        self.slow_ema = _EMAState(slow_ema)
+        self.rsi = _RSIState(rsi_period)
+        self.bands = _BandState(bb_period, bb_std)
+
+    def push(self, close: float):
+        self.fast_ema.push(close)
+        self.slow_ema.push(close)
+        self.rsi.push(close)
+        self.bands.push(close)
+
+    def preview(self, close: float) -> Optional[Dict[str, float]]:
+        """以close为最新收盘价时的指标，数据不足时返回None"""
+        fast_ema = self.fast_ema.preview(close)
+        slow_ema = self.slow_ema.preview(close)
+        rsi = self.rsi.preview(close)
+        upper, middle, lower = self.bands.preview(close)
+        if fast_ema is None or slow_ema is None or rsi is None or middle is None:
+            return None
+        return {
+            'fast_ema': fast_ema,
+            'slow_ema': slow_ema,
+            'rsi': rsi,
+            'upper': upper,
+            'middle': middle,
+            'lower': lower
+        }
+
+
+def parse_kline(raw: Dict) -> List[float]:
+    """
+    解析一根K线推送为 [开盘时间(ms), 开, 高, 低, 收, 量]
+
+    兼容完整字段名（timestamp/open/high/low/close/volume）
+    和LBank kbar推送的简写字段（t/o/h/l/c/v，t为时间字符串）。
+    """
+    if 'close' in raw:
+        t, o, h, l, c, v = (raw.get(k) for k in ('timestamp', 'open', 'high', 'low', 'close', 'volume'))
+    else:
+        t, o, h, l, c, v = (raw.get(k) for k in ('t', 'o', 'h', 'l', 'c', 'v'))
+    if isinstance(t, str):
+        t = pd.Timestamp(t).value // 10**6
+    return [float(t or 0), float(o or c), float(h or c), float(l or c), float(c), float(v or 0)]
+
+
 class LBankTradingBot:
     def __init__(self):
         # 加载环境变量
@@ -31,7 +249,6 @@ class LBankTradingBot:
         # API配置
         self.api_key = os.getenv('LBANK_API_KEY')
         self.secret_key = os.getenv('LBANK_SECRET_KEY')
-        self.base_url = 'https://api.lbank.info/v2'
         self.ws_url = 'wss://www.lbank.info/ws/V2/'
         
         # 交易配置
@@ -59,12 +276,30 @@ class LBankTradingBot:
         self.price_change_threshold = float(os.getenv('PRICE_CHANGE_THRESHOLD'))
         self.execution_interval = float(os.getenv('EXECUTION_INTERVAL'))
         
+        # 流式处理配置
+        self.kline_limit = 100
+        self.max_tick_age = float(os.getenv('MAX_TICK_AGE', '1.0'))  # 排队超过该秒数的行情直接丢弃
+        self.metrics_interval = 60
+        
         # 初始化数据存储
-        self.klines = []
+        self.klines = KlineRingBuffer(self.kline_limit)
+        self.indicators = StreamingIndicators(
+            self.fast_ema, self.slow_ema, self.rsi_period, self.bb_period, self.bb_std
+        )
+        self.state_lock = threading.Lock()
         self.positions = []
         self.trades_history = []
         self.daily_pnl = 0.0
         
+        # 行情处理：推送线程只合并K线，分析线程只处理最新一条行情
+        self.pending_tick = None
+        self.tick_ready = threading.Condition()
+        self.running = False
+        self.analysis_thread = None
+        self.metrics = {'ticks': 0, 'processed': 0, 'coalesced': 0, 'stale': 0}
+        self.queue_latency = deque(maxlen=1000)
+        self.process_latency = deque(maxlen=1000)
+        
         # 初始化WebSocket连接
         self.ws = None
         self.connect_websocket()
@@ -104,50 +339,86 @@ class LBankTradingBot:
         )
         
     def handle_websocket_message(self, data: Dict):
-        """处理WebSocket消息"""
-        if 'data' in data:
-            self.update_klines(data['data'])
-            self.analyze_market()
+        """处理WebSocket消息：合并K线后提交给分析线程"""
+        received = time.time()
+        if 'kbar' in data:
+            bars = [data['kbar']]
+        elif 'data' in data:
+            bars = data['data'] if isinstance(data['data'], list) else [data['data']]
+        else:
+            return
+        self.update_klines([parse_kline(bar) for bar in bars])
+        self.submit_tick(received)
             
-    def update_klines(self, kline_data: List):
-        """更新K线数据"""
-        self.klines = kline_data
-        if len(self.klines) > 100:
-            self.klines = self.klines[-100:]
+    def update_klines(self, bars: List[List[float]]):
+        """合并K线到环形缓冲区，收盘的K线写入指标状态"""
+        with self.state_lock:
+            for bar in bars:
+                closed = self.klines.merge(bar)
+                if closed is not None:
+                    self.indicators.push(float(closed[4]))
+                    
+    def submit_tick(self, received: float):
+        """提交一条行情，分析线程来不及处理时只保留最新一条"""
+        with self.tick_ready:
+            self.metrics['ticks'] += 1
+            if self.pending_tick is not None:
+                self.metrics['coalesced'] += 1
+            self.pending_tick = received
+            self.tick_ready.notify()
+            
+    def analysis_loop(self):
+        """分析线程：取最新行情分析，排队过久的行情丢弃"""
+        last_report = time.time()
+        while self.running:
+            with self.tick_ready:
+                while self.pending_tick is None and self.running:
+                    self.tick_ready.wait(timeout=1)
+                received, self.pending_tick = self.pending_tick, None
+            if received is None:
+                continue
+                
+            started = time.time()
+            self.queue_latency.append(started - received)
+            if started - received > self.max_tick_age:
+                self.metrics['stale'] += 1
+            else:
+                try:
+                    self.analyze_market()
+                except Exception as e:
+                    logging.error(f"Market analysis error: {e}")
+                self.metrics['processed'] += 1
+                self.process_latency.append(time.time() - started)
+                
+            if started - last_report >= self.metrics_interval:
+                logging.info(f"Pipeline metrics: {json.dumps(self.get_metrics())}")
+                last_report = started
+                
+    def get_metrics(self) -> Dict:
+        """行情处理计数及排队/处理延迟（毫秒）"""
+        metrics = dict(self.metrics)
+        for name, samples in (('queue', self.queue_latency), ('process', self.process_latency)):
+            values = np.array(samples) * 1000
+            metrics[f'{name}_latency_p50_ms'] = float(np.percentile(values, 50)) if len(values) else 0.0
+            metrics[f'{name}_latency_p99_ms'] = float(np.percentile(values, 99)) if len(values) else 0.0
+        return metrics
             
     def analyze_market(self):
         """分析市场并生成交易信号"""
-        if len(self.klines) < 100:
+        with self.state_lock:
+            if len(self.klines) < self.kline_limit:
+                return
+            current_price = float(self.klines.last[4])
+            values = self.indicators.preview(current_price)
+        if values is None:
             return
-            
-        # 计算技术指标
-        df = pd.DataFrame(self.klines)
-        close_prices = df['close'].astype(float)
-        
-        # 计算EMA
-        fast_ema = talib.EMA(close_prices, timeperiod=self.fast_ema)
-        slow_ema = talib.EMA(close_prices, timeperiod=self.slow_ema)
-        
-        # 计算RSI
-        rsi = talib.RSI(close_prices, timeperiod=self.rsi_period)
-        
-        # 计算布林带
-        upper, middle, lower = talib.BBANDS(
-            close_prices,
-            timeperiod=self.bb_period,
-            nbdevup=self.bb_std,
-            nbdevdn=self.bb_std
-        )
-        
-        # 生成交易信号
-        current_price = float(close_prices.iloc[-1])
-        current_rsi = float(rsi.iloc[-1])
+        current_rsi = values['rsi']
         
         # 趋势信号
         trend_signal = 0
-        if fast_ema.iloc[-1] > slow_ema.iloc[-1]:
+        if values['fast_ema'] > values['slow_ema']:
             trend_signal = 1
-        elif fast_ema.iloc[-1] < slow_ema.iloc[-1]:
+        elif values['fast_ema'] < values['slow_ema']:
             trend_signal = -1
             
         # 超买超卖信号
@@ -159,9 +430,9 @@ class LBankTradingBot:
             
         # 布林带信号
         bb_signal = 0
-        if current_price < lower.iloc[-1]:
+        if current_price < values['lower']:
             bb_signal = 1
-        elif current_price > upper.iloc[-1]:
+        elif current_price > values['upper']:
             bb_signal = -1
             
         # 综合信号
@@ -193,10 +464,7 @@ class LBankTradingBot:
         
         try:
             # 发送订单
-            response = requests.post(
-                f"{self.base_url}/order/create",
-                json=order_params
-            )
+            response = lbank_client.post('order/create', json=order_params)
             
             if response.status_code == 200:
                 order_data = response.json()
@@ -252,6 +520,9 @@ class LBankTradingBot:
         
     def run(self):
         """运行交易机器人"""
+        self.running = True
+        self.analysis_thread = threading.Thread(target=self.analysis_loop, name='analysis', daemon=True)
+        self.analysis_thread.start()
         try:
             # 启动WebSocket连接
             self.ws.run_forever()
@@ -260,8 +531,13 @@ class LBankTradingBot:
         except Exception as e:
             logging.error(f"Trading bot error: {e}")
         finally:
+            self.running = False
+            with self.tick_ready:
+                self.tick_ready.notify()
             if self.ws:
                 self.ws.close()
+            self.analysis_thread.join(timeout=5)
+            logging.info(f"Pipeline metrics: {json.dumps(self.get_metrics())}")
                 
 if __name__ == "__main__":
     bot = LBankTradingBot()
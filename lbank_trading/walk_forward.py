@@ -0,0 +1,265 @@
+import os
+import shutil
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backtest import BacktestEngine
+from .data_store import DEFAULT_DATA_DIR, to_array, to_frame
+from .optimizer import StrategyOptimizer
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def make_folds(start_date: str, end_date: str, train_days: int, test_days: int,
+               step_days: Optional[int] = None) -> List[Tuple[str, str, str, str]]:
+    """
+    生成滚动窗口
+
+    每个窗口在[train_start, train_end)上优化、在紧随其后的[train_end, test_end)上检验，
+    之后整体向后滚动step_days（默认等于test_days，检验区间首尾相接）。
+
+    Returns:
+        [(train_start, train_end, test_start, test_end), ...]，日期格式为YYYY-MM-DD
+    """
+    step = timedelta(days=step_days or test_days)
+    start = datetime.strptime(start_date, DATE_FORMAT)
+    end = datetime.strptime(end_date, DATE_FORMAT)
+
+    folds = []
+    while start + timedelta(days=train_days + test_days) <= end:
+        train_end = start + timedelta(days=train_days)
+        test_end = train_end + timedelta(days=test_days)
+        folds.append((start.strftime(DATE_FORMAT), train_end.strftime(DATE_FORMAT),
+                      train_end.strftime(DATE_FORMAT), test_end.strftime(DATE_FORMAT)))
+        start += step
+    return folds
+
+
+class WalkForwardRunner:
+    """
+    滚动窗口（walk-forward）分析
+
+    整个区间的K线只加载一次（优先读取本地存储），写入临时.npy文件后由各工作进程
+    以只读内存映射方式共享，每个窗口的数据切片都是该映射上的视图。
+    各窗口在独立进程中并行优化和检验，结果逐窗口写入CSV文件。
+    """
+
+    def __init__(self,
+                 trading_pair: str,
+                 start_date: str,
+                 end_date: str,
+                 train_days: int = 28,
+                 test_days: int = 7,
+                 step_days: Optional[int] = None,
+                 initial_capital: float = 10000,
+                 interval: str = 'minute1',
+                 data_dir: str = DEFAULT_DATA_DIR,
+                 data: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            trading_pair: 交易对
+            start_date: 分析开始日期 (YYYY-MM-DD)
+            end_date: 分析结束日期 (YYYY-MM-DD，不含)
+            train_days: 优化窗口天数
+            test_days: 检验窗口天数
+            step_days: 每次滚动的天数，默认等于test_days
+            initial_capital: 初始资金
+            interval: K线周期
+            data_dir: 本地历史数据目录
+            data: 已加载的K线数据，传入时不再重新加载
+        """
+        self.trading_pair = trading_pair
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.interval = interval
+        self.folds = make_folds(start_date, end_date, train_days, test_days, step_days)
+
+        if data is None:
+            data = BacktestEngine(
+                start_date=start_date,
+                end_date=end_date,
+                trading_pair=trading_pair,
+                initial_capital=initial_capital,
+                interval=interval,
+                data_dir=data_dir
+            ).data
+        self.data = data
+
+    def run(self,
+            n_trials: int = 100,
+            method: str = 'optuna',
+            n_jobs: int = 1,
+            seed: Optional[int] = None,
+            results_file: Optional[str] = 'walk_forward_results.csv') -> pd.DataFrame:
+        """
+        运行全部窗口
+
+        Args:
+            n_trials: 每个窗口的Optuna试验次数（method='grid'时忽略）
+            method: 'optuna' 或 'grid'（网格搜索）
+            n_jobs: 并行窗口数，-1表示使用全部CPU核心
+            seed: 随机种子，第k个窗口使用seed+k
+            results_file: 结果CSV路径，为None时不写文件
+
+        Returns:
+            每个窗口一行的结果表
+        """
+        if method not in ('optuna', 'grid'):
+            raise ValueError(f"Unsupported method: {method}")
+        if not self.folds:
+            raise ValueError("Date range is shorter than one train/test window")
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+
+        tasks = [(k, fold, n_trials, method, None if seed is None else seed + k)
+                 for k, fold in enumerate(self.folds)]
+
+        tmp_dir = tempfile.mkdtemp(prefix='walk_forward_')
+        try:
+            data_path = os.path.join(tmp_dir, 'ohlcv.npy')
+            np.save(data_path, to_array(self.data))
+            init_args = (data_path, self.trading_pair, self.initial_capital, self.interval)
+
+            if n_jobs <= 1:
+                _init_worker(*init_args)
+                rows = [_run_fold(task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)),
+                                         initializer=_init_worker, initargs=init_args) as pool:
+                    rows = list(pool.map(_run_fold, tasks))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        results = pd.DataFrame(rows)
+        if results_file:
+            results.to_csv(results_file, index=False, float_format='%.6g')
+
+        compounded = (1 + results['test_return']).prod() - 1
+        logging.info(f"Walk-forward finished: {len(results)} folds, "
+                     f"compounded out-of-sample return {compounded:.2%}")
+        return results
+
+
+# 工作进程内的共享数据及窗口切片缓存，由_init_worker在进程启动时设置
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(data_path: str, trading_pair: str, initial_capital: float, interval: str):
+    """工作进程初始化：以只读内存映射方式打开共享K线数据"""
+    _worker_state.clear()
+    _worker_state.update({
+        'data': np.load(data_path, mmap_mode='r'),
+        'trading_pair': trading_pair,
+        'initial_capital': initial_capital,
+        'interval': interval,
+        'slices': {}
+    })
+
+
+def _fold_slice(start_date: str, end_date: str) -> pd.DataFrame:
+    """[start_date, end_date)区间的数据切片，是内存映射上的视图，不拷贝数据；同一进程内重复请求的区间直接复用"""
+    key = (start_date, end_date)
+    slices = _worker_state['slices']
+    if key not in slices:
+        data = _worker_state['data']
+        start_ms, end_ms = (
+            datetime.strptime(date, DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp() * 1000
+            for date in (start_date, end_date)
+        )
+        lo, hi = np.searchsorted(data[:, 0], [start_ms, end_ms], side='left')
+        slices[key] = to_frame(data[lo:hi])
+    return slices[key]
+
+
+def _run_fold(task: Tuple) -> Dict[str, Any]:
+    """在训练窗口上优化参数，再用最优参数回测检验窗口"""
+    k, (train_start, train_end, test_start, test_end), n_trials, method, seed = task
+    state = _worker_state
+
+    optimizer = StrategyOptimizer(
+        trading_pair=state['trading_pair'],
+        start_date=train_start,
+        end_date=train_end,
+        initial_capital=state['initial_capital'],
+        interval=state['interval'],
+        data=_fold_slice(train_start, train_end)
+    )
+    if method == 'grid':
+        result = optimizer.grid_search(top_k=1)
+    else:
+        result = optimizer.optimize(n_trials=n_trials, seed=seed)
+
+    backtest = BacktestEngine(
+        start_date=test_start,
+        end_date=test_end,
+        trading_pair=state['trading_pair'],
+        initial_capital=state['initial_capital'],
+        interval=state['interval'],
+        data=_fold_slice(test_start, test_end)
+    )
+    backtest.set_parameters(result.best_params)
+    test_result = backtest.run_backtest()
+
+    logging.info(f"Fold {k} [{train_start} ~ {test_end}): train score {result.best_score:.4f}, "
+                 f"test return {test_result.total_return:.2%}")
+
+    return {
+        'fold': k,
+        'train_start': train_start,
+        'train_end': train_end,
+        'test_start': test_start,
+        'test_end': test_end,
+        **{f'param_{name}': value for name, value in result.best_params.items()},
+        'train_score': result.best_score,
+        'test_score': optimizer._calculate_score(test_result),
+        'test_return': test_result.total_return,
+        'test_max_drawdown': test_result.max_drawdown,
+        'test_sharpe_ratio': test_result.sharpe_ratio,
+        'test_win_rate': test_result.win_rate,
+        'test_trades': test_result.total_trades
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='滚动窗口参数优化与检验')
+    parser.add_argument('--symbol', required=True, help='交易对，如 btc_usdt')
+    parser.add_argument('--interval', default='minute1')
+    parser.add_argument('--start', required=True, help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', required=True, help='结束日期 YYYY-MM-DD（不含）')
+    parser.add_argument('--train-days', type=int, default=28)
+    parser.add_argument('--test-days', type=int, default=7)
+    parser.add_argument('--step-days', type=int, default=None)
+    parser.add_argument('--method', default='optuna', choices=['optuna', 'grid'])
+    parser.add_argument('--trials', type=int, default=100, help='每个窗口的试验次数')
+    parser.add_argument('--jobs', type=int, default=-1, help='并行窗口数')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='数据目录')
+    parser.add_argument('--output', default='walk_forward_results.csv', help='结果文件')
+    args = parser.parse_args()
+
+    runner = WalkForwardRunner(
+        trading_pair=args.symbol,
+        start_date=args.start,
+        end_date=args.end,
+        train_days=args.train_days,
+        test_days=args.test_days,
+        step_days=args.step_days,
+        interval=args.interval,
+        data_dir=args.data_dir
+    )
+    results = runner.run(n_trials=args.trials, method=args.method, n_jobs=args.jobs,
+                         seed=args.seed, results_file=args.output)
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
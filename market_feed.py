@@ -0,0 +1,289 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import websocket
+
+from candle_store import interval_to_ms
+from order_book import OrderBook
+
+logger = logging.getLogger(__name__)
+
+BINANCE_FUTURES_WS_URL = 'wss://fstream.binance.com/ws'
+# aggTrades接口单次最多返回的成交数
+AGG_TRADES_PAGE_LIMIT = 1000
+
+
+class BinanceMarketFeed:
+    """
+    Binance合约行情推送
+
+    订阅 kline / depth / aggTrade 三个流，在内存中维护：
+      - book:          本地订单簿（增量深度更新），最优价/累计深度/失衡度/微观价格可直接读取
+      - order_book:    {'bids': [[价格, 数量], ...], 'asks': [...]}，按最优价排序的前N档
+      - trades_buffer: 最近成交 deque({'id', 'price', 'quantity', 'side', 'time'})
+      - klines_buffer: 最近K线 deque([开盘时间, 开, 高, 低, 收, 量])
+    三者都是原地更新的同一对象，调用方可以直接持有引用。
+
+    断线后按指数退避重连并重新订阅；K线和逐笔成交出现序号缺口
+    （包括断线期间）时通过REST接口补齐，深度序号不连续时重新拉取快照。
+    回调在推送线程中执行。
+    """
+
+    def __init__(self,
+                 symbol: str,
+                 exchange=None,
+                 interval: str = '1m',
+                 kline_limit: int = 100,
+                 trade_limit: int = 1000,
+                 depth_levels: int = 20,
+                 on_kline: Optional[Callable[[List[float], bool], None]] = None,
+                 on_depth: Optional[Callable[[], None]] = None,
+                 on_trade: Optional[Callable[[Dict], None]] = None,
+                 ws_url: str = BINANCE_FUTURES_WS_URL):
+        """
+        Args:
+            symbol: 交易对，如 ETHUSDT
+            exchange: ccxt binance 实例，用于初始化和补齐数据，为None时不补齐
+            interval: K线周期
+            kline_limit: 保留的K线数量
+            trade_limit: 保留的逐笔成交数量
+            depth_levels: order_book保留的档数，也是累计深度和失衡度的计算档数
+            on_kline: K线回调 (kline, 是否已收盘)
+            on_depth: 盘口更新回调
+            on_trade: 逐笔成交回调
+        """
+        self.symbol = symbol.upper()
+        self.exchange = exchange
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.depth_levels = depth_levels
+        self.on_kline = on_kline
+        self.on_depth = on_depth
+        self.on_trade = on_trade
+        self.ws_url = ws_url
+
+        self.book = OrderBook(self.symbol, depth=depth_levels)
+        self.order_book: Dict[str, list] = {'bids': [], 'asks': []}
+        self.trades_buffer: deque = deque(maxlen=trade_limit)
+        self.klines_buffer: deque = deque(maxlen=kline_limit)
+        self.lock = threading.RLock()
+
+        self.last_resync = 0.0
+        self.last_trade_id = None
+        self.last_event_time = None
+
+        self.ws = None
+        self.thread = None
+        self.running = False
+        self.connected = threading.Event()
+        self.stats = {'messages': 0, 'reconnects': 0, 'kline_gaps': 0, 'trade_gaps': 0, 'depth_gaps': 0}
+
+    @property
+    def streams(self) -> List[str]:
+        name = self.symbol.lower()
+        return [
+            f"{name}@kline_{self.interval}",
+            f"{name}@depth@100ms",
+            f"{name}@aggTrade"
+        ]
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return self.book.best_bid
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self.book.best_ask
+
+    def start(self):
+        """启动推送线程（先通过REST初始化K线）"""
+        if self.running:
+            return
+        self.running = True
+        self.backfill_klines()
+        self.thread = threading.Thread(target=self._run, name=f"feed-{self.symbol}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止推送线程"""
+        self.running = False
+        if self.ws is not None:
+            self.ws.close()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def snapshot_klines(self) -> List[List[float]]:
+        """当前K线缓冲区的副本"""
+        with self.lock:
+            return [list(kline) for kline in self.klines_buffer]
+
+    def _run(self):
+        backoff = 1
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.ws_url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: logger.error(f"Market feed error: {error}"),
+                on_close=lambda ws, code, msg: logger.info(f"Market feed closed: {code} {msg}")
+            )
+            started = time.time()
+            self.ws.run_forever(ping_interval=20, ping_timeout=10)
+            self.connected.clear()
+            if not self.running:
+                break
+
+            # 连接稳定运行过一段时间后重置退避
+            if time.time() - started > 60:
+                backoff = 1
+            self.stats['reconnects'] += 1
+            logger.warning(f"Market feed disconnected, reconnecting in {backoff}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _on_open(self, ws):
+        ws.send(json.dumps({'method': 'SUBSCRIBE', 'params': self.streams, 'id': 1}))
+        logger.info(f"Market feed subscribed: {', '.join(self.streams)}")
+        with self.lock:
+            # 断线期间的深度增量已丢失，等待新的快照
+            self.book.reset()
+            self.book.pending.clear()
+        if self.stats['reconnects']:
+            # 补齐断线期间缺失的数据
+            self.backfill_klines()
+            self.backfill_trades()
+        self.connected.set()
+
+    def _on_message(self, ws, message: str):
+        try:
+            data = json.loads(message)
+            event = data.get('e')
+            if event is None:
+                return  # 订阅确认等非行情消息
+            self.stats['messages'] += 1
+            self.last_event_time = data.get('E')
+
+            if event == 'kline':
+                self._handle_kline(data['k'])
+            elif event == 'depthUpdate':
+                self._handle_depth(data)
+            elif event == 'aggTrade':
+                self._handle_trade(data)
+        except Exception as e:
+            logger.error(f"Market feed message error: {str(e)}")
+
+    def _handle_kline(self, k: Dict):
+        kline = [float(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+        with self.lock:
+            last_open = self.klines_buffer[-1][0] if self.klines_buffer else None
+            if last_open is not None and kline[0] > last_open + self.interval_ms:
+                self.stats['kline_gaps'] += 1
+                logger.warning(f"Kline gap detected for {self.symbol}, backfilling")
+                self.backfill_klines()
+            self._merge_kline(kline)
+        if self.on_kline:
+            self.on_kline(kline, bool(k['x']))
+
+    def _merge_kline(self, kline: List[float]):
+        """同一开盘时间覆盖（未收盘K线持续变化），更新的开盘时间追加，更早的忽略"""
+        if self.klines_buffer and kline[0] == self.klines_buffer[-1][0]:
+            self.klines_buffer[-1] = kline
+        elif not self.klines_buffer or kline[0] > self.klines_buffer[-1][0]:
+            self.klines_buffer.append(kline)
+
+    def _handle_depth(self, data: Dict):
+        with self.lock:
+            if not self.book.apply_diff(data):
+                self.stats['depth_gaps'] += 1
+            if not self.book.ready:
+                self.resync_book()
+                if not self.book.ready:
+                    return
+            top = self.book.top()
+            self.order_book['bids'] = top['bids']
+            self.order_book['asks'] = top['asks']
+        if self.on_depth:
+            self.on_depth()
+
+    def resync_book(self):
+        """通过REST快照重新同步订单簿（至多每秒一次）"""
+        if self.exchange is None or time.time() - self.last_resync < 1:
+            return
+        self.last_resync = time.time()
+        try:
+            snapshot = self.exchange.fapiPublicGetDepth({'symbol': self.symbol, 'limit': 1000})
+            if self.book.load_snapshot(snapshot['bids'], snapshot['asks'], snapshot['lastUpdateId']):
+                logger.info(f"Order book synced for {self.symbol} at {snapshot['lastUpdateId']}")
+        except Exception as e:
+            logger.error(f"Order book resync failed: {str(e)}")
+
+    def _handle_trade(self, data: Dict):
+        trade_id = int(data['a'])
+        if self.last_trade_id is not None:
+            if trade_id <= self.last_trade_id:
+                return  # 补齐时已经收到
+            if trade_id > self.last_trade_id + 1:
+                self.stats['trade_gaps'] += 1
+                logger.warning(f"AggTrade gap detected for {self.symbol}: {self.last_trade_id} -> {trade_id}")
+                self.backfill_trades(until_id=trade_id)
+
+        trade = self._parse_trade(data)
+        with self.lock:
+            self.trades_buffer.append(trade)
+        self.last_trade_id = trade_id
+        if self.on_trade:
+            self.on_trade(trade)
+
+    @staticmethod
+    def _parse_trade(data: Dict) -> Dict:
+        # m=True表示买方是挂单方，即主动卖出
+        return {
+            'id': int(data['a']),
+            'price': float(data['p']),
+            'quantity': float(data['q']),
+            'side': 'SELL' if data['m'] else 'BUY',
+            'time': int(data['T'])
+        }
+
+    def backfill_klines(self):
+        """通过REST补齐K线：缓冲区为空时拉取最近kline_limit根，否则从最后一根开始补"""
+        if self.exchange is None:
+            return
+        try:
+            with self.lock:
+                params = {'symbol': self.symbol, 'interval': self.interval, 'limit': self.klines_buffer.maxlen}
+                if self.klines_buffer:
+                    params['startTime'] = int(self.klines_buffer[-1][0])
+                klines = self.exchange.fapiPublicGetKlines(params)
+                for k in klines:
+                    self._merge_kline([float(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])])
+        except Exception as e:
+            logger.error(f"Kline backfill failed: {str(e)}")
+
+    def backfill_trades(self, until_id: Optional[int] = None):
+        """通过REST分页补齐从last_trade_id之后（到until_id之前）缺失的逐笔成交，直到缺口补齐"""
+        if self.exchange is None or self.last_trade_id is None:
+            return
+        try:
+            while True:
+                trades = self.exchange.fapiPublicGetAggTrades({
+                    'symbol': self.symbol,
+                    'fromId': self.last_trade_id + 1,
+                    'limit': AGG_TRADES_PAGE_LIMIT
+                })
+                with self.lock:
+                    for data in trades:
+                        trade_id = int(data['a'])
+                        if until_id is not None and trade_id >= until_id:
+                            return
+                        self.trades_buffer.append(self._parse_trade(data))
+                        self.last_trade_id = trade_id
+                # 不足一页说明已追上最新成交
+                if len(trades) < AGG_TRADES_PAGE_LIMIT:
+                    return
+        except Exception as e:
+            logger.error(f"AggTrade backfill failed: {str(e)}")
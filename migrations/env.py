@@ -17,8 +17,14 @@ if config.config_file_name is not None:
 # add your model's MetaData object here
 # for 'autogenerate' support
 from app import db
+from db_config import get_database_url, configure_sqlite, is_sqlite
 target_metadata = db.metadata
 
+# 与应用使用同一个数据库（DATABASE_URL），未设置时为本地SQLite
+config.set_main_option("sqlalchemy.url", get_database_url())
+# SQLite不支持大部分ALTER TABLE，使用batch模式（复制表）执行结构变更
+render_as_batch = is_sqlite(get_database_url())
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -43,6 +49,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=render_as_batch,
     )
 
     with context.begin_transaction():
@@ -61,10 +68,12 @@ def run_migrations_online() -> None:
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
+    configure_sqlite(connectable)
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            render_as_batch=render_as_batch
         )
 
         with context.begin_transaction():
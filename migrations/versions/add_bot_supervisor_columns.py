@@ -0,0 +1,40 @@
+"""为 trading_bot_config 添加监督器使用的目标状态、心跳、错误和重启次数字段
+
+Revision ID: add_bot_supervisor_columns
+Revises: add_pnl_rollup
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_bot_supervisor_columns'
+down_revision = 'add_pnl_rollup'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column('desired_status', sa.String(20), server_default='STOPPED'),
+    sa.Column('heartbeat_at', sa.DateTime),
+    sa.Column('last_error', sa.Text),
+    sa.Column('restart_count', sa.Integer, server_default='0'),
+]
+
+
+def upgrade():
+    # 新库由 db.create_all() 建表时已经带有这些字段，这里只补加缺失的
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('trading_bot_config')}
+    with op.batch_alter_table('trading_bot_config') as batch_op:
+        for column in COLUMNS:
+            if column.name not in existing:
+                batch_op.add_column(column)
+
+    # 之前的状态只存在于进程内存中，升级后全部机器人从停止状态开始，不会自动开始交易
+    op.execute("UPDATE trading_bot_config SET status = 'STOPPED', desired_status = 'STOPPED'")
+
+
+def downgrade():
+    with op.batch_alter_table('trading_bot_config') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
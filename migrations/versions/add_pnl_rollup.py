@@ -0,0 +1,56 @@
+"""添加 pnl_rollup 盈亏汇总表并由现有交易记录回填
+
+Revision ID: add_pnl_rollup
+Revises: add_trade_history_indexes
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import pnl_rollup
+
+# revision identifiers, used by Alembic.
+revision = 'add_pnl_rollup'
+down_revision = 'add_trade_history_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'pnl_rollup' not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            'pnl_rollup',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('period', sa.String(10), nullable=False),
+            sa.Column('bucket', sa.DateTime, nullable=False),
+            sa.Column('bot_id', sa.Integer, nullable=False, server_default='0'),
+            sa.Column('strategy', sa.String(20), nullable=False, server_default=''),
+            sa.Column('exchange', sa.String(20), nullable=False),
+            sa.Column('symbol', sa.String(20), nullable=False),
+            *[sa.Column(field, sa.Integer, nullable=False, server_default='0')
+              for field in pnl_rollup.COUNT_FIELDS],
+            *[sa.Column(field, sa.Float, nullable=False, server_default='0')
+              for field in pnl_rollup.AMOUNT_FIELDS],
+            sa.UniqueConstraint('period', 'bucket', 'bot_id', 'strategy', 'exchange', 'symbol',
+                                name='uq_pnl_rollup_key'),
+        )
+        op.create_index('ix_pnl_rollup_exchange_strategy', 'pnl_rollup', ['period', 'exchange', 'strategy', 'bucket'])
+        op.create_index('ix_pnl_rollup_bot_id', 'pnl_rollup', ['period', 'bot_id', 'bucket'])
+
+    # 由现有交易记录回填
+    metadata = sa.MetaData()
+    rollup = sa.Table('pnl_rollup', metadata, autoload_with=bind)
+    trade_history = sa.Table('trade_history', metadata, autoload_with=bind)
+    columns = [trade_history.c[name] for name in ('timestamp', 'bot_id', 'strategy', 'exchange', 'symbol', 'pnl')]
+    trades = bind.execute(
+        sa.select(*columns)
+        .where(trade_history.c.timestamp.isnot(None))
+        .order_by(trade_history.c.timestamp, trade_history.c.id)
+    ).mappings()
+    pnl_rollup.rebuild(bind, rollup, trades)
+
+
+def downgrade():
+    op.drop_table('pnl_rollup')
@@ -15,6 +15,11 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
+    # 新库由 db.create_all() 建表时已经带有该列
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('trade_history')}
+    if 'position_type' in existing:
+        return
+
     # 添加 position_type 列
     op.add_column('trade_history', sa.Column('position_type', sa.String(10), nullable=True))
     
@@ -15,9 +15,12 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
-    # 添加策略相关字段
-    op.add_column('trade_history', sa.Column('strategy', sa.String(20), nullable=True))
-    op.add_column('trade_history', sa.Column('strategy_params', sa.String(255), nullable=True))
+    # 添加策略相关字段（新库由 db.create_all() 建表时已经带有，只补加缺失的）
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('trade_history')}
+    if 'strategy' not in existing:
+        op.add_column('trade_history', sa.Column('strategy', sa.String(20), nullable=True))
+    if 'strategy_params' not in existing:
+        op.add_column('trade_history', sa.Column('strategy_params', sa.String(255), nullable=True))
 
 def downgrade():
     # 删除策略相关字段
@@ -0,0 +1,38 @@
+"""添加 bot_id、pnl、pnl_percentage 列到 trade_history 表
+
+Revision ID: add_trade_history_columns
+Revises: 
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_trade_history_columns'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column('bot_id', sa.Integer, sa.ForeignKey('trading_bot_config.id', name='fk_trade_history_bot_id')),
+    sa.Column('pnl', sa.Float),
+    sa.Column('pnl_percentage', sa.Float),
+]
+
+
+def upgrade():
+    # 新库由 db.create_all() 建表时已经带有这些列，这里只补加缺失的（旧库之前只能手动执行 migrations/ 下的脚本）
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('trade_history')}
+    missing = [column for column in COLUMNS if column.name not in existing]
+    if not missing:
+        return
+    with op.batch_alter_table('trade_history') as batch_op:
+        for column in missing:
+            batch_op.add_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('trade_history') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
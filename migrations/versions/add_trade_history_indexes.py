@@ -0,0 +1,44 @@
+"""为 trade_history / trading_bot_log 热点查询添加索引
+
+Revision ID: add_trade_history_indexes
+Revises: add_position_type, add_strategy_columns, add_trade_history_columns
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_trade_history_indexes'
+down_revision = ('add_position_type', 'add_strategy_columns', 'add_trade_history_columns')
+branch_labels = None
+depends_on = None
+
+# 索引名 -> (表, 列)，与 app.py 中模型的 __table_args__ 保持一致
+INDEXES = {
+    'ix_trade_history_exchange_timestamp': ('trade_history', ['exchange', 'timestamp']),
+    'ix_trade_history_strategy_timestamp': ('trade_history', ['strategy', 'timestamp']),
+    'ix_trade_history_bot_id_timestamp': ('trade_history', ['bot_id', 'timestamp']),
+    'ix_trade_history_timestamp': ('trade_history', ['timestamp']),
+    'ix_trading_bot_log_bot_id_created_at': ('trading_bot_log', ['bot_id', 'created_at']),
+}
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # 新库由 db.create_all() 建表时已经带有索引，这里只补建缺失的
+    existing = {}
+    for name, (table, columns) in INDEXES.items():
+        if table not in existing:
+            existing[table] = _existing_indexes(table)
+        if name not in existing[table]:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, (table, _) in INDEXES.items():
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
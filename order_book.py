@@ -0,0 +1,209 @@
+import logging
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BookSide:
+    """
+    订单簿单边
+
+    有序价格列表 + 价格到数量的字典：按价格查找/修改O(1)，
+    新增或删除价位时二分定位。列表按"最差价在前、最优价在后"排序
+    （卖盘以负价格排序），最优价附近的变动只移动列表末尾的少量元素。
+    档数超过max_levels后允许继续增长到trim_at，再一次性截掉最差的多余价位。
+    """
+
+    def __init__(self, is_bid: bool, max_levels: int = 1000):
+        self.is_bid = is_bid
+        self.max_levels = max_levels
+        self.trim_at = max_levels + max(1, max_levels // 4)
+        self.keys: List[float] = []
+        self.levels: Dict[float, float] = {}
+
+    def clear(self):
+        self.keys.clear()
+        self.levels.clear()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _price(self, key: float) -> float:
+        return key if self.is_bid else -key
+
+    def update(self, price: float, qty: float):
+        """设置价位数量，数量为0时删除该价位"""
+        key = price if self.is_bid else -price
+        if qty == 0:
+            if self.levels.pop(price, None) is not None:
+                del self.keys[bisect_left(self.keys, key)]
+            return
+        if price not in self.levels:
+            i = bisect_left(self.keys, key)
+            if i == 0 and len(self.keys) >= self.max_levels:
+                return  # 超出保留档位的远端价位不维护
+            self.keys.insert(i, key)
+        self.levels[price] = qty
+        if len(self.keys) > self.trim_at:
+            self._trim()
+
+    def _trim(self):
+        """截掉最差的价位，保留max_levels档"""
+        excess = len(self.keys) - self.max_levels
+        for key in self.keys[:excess]:
+            del self.levels[self._price(key)]
+        del self.keys[:excess]
+
+    def top(self, n: int) -> List[List[float]]:
+        """最优的n档 [[价格, 数量], ...]"""
+        if n <= 0:
+            return []
+        result = []
+        for key in reversed(self.keys[-n:]):
+            price = self._price(key)
+            result.append([price, self.levels[price]])
+        return result
+
+
+class OrderBook:
+    """
+    本地订单簿
+
+    用REST快照初始化，之后按增量深度（diff depth）推送更新，
+    每次更新后重新计算最优价、前depth档累计深度、失衡度和微观价格，读取均为O(1)。
+    更新序号不连续时返回False，由调用方重新拉取快照。
+    """
+
+    # 等待快照期间最多缓存的增量推送数量
+    MAX_PENDING = 1000
+
+    def __init__(self, symbol: str, depth: int = 10, max_levels: int = 1000):
+        """
+        Args:
+            symbol: 交易对
+            depth: 计算累计深度和失衡度所用的档数
+            max_levels: 每边最多维护的档数
+        """
+        self.symbol = symbol
+        self.depth = depth
+        self.bids = BookSide(is_bid=True, max_levels=max_levels)
+        self.asks = BookSide(is_bid=False, max_levels=max_levels)
+        self.pending: List[Dict] = []
+        self.reset()
+
+    def reset(self):
+        """清空订单簿，等待新的快照"""
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id: Optional[int] = None
+        self.awaiting_first = False
+        self.best_bid: Optional[float] = None
+        self.best_ask: Optional[float] = None
+        self.best_bid_qty = 0.0
+        self.best_ask_qty = 0.0
+        self.bid_depth = 0.0
+        self.ask_depth = 0.0
+        self.imbalance = 0.0
+        self.microprice: Optional[float] = None
+        self.spread: Optional[float] = None
+        self.mid: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.last_update_id is not None
+
+    def load_snapshot(self, bids: List, asks: List, last_update_id: int) -> bool:
+        """
+        载入REST快照并重放等待期间缓存的增量推送
+
+        Returns:
+            False 表示快照与缓存的推送衔接不上，需要重新拉取快照
+        """
+        self.reset()
+        for price, qty in bids:
+            self.bids.update(float(price), float(qty))
+        for price, qty in asks:
+            self.asks.update(float(price), float(qty))
+        self.last_update_id = int(last_update_id)
+        self.awaiting_first = True
+
+        pending, self.pending = self.pending, []
+        for event in pending:
+            if not self.apply_diff(event):
+                return False
+        self._refresh()
+        return True
+
+    def apply_diff(self, event: Dict) -> bool:
+        """
+        应用一条增量深度推送（Binance depthUpdate格式：U/u/pu/b/a）
+
+        Returns:
+            False 表示序号不连续，订单簿已重置并缓存该推送，需要重新拉取快照
+        """
+        first_id, final_id = int(event['U']), int(event['u'])
+
+        if not self.ready:
+            if len(self.pending) >= self.MAX_PENDING:
+                self.pending.pop(0)
+            self.pending.append(event)
+            return True
+
+        # 快照之前的旧推送直接丢弃
+        if final_id < self.last_update_id:
+            return True
+
+        if self.awaiting_first:
+            # 快照后的第一条推送必须覆盖快照的lastUpdateId
+            continuous = first_id <= self.last_update_id + 1
+        elif 'pu' in event:
+            # 合约：pu等于上一条推送的u
+            continuous = int(event['pu']) == self.last_update_id
+        else:
+            # 现货：U等于上一条推送的u+1
+            continuous = first_id == self.last_update_id + 1
+
+        if not continuous:
+            logger.warning(f"Order book gap for {self.symbol}: last {self.last_update_id}, "
+                           f"got U={first_id} u={final_id}")
+            self.reset()
+            self.pending = [event]
+            return False
+
+        for price, qty in event['b']:
+            self.bids.update(float(price), float(qty))
+        for price, qty in event['a']:
+            self.asks.update(float(price), float(qty))
+        self.last_update_id = final_id
+        self.awaiting_first = False
+        self._refresh()
+        return True
+
+    def _refresh(self):
+        """重新计算最优价及前depth档的统计量"""
+        top_bids = self.bids.top(self.depth)
+        top_asks = self.asks.top(self.depth)
+
+        self.bid_depth = sum(qty for _, qty in top_bids)
+        self.ask_depth = sum(qty for _, qty in top_asks)
+        total = self.bid_depth + self.ask_depth
+        self.imbalance = (self.bid_depth - self.ask_depth) / total if total > 0 else 0.0
+
+        if not top_bids or not top_asks:
+            self.best_bid, self.best_bid_qty = top_bids[0] if top_bids else (None, 0.0)
+            self.best_ask, self.best_ask_qty = top_asks[0] if top_asks else (None, 0.0)
+            self.microprice = self.spread = self.mid = None
+            return
+
+        (self.best_bid, self.best_bid_qty), (self.best_ask, self.best_ask_qty) = top_bids[0], top_asks[0]
+        self.spread = self.best_ask - self.best_bid
+        self.mid = (self.best_bid + self.best_ask) / 2
+        # 微观价格：以对手盘数量加权，买盘越厚越靠近卖一价
+        self.microprice = ((self.best_bid * self.best_ask_qty + self.best_ask * self.best_bid_qty)
+                           / (self.best_bid_qty + self.best_ask_qty))
+
+    def top(self, n: Optional[int] = None) -> Dict[str, List[List[float]]]:
+        """前n档盘口，格式与 ExchangeAPI.get_market_depth 一致"""
+        n = n or self.depth
+        return {'bids': self.bids.top(n), 'asks': self.asks.top(n)}
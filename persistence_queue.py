@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# 一条待写入的记录：(表名, 字段)
+Row = Tuple[str, Dict[str, Any]]
+# writer(rows) 在一个事务中写入全部记录，失败时抛出异常
+Writer = Callable[[List[Row]], None]
+# 队列中的记录：(写入日志id, 表名, 字段)
+Item = Tuple[Optional[int], str, Dict[str, Any]]
+
+# 未启用写入日志时在内存中保留的死信条数
+MAX_DEAD_LETTERS = 1000
+
+
+def is_rejected(error: Exception) -> bool:
+    """数据库因记录本身（约束、数据类型）拒绝写入；锁等待超时、断连等其他错误重试即可"""
+    return isinstance(error, (IntegrityError, DataError, sqlite3.IntegrityError, sqlite3.DataError))
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Unserializable value: {value!r}")
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class WriteJournal:
+    """
+    本地写入日志（SQLite WAL）
+
+    记录入队时先追加到日志，写入主库成功后删除；
+    进程崩溃后重启时，日志中剩余的记录会被重新写入。
+    主库拒绝的记录移入 dead_letter 表，不再重试，可人工修正后重新写入。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY, tbl TEXT, payload TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS dead_letter '
+                          '(id INTEGER PRIMARY KEY, tbl TEXT, payload TEXT, error TEXT, failed_at TEXT)')
+
+    def append(self, table: str, values: Dict[str, Any]) -> int:
+        with self.lock:
+            cursor = self.conn.execute('INSERT INTO pending (tbl, payload) VALUES (?, ?)',
+                                       (table, json.dumps(values, default=_encode)))
+            return cursor.lastrowid
+
+    def remove(self, ids: List[int]):
+        with self.lock:
+            self.conn.executemany('DELETE FROM pending WHERE id = ?', [(i,) for i in ids])
+
+    def load(self, ids: List[int]) -> List[Item]:
+        """按id读取仍待写入的记录"""
+        with self.lock:
+            rows = [self.conn.execute('SELECT id, tbl, payload FROM pending WHERE id = ?', (i,)).fetchone()
+                    for i in ids]
+        return [(i, table, json.loads(payload, object_hook=_decode)) for i, table, payload in filter(None, rows)]
+
+    def pending(self) -> List[Item]:
+        with self.lock:
+            rows = self.conn.execute('SELECT id, tbl, payload FROM pending ORDER BY id').fetchall()
+        return [(i, table, json.loads(payload, object_hook=_decode)) for i, table, payload in rows]
+
+    def park(self, item: Item, error: str):
+        """把主库拒绝的记录移入死信表"""
+        journal_id, table, values = item
+        with self.lock:
+            self.conn.execute('BEGIN')
+            self.conn.execute('INSERT INTO dead_letter (tbl, payload, error, failed_at) VALUES (?, ?, ?, ?)',
+                              (table, json.dumps(values, default=_encode), error, datetime.utcnow().isoformat()))
+            if journal_id is not None:
+                self.conn.execute('DELETE FROM pending WHERE id = ?', (journal_id,))
+            self.conn.execute('COMMIT')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class PersistenceQueue:
+    """
+    异步写入队列（write-behind）
+
+    交易线程只把记录放入内存队列即返回，后台线程每flush_interval秒
+    或攒够batch_size条时在一个事务中批量写入，下单延迟不再包含数据库提交。
+    后台线程在第一次put时启动，只导入模块（如迁移脚本）不会启动线程。
+
+    数据库拒绝记录（IntegrityError/DataError）时把批次二分找出被拒绝的记录，
+    移入死信（写入日志的 dead_letter 表，未启用日志时保留在内存并记录日志），不会阻塞后续记录；
+    其他错误（锁等待超时、断连等）不拆分，本批未写入的记录按指数退避整体重试。
+    队列写满时put最多等待put_timeout秒，超时后记录只保留在写入日志中，
+    由后台线程在积压写完后读取（未启用日志时丢弃并记录错误），交易线程不会被无限期阻塞。
+    stop时同步写完剩余记录。
+    """
+
+    def __init__(self, writer: Writer,
+                 flush_interval: Optional[float] = None,
+                 batch_size: Optional[int] = None,
+                 max_size: Optional[int] = None,
+                 journal_path: Optional[str] = None,
+                 put_timeout: Optional[float] = None,
+                 max_backoff: Optional[float] = None,
+                 rejected: Callable[[Exception], bool] = is_rejected):
+        """
+        Args:
+            writer: 批量写入函数
+            flush_interval: 最长刷新间隔秒数（默认读取 PERSIST_FLUSH_MS，缺省200毫秒）
+            batch_size: 攒够多少条立即刷新（默认读取 PERSIST_BATCH_SIZE，缺省100）
+            max_size: 队列上限（默认读取 PERSIST_QUEUE_SIZE，缺省10000）
+            journal_path: 本地写入日志路径（默认读取 PERSIST_JOURNAL，为空则不启用）
+            put_timeout: 队列已满时put的最长等待秒数（默认读取 PERSIST_PUT_TIMEOUT_MS，缺省1000毫秒）
+            max_backoff: 写入失败后重试间隔的上限秒数（默认读取 PERSIST_MAX_BACKOFF，缺省30）
+            rejected: 判断异常是否为记录被数据库拒绝（拒绝的记录进入死信，其他异常整批重试）
+        """
+        self.writer = writer
+        self.rejected = rejected
+        self.flush_interval = flush_interval or float(os.getenv('PERSIST_FLUSH_MS', '200')) / 1000
+        self.batch_size = batch_size or int(os.getenv('PERSIST_BATCH_SIZE', '100'))
+        self.queue: 'queue.Queue[Item]' = queue.Queue(
+            maxsize=max_size or int(os.getenv('PERSIST_QUEUE_SIZE', '10000')))
+        self.put_timeout = put_timeout if put_timeout is not None \
+            else float(os.getenv('PERSIST_PUT_TIMEOUT_MS', '1000')) / 1000
+        self.max_backoff = max_backoff or float(os.getenv('PERSIST_MAX_BACKOFF', '30'))
+
+        journal_path = journal_path if journal_path is not None else os.getenv('PERSIST_JOURNAL', '')
+        self.journal = WriteJournal(journal_path) if journal_path else None
+
+        self.retry: List[Item] = []
+        self.spilled: List[int] = []  # 队列满时只写入了日志的记录id
+        self.dead_letters: deque = deque(maxlen=MAX_DEAD_LETTERS)
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+        self.start_lock = threading.Lock()
+        self.spill_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.stats_counts = {'queued': 0, 'written': 0, 'batches': 0, 'failures': 0, 'blocked': 0,
+                             'spilled': 0, 'dropped': 0, 'dead_letters': 0}
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        """启动后台写入线程，并重放写入日志中上次未完成的记录"""
+        with self.start_lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            if self.journal is not None and self.thread is None:
+                pending = self.journal.pending()
+                if pending:
+                    logger.info(f"Replaying {len(pending)} journaled rows")
+                    self.retry.extend(pending)
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, name='persistence-queue', daemon=True)
+            self.thread.start()
+
+    def put(self, table: str, values: Dict[str, Any]):
+        """放入一条记录（队列已满时最多等待put_timeout秒）"""
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+        journal_id = self.journal.append(table, values) if self.journal is not None else None
+        item = (journal_id, table, values)
+        self.stats_counts['queued'] += 1
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            self.stats_counts['blocked'] += 1
+        try:
+            self.queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            if journal_id is not None:
+                with self.spill_lock:
+                    self.spilled.append(journal_id)
+                self.stats_counts['spilled'] += 1
+                logger.warning("Persistence queue full, row kept in journal only")
+            else:
+                self.stats_counts['dropped'] += 1
+                logger.error(f"Persistence queue full, dropped {table} row: {values}")
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            # 等到刷新间隔到期或攒够一批
+            while self.queue.qsize() < self.batch_size and not self.stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.stop_event.wait(min(remaining, 0.01))
+            self.flush()
+
+    def flush(self, force: bool = False) -> int:
+        """
+        写入当前全部记录，返回写入条数
+
+        重试退避期间直接返回（force=True时忙等退避）；上次失败的记录写完后才取新记录，
+        数据库不可用时新记录留在有上限的队列中，不会在内存中无限积累。
+        """
+        with self.flush_lock:
+            if not force and time.monotonic() < self.retry_at:
+                return 0
+            written = 0
+            if self.retry:
+                batch, self.retry = self.retry, []
+                written += self._write_batch(batch)
+                if self.retry:
+                    return written
+            written += self._write_batch(self._take_new())
+            return written
+
+    def _take_new(self) -> List[Item]:
+        """取出队列中的记录，以及之前溢出到写入日志的记录"""
+        batch: List[Item] = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        with self.spill_lock:
+            ids, self.spilled = self.spilled[:self.queue.maxsize], self.spilled[self.queue.maxsize:]
+        if ids:
+            batch.extend(self.journal.load(ids))
+        return batch
+
+    def _write_batch(self, batch: List[Item]) -> int:
+        written = 0
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            done: List[Item] = []
+            failed: List[Tuple[Item, str]] = []
+            try:
+                self._write(chunk, done, failed)
+            except Exception:
+                # 数据库不可用、锁等待超时等：本批未写入的记录及之后的记录退避后重试
+                settled = {id(item) for item in done} | {id(item) for item, _ in failed}
+                self.retry = [item for item in chunk if id(item) not in settled] + batch[start + len(chunk):]
+                self.consecutive_failures += 1
+                self.stats_counts['failures'] += 1
+                delay = min(self.flush_interval * 2 ** self.consecutive_failures, self.max_backoff)
+                self.retry_at = time.monotonic() + delay
+                logger.error(f"Persistence flush failed, {len(self.retry)} rows pending, "
+                             f"retrying in {delay:.1f}s: {self.last_error}")
+                break
+            finally:
+                written += len(done)
+                for item, error in failed:
+                    self._dead_letter(item, error)
+        else:
+            self.consecutive_failures = 0
+            self.retry_at = 0.0
+        self.stats_counts['written'] += written
+        return written
+
+    def _write(self, chunk: List[Item], done: List[Item], failed: List[Tuple[Item, str]]):
+        """
+        写入一批记录，写入成功的加入done；记录被拒绝时二分定位，被拒绝的单条记录加入failed，
+        其他异常直接抛出
+        """
+        try:
+            self.writer([(table, values) for _, table, values in chunk])
+        except Exception as e:
+            self.last_error = str(e)
+            if not self.rejected(e):
+                raise
+            if len(chunk) == 1:
+                failed.append((chunk[0], str(e)))
+                return
+            middle = len(chunk) // 2
+            self._write(chunk[:middle], done, failed)
+            self._write(chunk[middle:], done, failed)
+            return
+        if self.journal is not None:
+            self.journal.remove([journal_id for journal_id, _, _ in chunk if journal_id is not None])
+        self.stats_counts['batches'] += 1
+        done.extend(chunk)
+
+    def _dead_letter(self, item: Item, error: str):
+        _, table, values = item
+        self.stats_counts['dead_letters'] += 1
+        if self.journal is not None:
+            self.journal.park(item, error)
+            logger.error(f"Rejected {table} row moved to dead letter: {error}")
+        else:
+            self.dead_letters.append({'table': table, 'values': values, 'error': error})
+            logger.error(f"Rejected {table} row dropped: {values}: {error}")
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程并写完剩余记录"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+        self.flush(force=True)
+        pending = len(self.retry) + self.queue.qsize() + len(self.spilled)
+        if pending:
+            logger.error(f"{pending} rows could not be written on shutdown"
+                         + (", kept in journal" if self.journal is not None else ""))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats_counts,
+            'pending': self.queue.qsize() + len(self.retry) + len(self.spilled),
+            'journal': self.journal.path if self.journal is not None else None,
+            'retry_in': max(0.0, self.retry_at - time.monotonic()),
+            'last_error': self.last_error
+        }
@@ -0,0 +1,203 @@
+import logging
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger(__name__)
+
+# 每笔交易同时计入小时桶和日桶
+PERIODS = ('hour', 'day')
+
+# 汇总键：周期、桶开始时间、机器人（0表示手动）、策略（空串表示无策略）、交易所、交易对
+KEY_FIELDS = ('period', 'bucket', 'bot_id', 'strategy', 'exchange', 'symbol')
+
+# 桶内统计；pnl_peak/pnl_trough/max_drawdown 为桶内按平仓顺序累计盈亏的
+# 最高点、最低点和最大回撤（相对桶开始），用于跨桶合并计算整体最大回撤
+COUNT_FIELDS = ('trades', 'closed', 'wins', 'losses')
+AMOUNT_FIELDS = ('pnl_sum', 'gross_profit', 'gross_loss', 'pnl_peak', 'pnl_trough', 'max_drawdown')
+BUCKET_FIELDS = COUNT_FIELDS + AMOUNT_FIELDS
+
+
+def bucket_start(timestamp: datetime, period: str) -> datetime:
+    if period == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def rollup_key(trade: Dict[str, Any], period: str) -> Dict[str, Any]:
+    return {
+        'period': period,
+        'bucket': bucket_start(trade['timestamp'], period),
+        'bot_id': trade.get('bot_id') or 0,
+        'strategy': trade.get('strategy') or '',
+        'exchange': trade['exchange'],
+        'symbol': trade['symbol'],
+    }
+
+
+def empty_bucket() -> Dict[str, Any]:
+    return {**{field: 0 for field in COUNT_FIELDS}, **{field: 0.0 for field in AMOUNT_FIELDS}}
+
+
+def apply_trade(bucket: Dict[str, Any], opened: bool = False, pnl: Optional[float] = None,
+                previous_pnl: Optional[float] = None) -> Dict[str, Any]:
+    """
+    把一笔交易计入桶（就地更新并返回）
+
+    Args:
+        opened: 新增交易记录
+        pnl: 平仓盈亏（尚未平仓为None）
+        previous_pnl: 盈亏被修改时的旧值，先从计数和金额中撤回；
+                      回撤输入无法撤回，按新值继续累积
+    """
+    if opened:
+        bucket['trades'] += 1
+    if previous_pnl is not None:
+        bucket['closed'] -= 1
+        bucket['pnl_sum'] -= previous_pnl
+        if previous_pnl > 0:
+            bucket['wins'] -= 1
+            bucket['gross_profit'] -= previous_pnl
+        elif previous_pnl < 0:
+            bucket['losses'] -= 1
+            bucket['gross_loss'] -= -previous_pnl
+    if pnl is not None:
+        bucket['closed'] += 1
+        if pnl > 0:
+            bucket['wins'] += 1
+            bucket['gross_profit'] += pnl
+        elif pnl < 0:
+            bucket['losses'] += 1
+            bucket['gross_loss'] += -pnl
+        cumulative = bucket['pnl_sum'] + pnl
+        bucket['pnl_peak'] = max(bucket['pnl_peak'], cumulative)
+        bucket['pnl_trough'] = min(bucket['pnl_trough'], cumulative)
+        bucket['max_drawdown'] = max(bucket['max_drawdown'], bucket['pnl_peak'] - cumulative)
+        bucket['pnl_sum'] = cumulative
+    return bucket
+
+
+def _greater(a, b):
+    return sa.case((a > b, a), else_=b)
+
+
+def _lesser(a, b):
+    return sa.case((a < b, a), else_=b)
+
+
+def _upsert_bucket(connection, table: sa.Table, key: Dict[str, Any], opened: bool,
+                   pnl: Optional[float], previous_pnl: Optional[float]):
+    """
+    一条 INSERT ... ON CONFLICT DO UPDATE 计入一个桶
+
+    新桶直接插入本笔交易的统计；已有桶在数据库中原子地累加，并发写入不会丢失增量，
+    也不会因两个写入者同时创建同一个桶而违反唯一约束。
+    """
+    insert = postgresql.insert if connection.dialect.name == 'postgresql' else sqlite.insert
+    delta = apply_trade(empty_bucket(), opened, pnl, previous_pnl)
+    updates = {field: table.c[field] + delta[field]
+               for field in COUNT_FIELDS + ('pnl_sum', 'gross_profit', 'gross_loss')}
+    if pnl is not None:
+        # SET中引用的列都是更新前的值，与 apply_trade 的计算顺序一致
+        cumulative = table.c.pnl_sum + delta['pnl_sum']
+        peak = _greater(table.c.pnl_peak, cumulative)
+        updates['pnl_peak'] = peak
+        updates['pnl_trough'] = _lesser(table.c.pnl_trough, cumulative)
+        updates['max_drawdown'] = _greater(table.c.max_drawdown, peak - cumulative)
+    statement = insert(table).values(**key, **delta)
+    connection.execute(statement.on_conflict_do_update(index_elements=list(KEY_FIELDS), set_=updates))
+
+
+def _select_update_bucket(connection, table: sa.Table, key: Dict[str, Any], opened: bool,
+                          pnl: Optional[float], previous_pnl: Optional[float]):
+    """不支持ON CONFLICT的数据库：锁定桶后读改写"""
+    where = sa.and_(*[table.c[name] == value for name, value in key.items()])
+    row = connection.execute(sa.select(table).where(where).with_for_update()).mappings().first()
+    if row is None:
+        bucket = apply_trade(empty_bucket(), opened, pnl, previous_pnl)
+        connection.execute(table.insert().values(**key, **bucket))
+    else:
+        bucket = apply_trade({field: row[field] for field in BUCKET_FIELDS}, opened, pnl, previous_pnl)
+        connection.execute(table.update().where(table.c.id == row['id']).values(**bucket))
+
+
+def record_trade(connection, table: sa.Table, trade: Dict[str, Any], opened: bool = False,
+                 pnl: Optional[float] = None, previous_pnl: Optional[float] = None) -> bool:
+    """
+    在当前事务中把一笔交易的新增/平仓计入对应的小时桶和日桶
+
+    汇总写入失败只记录日志，不影响交易记录本身的提交（Postgres上在SAVEPOINT中执行，
+    失败时只回滚汇总）；缺失的增量可用 rebuild 由交易记录重建。返回是否写入成功。
+    """
+    upsert = _upsert_bucket if connection.dialect.name in ('postgresql', 'sqlite') else _select_update_bucket
+    try:
+        # Postgres中语句出错会中止整个事务，需用SAVEPOINT隔离；SQLite只回滚出错的语句
+        with connection.begin_nested() if connection.dialect.name == 'postgresql' else nullcontext():
+            for period in PERIODS:
+                upsert(connection, table, rollup_key(trade, period), opened, pnl, previous_pnl)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update PnL rollup for {trade.get('exchange')} {trade.get('symbol')}: {str(e)}")
+        return False
+
+
+def rebuild(connection, table: sa.Table, trades: Iterable[Dict[str, Any]]) -> int:
+    """
+    由交易记录重建汇总表
+
+    trades需按时间升序，每项包含 timestamp、bot_id、strategy、exchange、symbol、pnl。
+    返回写入的桶数。
+    """
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for trade in trades:
+        for period in PERIODS:
+            key = rollup_key(trade, period)
+            index = tuple(key[name] for name in KEY_FIELDS)
+            bucket = buckets.get(index)
+            if bucket is None:
+                bucket = buckets[index] = {**key, **empty_bucket()}
+            apply_trade(bucket, opened=True, pnl=trade.get('pnl'))
+
+    connection.execute(table.delete())
+    if buckets:
+        connection.execute(table.insert(), list(buckets.values()))
+    logger.info(f"Rebuilt {len(buckets)} PnL rollup buckets")
+    return len(buckets)
+
+
+def summarize(buckets: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并按时间升序的桶，耗时与桶数成正比
+
+    最大回撤按桶依次拼接：前面所有桶的最高累计盈亏减去本桶内的最低点，
+    与各桶自身的最大回撤取最大值。
+    单一序列（同一汇总键）的结果与逐笔计算一致；多个键的桶落在同一时间时
+    桶内先后顺序未知，回撤为近似值，粒度越细越接近。
+    """
+    totals = {**{field: 0 for field in COUNT_FIELDS}, 'pnl_sum': 0.0, 'gross_profit': 0.0, 'gross_loss': 0.0}
+    peak = 0.0
+    max_drawdown = 0.0
+    for bucket in buckets:
+        cumulative = totals['pnl_sum']
+        max_drawdown = max(max_drawdown, bucket['max_drawdown'], peak - (cumulative + bucket['pnl_trough']))
+        peak = max(peak, cumulative + bucket['pnl_peak'])
+        for field in totals:
+            totals[field] += bucket[field]
+
+    return {
+        'total_trades': totals['trades'],
+        'closed_trades': totals['closed'],
+        'winning_trades': totals['wins'],
+        'losing_trades': totals['losses'],
+        'win_rate': totals['wins'] / totals['closed'] * 100 if totals['closed'] else 0,
+        'total_pnl': totals['pnl_sum'],
+        'gross_profit': totals['gross_profit'],
+        'gross_loss': totals['gross_loss'],
+        'profit_factor': totals['gross_profit'] / totals['gross_loss'] if totals['gross_loss'] else None,
+        'max_drawdown': max_drawdown
+    }
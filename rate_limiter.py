@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 请求等待令牌的最长时间（秒），超过则直接拒绝
+DEFAULT_MAX_WAIT = 2.0
+
+# 各交易所的权重类别及限额：类别 -> (容量, 周期秒数)，均在官方限额基础上预留约10%余量
+EXCHANGE_LIMITS: Dict[str, Dict[str, Tuple[int, float]]] = {
+    'binance': {
+        'futures_weight': (2160, 60),  # /fapi REQUEST_WEIGHT 2400/分钟
+        'spot_weight': (5400, 60),     # /api、/sapi REQUEST_WEIGHT 6000/分钟
+        'orders': (270, 10),           # 合约 ORDERS 300/10秒
+    },
+    'lbank': {
+        'weight': (180, 10),           # 约20次/秒
+    },
+}
+
+# Binance 已知接口的权重，未列出的接口按1计
+BINANCE_WEIGHTS = {
+    '/fapi/v2/account': 5,
+    '/fapi/v2/balance': 5,
+    '/fapi/v2/positionRisk': 5,
+    '/fapi/v1/userTrades': 5,
+    '/fapi/v1/allOrders': 5,
+    '/fapi/v1/batchOrders': 5,
+    '/fapi/v1/allOpenOrders': 1,
+    '/api/v3/account': 20,
+    '/api/v3/exchangeInfo': 20,
+}
+
+ORDER_PATHS = ('/fapi/v1/order', '/fapi/v1/batchOrders', '/api/v3/order')
+
+
+class RateLimitExceeded(Exception):
+    """请求在发出前被限流器拒绝（令牌不足且等待时间超过上限，或交易所要求暂停）"""
+
+
+def _limit_weight(limit: int, steps: Tuple[Tuple[int, int], ...], default: int) -> int:
+    for bound, weight in steps:
+        if limit <= bound:
+            return weight
+    return default
+
+
+def binance_weights(method: str, path: str, params: Dict[str, str]) -> Dict[str, int]:
+    """按接口路径和参数估算 Binance 请求在各类别中的消耗"""
+    weight_class = 'futures_weight' if path.startswith('/fapi') else 'spot_weight'
+    if path.endswith('/klines'):
+        weight = _limit_weight(int(params.get('limit', 500)), ((99, 1), (499, 2), (1000, 5)), 10)
+    elif path.endswith('/depth'):
+        weight = _limit_weight(int(params.get('limit', 500)), ((50, 2), (100, 5), (500, 10)), 20)
+    elif path in ('/fapi/v1/openOrders', '/api/v3/openOrders') and 'symbol' not in params:
+        weight = 40
+    else:
+        weight = BINANCE_WEIGHTS.get(path, 1)
+
+    weights = {weight_class: weight}
+    if path in ORDER_PATHS and method in ('POST', 'PUT'):
+        weights['orders'] = params.get('batchOrders', '').count('{') or 1
+    return weights
+
+
+def lbank_weights(method: str, path: str, params: Dict[str, str]) -> Dict[str, int]:
+    return {'weight': 1}
+
+
+EXCHANGE_WEIGHTS: Dict[str, Callable[[str, str, Dict[str, str]], Dict[str, int]]] = {
+    'binance': binance_weights,
+    'lbank': lbank_weights,
+}
+
+
+class TokenBucket:
+    """令牌桶：容量capacity，每period秒匀速补满"""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, weight: int) -> float:
+        """令牌足够时为0，否则为补足所需的秒数"""
+        return max(0.0, (min(weight, self.capacity) - self.tokens) / self.rate)
+
+    def sync(self, used: int):
+        """按交易所返回的已用权重校正（同一IP上其他进程的消耗也计算在内）"""
+        self.tokens = min(self.tokens, float(self.capacity - used))
+
+
+class RateLimiter:
+    """
+    单个交易所的限流器
+
+    每个权重类别一个令牌桶，请求发出前按权重取令牌，令牌不足时排队等待，
+    预计等待超过max_wait时直接拒绝（抛出RateLimitExceeded），不再把请求发给交易所。
+    响应后读取 X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-10S 校正令牌数，
+    收到429/418时按Retry-After暂停全部请求。线程安全，同一进程内所有调用方共用。
+    """
+
+    def __init__(self, exchange: str, limits: Dict[str, Tuple[int, float]],
+                 weigh: Callable[[str, str, Dict[str, str]], Dict[str, int]],
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        self.exchange = exchange
+        self.buckets = {name: TokenBucket(capacity, period) for name, (capacity, period) in limits.items()}
+        self.weigh = weigh
+        self.max_wait = max_wait
+        self.blocked_until = 0.0
+        self.cond = threading.Condition()
+        self.stats_counts = {'requests': 0, 'queued': 0, 'shed': 0, 'throttled': 0}
+
+    def acquire(self, weights: Dict[str, int], max_wait: Optional[float] = None):
+        """
+        按各类别的权重取令牌，必要时等待
+
+        Raises:
+            RateLimitExceeded: 预计等待时间超过max_wait
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        queued = False
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                wait = max(0.0, self.blocked_until - now)
+                for name, weight in weights.items():
+                    bucket = self.buckets[name]
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(weight))
+
+                if wait == 0:
+                    for name, weight in weights.items():
+                        self.buckets[name].tokens -= weight
+                    self.stats_counts['requests'] += 1
+                    return
+                if now + wait > deadline:
+                    self.stats_counts['shed'] += 1
+                    raise RateLimitExceeded(
+                        f"{self.exchange} rate limit: request would wait {wait:.2f}s, limit {max_wait:.2f}s")
+                if not queued:
+                    self.stats_counts['queued'] += 1
+                    queued = True
+                self.cond.wait(wait)
+
+    def update(self, status_code: int, headers, path: str = ''):
+        """根据响应头校正令牌，429/418时暂停"""
+        with self.cond:
+            now = time.monotonic()
+            used_weight = headers.get('X-MBX-USED-WEIGHT-1M')
+            if used_weight is not None:
+                name = 'futures_weight' if path.startswith('/fapi') else 'spot_weight'
+                if name in self.buckets:
+                    self.buckets[name].refill(now)
+                    self.buckets[name].sync(int(used_weight))
+            order_count = headers.get('X-MBX-ORDER-COUNT-10S')
+            if order_count is not None and 'orders' in self.buckets:
+                self.buckets['orders'].refill(now)
+                self.buckets['orders'].sync(int(order_count))
+
+            if status_code in (418, 429):
+                retry_after = float(headers.get('Retry-After') or 60)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.stats_counts['throttled'] += 1
+                logger.warning(f"{self.exchange} returned {status_code}, pausing requests for {retry_after:.0f}s")
+
+    def mount(self, session, **adapter_kwargs):
+        """在requests.Session上安装限流适配器，之后该会话的所有请求都经过限流"""
+        adapter = RateLimitedAdapter(self, **adapter_kwargs)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def stats(self) -> Dict:
+        with self.cond:
+            now = time.monotonic()
+            buckets = {}
+            for name, bucket in self.buckets.items():
+                bucket.refill(now)
+                buckets[name] = {'tokens': round(bucket.tokens, 2), 'capacity': bucket.capacity}
+            return {
+                **self.stats_counts,
+                'blocked_for': max(0.0, self.blocked_until - now),
+                'buckets': buckets
+            }
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """发送前向限流器取令牌、收到响应后回报响应头的HTTPAdapter"""
+
+    def __init__(self, limiter: RateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        params = dict(parse_qsl(url.query))
+        body = request.body.decode() if isinstance(request.body, bytes) else request.body
+        if isinstance(body, str):
+            params.update(parse_qsl(body))
+        self.limiter.acquire(self.limiter.weigh(request.method, url.path, params))
+        response = super().send(request, **kwargs)
+        self.limiter.update(response.status_code, response.headers, url.path)
+        return response
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(exchange: str) -> RateLimiter:
+    """获取指定交易所的共享限流器"""
+    exchange = exchange.lower()
+    with _limiters_lock:
+        limiter = _limiters.get(exchange)
+        if limiter is None:
+            if exchange not in EXCHANGE_LIMITS:
+                raise ValueError(f"Unsupported exchange: {exchange}")
+            limiter = RateLimiter(exchange, EXCHANGE_LIMITS[exchange], EXCHANGE_WEIGHTS[exchange])
+            _limiters[exchange] = limiter
+        return limiter
@@ -3,9 +3,12 @@ import json
 import time
 import logging
 from datetime import datetime
+import ccxt
+from rate_limiter import get_rate_limiter
 from strategies.combined_strategy import CombinedStrategy
 from trading.binance_trading import BinanceTrading
 from trading.lbank_trading import LBankTrading
+from user_data_stream import BinanceUserDataStream
 
 # 配置日志
 logging.basicConfig(
@@ -40,6 +43,21 @@ def initialize_trading(exchange: str) -> object:
         logger.error(f"初始化交易接口失败: {str(e)}")
         raise
 
+def initialize_user_stream(exchange: str):
+    """Binance使用用户数据流推送订单状态，其他交易所返回None（沿用轮询）"""
+    if exchange.lower() != 'binance':
+        return None
+    client = ccxt.binance({
+        'apiKey': os.getenv('BINANCE_API_KEY'),
+        'secret': os.getenv('BINANCE_API_SECRET'),
+        'enableRateLimit': True,
+        'options': {
+            'defaultType': 'future'
+        }
+    })
+    get_rate_limiter('binance').mount(client.session)
+    return BinanceUserDataStream(client)
+
 def main():
     """主函数"""
     try:
@@ -58,22 +76,39 @@ def main():
             raise Exception("策略初始化失败")
         logger.info("策略初始化成功")
         
-        # 运行策略
-        logger.info("开始运行策略...")
-        while True:
+        # 订单推送（连接失败时网格检查回退到轮询）
+        user_stream = initialize_user_stream(exchange)
+        if user_stream is not None:
+            strategy.attach_user_stream(user_stream)
             try:
-                # 获取市场数据
-                for pair in config['trading_pairs']:
-                    tick_data = trading.get_tick_data(pair['symbol'])
-                    if tick_data:
-                        strategy.on_tick(tick_data)
-                
-                # 等待下一个周期
-                time.sleep(1)
-                
+                user_stream.start()
+                logger.info("用户数据流已启动")
             except Exception as e:
-                logger.error(f"策略运行错误: {str(e)}")
-                time.sleep(60)  # 发生错误时等待一分钟后继续
+                logger.error(f"启动用户数据流失败，订单状态改为轮询: {str(e)}")
+        
+        # 运行策略
+        logger.info("开始运行策略...")
+        try:
+            while True:
+                try:
+                    # 处理订单推送
+                    strategy.process_order_events()
+                    
+                    # 获取市场数据
+                    for pair in config['trading_pairs']:
+                        tick_data = trading.get_tick_data(pair['symbol'])
+                        if tick_data:
+                            strategy.on_tick(tick_data)
+                    
+                    # 等待下一个周期
+                    time.sleep(1)
+                    
+                except Exception as e:
+                    logger.error(f"策略运行错误: {str(e)}")
+                    time.sleep(60)  # 发生错误时等待一分钟后继续
+        finally:
+            if user_stream is not None:
+                user_stream.stop()
                 
     except Exception as e:
         logger.error(f"程序运行错误: {str(e)}")
@@ -1,8 +1,10 @@
 import os
 import json
 import time
+import asyncio
 import logging
 from exchange_api import ExchangeAPI
+from async_exchange_api import AsyncExchangeAPI
 from strategy_engine import StrategyEngine
 from datetime import datetime
 import pandas as pd
@@ -23,6 +25,7 @@ class TradingBot:
     def __init__(self, config_path: str):
         self.config = self.load_config(config_path)
         self.exchange_api = self.initialize_exchange()
+        self.async_exchange_api = None
         self.strategy_engines = {}
         self.initialize_strategies()
         self.trading_stats = {
@@ -116,45 +119,71 @@ class TradingBot:
 
     def run(self):
         """运行交易策略"""
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        """主循环：每个周期并发拉取并评估所有交易对"""
         logger.info("Starting trading bot...")
-        
-        while True:
-            try:
-                if not self.check_risk_limits():
-                    logger.info("Risk limits reached, stopping trading")
-                    break
-
-                for symbol, engine in self.strategy_engines.items():
-                    # 获取市场数据
-                    market_data = self.exchange_api.get_market_data(symbol, limit=200)
-                    
-                    # 计算技术指标
-                    indicators = engine.calculate_indicators(market_data)
-                    
-                    # 生成交易信号
-                    signal = engine.generate_signal(indicators)
-                    
-                    if signal:
-                        # 执行交易信号
-                        order = engine.execute_signal(signal, symbol)
-                        logger.info(f"Executed order for {symbol}: {json.dumps(order)}")
-                    
-                    # 更新持仓状态
-                    engine.update_position_status(symbol)
-                    
-                    # 获取策略统计信息
-                    stats = engine.get_strategy_stats()
-                    self.update_trading_stats(stats['total_pnl'])
-                    
-                    # 记录交易统计
-                    logger.info(f"Trading stats for {symbol}: {json.dumps(stats)}")
-                
-                # 等待下一个交易周期
-                time.sleep(self.config['parameters']['min_signal_interval'])
-                
-            except Exception as e:
-                logger.error(f"Error in main loop: {str(e)}")
-                time.sleep(60)  # 发生错误时等待一分钟后继续
+        self.async_exchange_api = AsyncExchangeAPI(
+            self.exchange_api.exchange, self.exchange_api.api_key, self.exchange_api.api_secret
+        )
+
+        try:
+            while True:
+                try:
+                    if not self.check_risk_limits():
+                        logger.info("Risk limits reached, stopping trading")
+                        break
+
+                    symbols = list(self.strategy_engines)
+                    results = await asyncio.gather(
+                        *(self.process_symbol(symbol, self.strategy_engines[symbol]) for symbol in symbols),
+                        return_exceptions=True
+                    )
+
+                    for symbol, result in zip(symbols, results):
+                        if isinstance(result, Exception):
+                            logger.error(f"Error processing {symbol}: {str(result)}")
+                            continue
+
+                        # 更新交易统计（在主协程中串行执行）
+                        self.update_trading_stats(result['total_pnl'])
+
+                        # 记录交易统计
+                        logger.info(f"Trading stats for {symbol}: {json.dumps(result)}")
+
+                    # 等待下一个交易周期
+                    await asyncio.sleep(self.config['parameters']['min_signal_interval'])
+
+                except Exception as e:
+                    logger.error(f"Error in main loop: {str(e)}")
+                    await asyncio.sleep(60)  # 发生错误时等待一分钟后继续
+        finally:
+            await self.async_exchange_api.close()
+
+    async def process_symbol(self, symbol: str, engine: StrategyEngine) -> dict:
+        """处理单个交易对，返回策略统计信息"""
+        # 获取市场数据
+        market_data = await self.async_exchange_api.get_market_data(symbol, limit=200)
+
+        # 计算技术指标（增量计算，开销很小，直接在事件循环中执行）
+        indicators = engine.calculate_indicators(market_data)
+
+        # 生成交易信号
+        signal = engine.generate_signal(indicators)
+
+        # 下单和持仓检查使用同步接口，放到线程池中执行，避免阻塞其他交易对
+        loop = asyncio.get_running_loop()
+        if signal:
+            # 执行交易信号
+            order = await loop.run_in_executor(None, engine.execute_signal, signal, symbol)
+            logger.info(f"Executed order for {symbol}: {json.dumps(order)}")
+
+        # 更新持仓状态
+        await loop.run_in_executor(None, engine.update_position_status, symbol)
+
+        # 获取策略统计信息
+        return engine.get_strategy_stats()
 
     def save_trading_stats(self):
         """保存交易统计信息"""
@@ -1,7 +1,9 @@
 from typing import Dict, List, Any, Optional
+import queue
 import pandas as pd
 import numpy as np
 from strategies.base import BaseStrategy
+from trading.base import BaseTrading
 import talib
 import logging
 
@@ -16,6 +18,30 @@ class CombinedStrategy(BaseStrategy):
         self.active_orders = {}
         self.trades_buffer = []
         self.klines_buffer = []
+        self.user_stream = None
+        self.orders_resync = True
+        self.order_events: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        
+    def attach_user_stream(self, user_stream) -> None:
+        """
+        接入用户数据流：订单状态由推送驱动，网格检查只在断线或重连后轮询
+
+        推送线程只把订单更新放入队列，由运行策略的线程调用 process_order_events 处理
+        """
+        self.user_stream = user_stream
+        user_stream.add_listener(
+            on_order=self.order_events.put,
+            on_reconnect=lambda: setattr(self, 'orders_resync', True)
+        )
+        
+    def process_order_events(self) -> None:
+        """处理队列中的订单推送"""
+        while True:
+            try:
+                order_data = self.order_events.get_nowait()
+            except queue.Empty:
+                return
+            self.on_order(order_data)
         
     def initialize(self) -> bool:
         """初始化策略"""
@@ -321,41 +347,74 @@ class CombinedStrategy(BaseStrategy):
             logger.error(f"设置网格错误: {str(e)}")
             
     def place_grid_orders(self) -> None:
-        """放置网格订单"""
+        """放置网格订单（尚未挂单的水平一次批量提交）"""
         try:
-            for level in self.grid_levels:
-                if not level['filled']:
-                    order = self.trading.place_order(
-                        symbol=self.config['symbol'],
-                        side=level['side'],
-                        quantity=level['quantity'],
-                        price=level['price'],
-                        order_type='limit'
-                    )
-                    
-                    if order:
-                        level['order_id'] = order['order_id']
-                        self.active_orders[order['order_id']] = level
+            pending = [level for level in self.grid_levels
+                       if not level['filled'] and level.get('order_id') not in self.active_orders]
+            if not pending:
+                return
+
+            results = self.trading.place_orders([{
+                'side': level['side'],
+                'order_type': 'limit',
+                'quantity': level['quantity'],
+                'price': level['price']
+            } for level in pending])
+
+            for level, result in zip(pending, results):
+                if not result['success'] or not result['order']:
+                    logger.error(f"放置网格订单错误: {level['side']} @ {level['price']}: {result['error']}")
+                    continue
+                order = result['order']
+                level['order_id'] = order['order_id']
+                self.active_orders[order['order_id']] = level
                         
         except Exception as e:
             logger.error(f"放置网格订单错误: {str(e)}")
             
     def check_grid_orders(self) -> None:
-        """检查网格订单状态"""
+        """检查网格订单状态（用户数据流正常时跳过轮询）"""
+        if self.user_stream is not None and self.user_stream.live and not self.orders_resync:
+            return
         try:
-            for order_id, level in list(self.active_orders.items()):
+            self.orders_resync = False
+            for order_id in list(self.active_orders):
                 order = self.trading.get_order(order_id)
                 
                 if order['status'] == 'FILLED':
-                    level['filled'] = True
-                    del self.active_orders[order_id]
-                    
-                    # 创建对冲订单
-                    self.create_hedge_order(level)
+                    self.on_grid_order_filled(order_id)
                     
         except Exception as e:
+            self.orders_resync = True
             logger.error(f"检查网格订单状态错误: {str(e)}")
             
+    def on_grid_order_filled(self, order_id: str) -> None:
+        """网格订单成交：标记并创建对冲订单"""
+        level = self.active_orders.pop(order_id, None)
+        if level is None:
+            return  # 推送和轮询可能报告同一笔成交
+        level['filled'] = True
+        
+        # 创建对冲订单
+        self.create_hedge_order(level)
+        
+    def on_order(self, order_data: Dict[str, Any]) -> None:
+        """处理订单更新（用户数据流推送）"""
+        try:
+            order_id = next((k for k in self.active_orders if str(k) == str(order_data['id'])), None)
+            if order_id is None:
+                return
+            if order_data['status'] == 'FILLED':
+                self.on_grid_order_filled(order_id)
+            elif order_data['status'] in ('CANCELED', 'EXPIRED', 'REJECTED'):
+                del self.active_orders[order_id]
+        except Exception as e:
+            logger.error(f"处理订单更新错误: {str(e)}")
+            
+    def on_trade(self, trade_data: Dict[str, Any]) -> None:
+        """处理成交更新"""
+        self.trades.append(trade_data)
+            
     def create_hedge_order(self, level: Dict[str, Any]) -> None:
         """创建对冲订单"""
         try:
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from candle_store import interval_to_ms
+from exchange_api import ExchangeAPI
+from strategy_engine import StrategyEngine
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_CONFIG_FILE = 'strategy_config.json'
+
+# 每次step之间的间隔秒数（行情经K线存储增量更新，持仓止盈止损按该频率检查）
+STEP_INTERVAL = float(os.getenv('BOT_STEP_INTERVAL', '10'))
+
+# 计算MA200等指标所需的K线数量
+KLINE_LIMIT = 200
+
+
+def load_strategy_parameters(path: str = STRATEGY_CONFIG_FILE) -> Dict[str, Any]:
+    """读取策略默认参数"""
+    try:
+        with open(path) as f:
+            return json.load(f).get('parameters', {})
+    except Exception as e:
+        logger.warning(f"Failed to load {path}: {str(e)}")
+        return {}
+
+
+def enabled_strategies(strategies: Any) -> List[str]:
+    """解析机器人配置中的策略：列表（如["trend"]）或 {名称: {"enabled": bool}}"""
+    if isinstance(strategies, str):
+        strategies = json.loads(strategies) if strategies else []
+    if isinstance(strategies, dict):
+        return [name for name, settings in strategies.items() if settings.get('enabled')]
+    return list(strategies or [])
+
+
+class StrategyBot:
+    """
+    由 TradingBotConfig 构建的策略机器人
+
+    每次 step() 拉取K线、增量计算指标；有持仓时检查止盈止损，
+    无持仓时生成信号并在当日交易次数未超限时开仓。
+    开仓、平仓通过 record_trade 回调写入交易记录。
+    """
+
+    def __init__(self, config: Dict[str, Any], exchange_api: ExchangeAPI,
+                 record_trade: Callable[..., Any], parameters: Dict[str, Any] = None):
+        self.bot_id = config['id']
+        self.symbol = config['trading_pair']
+        self.kline_period = config.get('kline_period') or '1m'
+        self.leverage = config.get('leverage')
+        self.max_daily_trades = config.get('max_daily_trades') or 0
+        self.exchange_api = exchange_api
+        self.record_trade = record_trade
+        self.interval = STEP_INTERVAL
+
+        strategies = enabled_strategies(config.get('strategies'))
+        self.strategy = strategies[0] if strategies else 'trend'
+
+        # 默认参数 + 机器人配置（止损止盈为百分比），每根K线最多一个信号；
+        # 仓位按分配资金funds计算，按配置的杠杆下单
+        engine_config = {**load_strategy_parameters(), **(parameters or {})}
+        engine_config.update({
+            'funds': config['funds'],
+            'leverage': self.leverage,
+            'stop_loss_pct': config['stop_loss'] / 100,
+            'take_profit_pct': config['take_profit'] / 100,
+            'max_daily_trades': self.max_daily_trades,
+            'min_signal_interval': interval_to_ms(self.kline_period) / 1000
+        })
+        self.engine = StrategyEngine(exchange_api, engine_config)
+
+        self.trade_day = None
+        self.trades_today = 0
+
+    def step(self):
+        market_data = self.exchange_api.get_market_data(self.symbol, interval=self.kline_period, limit=KLINE_LIMIT)
+        if not market_data:
+            return
+        indicators = self.engine.calculate_indicators(market_data)
+
+        position = self.engine.strategy_state['current_position']
+        if position:
+            self.engine.update_position_status(self.symbol)
+            if self.engine.strategy_state['current_position'] is None:
+                self._record_close(position, market_data[-1]['close'])
+            return
+
+        today = datetime.utcnow().date()
+        if today != self.trade_day:
+            self.trade_day = today
+            self.trades_today = 0
+        if self.max_daily_trades and self.trades_today >= self.max_daily_trades:
+            return
+
+        signal = self.engine.generate_signal(indicators)
+        if not signal:
+            return
+        if not self.engine.execute_signal(signal, self.symbol):
+            return
+        self.trades_today += 1
+        position = self.engine.strategy_state['current_position']
+        if position:
+            self._record(position, 'BUY' if position['side'] == 'LONG' else 'SELL', position['entry_price'], 'OPEN')
+
+    def _record_close(self, position: Dict[str, Any], price: float):
+        direction = 1 if position['side'] == 'LONG' else -1
+        pnl = (price - position['entry_price']) * position['size'] * direction
+        pnl_percentage = (price / position['entry_price'] - 1) * 100 * direction if position['entry_price'] else 0
+        self._record(position, 'SELL' if position['side'] == 'LONG' else 'BUY', price, 'CLOSED',
+                     pnl=pnl, pnl_percentage=pnl_percentage)
+
+    def _record(self, position: Dict[str, Any], side: str, price: float, status: str, **values):
+        try:
+            self.record_trade(
+                bot_id=self.bot_id,
+                exchange=self.exchange_api.exchange,
+                symbol=self.symbol,
+                side=side,
+                position_type=position['side'],
+                price=price,
+                quantity=position['size'],
+                status=status,
+                strategy=self.strategy,
+                strategy_params=json.dumps({
+                    'leverage': self.leverage,
+                    'stop_loss': position['stop_loss'],
+                    'take_profit': position['take_profit']
+                }),
+                **values
+            )
+        except Exception as e:
+            logger.error(f"Bot {self.bot_id} failed to record trade: {str(e)}")
+
+    def close(self):
+        """停止时保留持仓，只记录日志（持仓由止盈止损单或人工处理）"""
+        position = self.engine.strategy_state['current_position']
+        if position:
+            logger.warning(f"Bot {self.bot_id} stopped with open {position['side']} position on {self.symbol}")
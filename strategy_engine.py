@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional, Union
 from exchange_api import ExchangeAPI
+from indicator_engine import IncrementalIndicatorEngine
 import json
 from datetime import datetime
 
@@ -25,6 +26,7 @@ class StrategyEngine:
         self.active_positions = {}
         self.pending_orders = {}
         self.strategy_state = {}
+        self.indicator_engine = IncrementalIndicatorEngine()
         self.initialize_strategy()
 
     def initialize_strategy(self):
@@ -40,38 +42,9 @@ class StrategyEngine:
         logger.info("Strategy initialized with config: %s", json.dumps(self.config))
 
     def calculate_indicators(self, market_data: List[Dict]) -> Dict:
-        """计算技术指标"""
+        """计算技术指标（增量更新，仅新收盘的K线参与计算）"""
         try:
-            df = pd.DataFrame(market_data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-
-            # 计算移动平均线
-            df['MA20'] = df['close'].rolling(window=20).mean()
-            df['MA50'] = df['close'].rolling(window=50).mean()
-            df['MA200'] = df['close'].rolling(window=200).mean()
-
-            # 计算RSI
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['RSI'] = 100 - (100 / (1 + rs))
-
-            # 计算MACD
-            exp1 = df['close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['close'].ewm(span=26, adjust=False).mean()
-            df['MACD'] = exp1 - exp2
-            df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-            df['Histogram'] = df['MACD'] - df['Signal']
-
-            # 计算布林带
-            df['BB_middle'] = df['close'].rolling(window=20).mean()
-            df['BB_std'] = df['close'].rolling(window=20).std()
-            df['BB_upper'] = df['BB_middle'] + (df['BB_std'] * 2)
-            df['BB_lower'] = df['BB_middle'] - (df['BB_std'] * 2)
-
-            return df.iloc[-1].to_dict()
+            return self.indicator_engine.update(market_data)
 
         except Exception as e:
             logger.error(f"Error calculating indicators: {str(e)}")
@@ -175,17 +148,28 @@ class StrategyEngine:
     def execute_signal(self, signal: Dict, symbol: str):
         """执行交易信号"""
         try:
-            # 获取账户余额
+            # 获取账户余额；配置了funds时只使用分配的资金，多个机器人共用账户时互不占用
             account_balance = self.exchange_api.get_account_balance()
-            available_balance = account_balance['available_balance']
+            capital = account_balance['available_balance']
+            if self.config.get('funds'):
+                capital = min(capital, self.config['funds'])
 
-            # 计算仓位大小
-            position_size = self.calculate_position_size(signal, available_balance)
+            # 计算保证金（USDT），乘杠杆得到名义价值
+            margin = self.calculate_position_size(signal, capital)
+            leverage = self.config.get('leverage')
+            notional = margin * (leverage or 1)
 
             # 获取当前价格
             market_data = self.exchange_api.get_market_data(symbol, limit=1)
             current_price = market_data[0]['close']
 
+            # 名义价值换算为基础资产数量，按交易规则取整
+            position_size = self.exchange_api.round_quantity(symbol, notional / current_price)
+            if position_size <= 0:
+                logger.warning(f"Position size for {symbol} below minimum quantity "
+                               f"(notional {notional:.2f} at {current_price}), signal skipped")
+                return None
+
             # 计算止损止盈价格
             stop_loss = self.calculate_stop_loss(signal, current_price)
             take_profit = self.calculate_take_profit(signal, current_price)
@@ -196,7 +180,8 @@ class StrategyEngine:
                 side='BUY' if signal['type'] == 'LONG' else 'SELL',
                 quantity=position_size,
                 stop_loss=stop_loss,
-                take_profit=take_profit
+                take_profit=take_profit,
+                leverage=leverage
             )
 
             # 更新策略状态
@@ -207,7 +192,7 @@ class StrategyEngine:
                 'size': position_size,
                 'stop_loss': stop_loss,
                 'take_profit': take_profit,
-                'order_id': order['orderId']
+                'order_id': order.get('orderId', order.get('id'))
             }
 
             logger.info(f"Executed signal: {json.dumps(order)}")
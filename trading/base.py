@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
 import pandas as pd
 
+# 默认批量实现并行发送的最大线程数
+BATCH_WORKERS = 5
+
 class BaseTrading(ABC):
     """基础交易接口"""
     
@@ -41,6 +45,44 @@ class BaseTrading(ABC):
         """取消订单"""
         pass
         
+    def place_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量下单
+
+        orders每项为place_order的参数（side、order_type、quantity、price）。
+        默认实现并行调用place_order，有批量接口的交易所应覆盖此方法。
+
+        Returns:
+            与orders一一对应的结果列表：{'success', 'order', 'error'}
+        """
+        return self._run_batch(lambda order: self.place_order(**order), orders)
+
+    def cancel_orders(self, order_ids: List[str]) -> List[Dict[str, Any]]:
+        """批量撤单，默认并行调用cancel_order，结果格式同place_orders"""
+        return self._run_batch(self.cancel_order, order_ids)
+
+    def cancel_all_orders(self) -> List[Dict[str, Any]]:
+        """撤销全部挂单，默认按get_open_orders逐个并行撤单"""
+        return self.cancel_orders([order['order_id'] for order in self.get_open_orders()])
+
+    @staticmethod
+    def _run_batch(func: Callable[[Any], Any], items: List[Any]) -> List[Dict[str, Any]]:
+        """并行调用func；抛出异常或返回假值（如cancel_order返回False）都记为失败"""
+        if not items:
+            return []
+
+        def call(item):
+            try:
+                result = func(item)
+            except Exception as e:
+                return {'success': False, 'order': None, 'error': str(e)}
+            if not result:
+                return {'success': False, 'order': None, 'error': f"{item} returned {result!r}"}
+            return {'success': True, 'order': result, 'error': None}
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(items))) as executor:
+            return list(executor.map(call, items))
+
     @abstractmethod
     def get_order(self, order_id: str) -> Dict[str, Any]:
         """获取订单信息"""
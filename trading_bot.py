@@ -1,5 +1,7 @@
 import os
 import time
+import queue
+import threading
 from datetime import datetime
 import pandas as pd
 import numpy as np
@@ -12,7 +14,10 @@ from typing import List, Dict, Tuple
 import ccxt
 import json
 from flask_sqlalchemy import SQLAlchemy
-from app import db, TradeHistory
+from exchange_api import ExchangeAPI, get_order_id
+from market_feed import BinanceMarketFeed
+from user_data_stream import BinanceUserDataStream
+from rate_limiter import get_rate_limiter
 
 # 配置日志
 logging.basicConfig(
@@ -25,6 +30,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 队列积压时只处理最新一条的事件类型
+COALESCED_EVENTS = ('kline', 'tick')
+
 # 加载环境变量
 load_dotenv()
 
@@ -35,6 +43,7 @@ class GridLevel:
         self.quantity = quantity
         self.order_id = None
         self.filled = False
+        self.placing = False  # 下单请求进行中，避免推送线程和交易线程重复挂单
 
 class BinanceTradingBot:
     def __init__(self):
@@ -59,6 +68,11 @@ class BinanceTradingBot:
             })
         else:
             raise ValueError(f"不支持的交易所: {self.exchange_name}")
+        # 同一进程内所有机器人共用该交易所的限流器
+        get_rate_limiter(self.exchange_name).mount(self.exchange.session)
+        # 网格挂单、撤单使用 ExchangeAPI 的批量接口
+        prefix = self.exchange_name.upper()
+        self.api = ExchangeAPI(self.exchange_name, os.getenv(f'{prefix}_API_KEY'), os.getenv(f'{prefix}_API_SECRET'))
         
         # 加载交易设置
         self.trading_pair = os.getenv('TRADING_PAIR', 'ETHUSDT')
@@ -75,6 +89,7 @@ class BinanceTradingBot:
         self.trend_ema_slow = int(os.getenv('TREND_EMA_SLOW'))
         self.scalping_profit_target = float(os.getenv('SCALPING_PROFIT_TARGET'))
         self.scalping_stop_loss = float(os.getenv('SCALPING_STOP_LOSS'))
+        self.order_book_depth = int(os.getenv('ORDER_BOOK_DEPTH', '10'))
         
         # 设置杠杆
         self.set_leverage()
@@ -88,7 +103,44 @@ class BinanceTradingBot:
         self.initial_balance = self.get_account_balance()
         self.grid_levels: List[GridLevel] = []
         self.active_orders: Dict[str, Dict] = {}
+        self.orders_lock = threading.RLock()
+        self.account_positions: Dict[str, Dict] = {}
+        self.early_fills: Dict[str, bool] = {}
+        self.last_scalping_kline = None
+        self.last_signal_kline = None
+        
+        # 推送线程只把事件放入队列，由run()所在的交易线程依次处理，
+        # 下单、撤单和订单状态检查都在同一线程中执行
+        self.events: 'queue.Queue[Tuple[str, object]]' = queue.Queue()
         
+        # 实时行情（Binance通过WebSocket推送，其他交易所沿用轮询）；
+        # 盘口和逐笔成交推送以'tick'事件触发盘口信号检查
+        self.feed = None
+        if self.exchange_name == 'binance':
+            self.feed = BinanceMarketFeed(
+                self.trading_pair,
+                exchange=self.exchange,
+                on_kline=lambda kline, closed: self.events.put(('kline', kline)),
+                on_depth=lambda: self.events.put(('tick', None)),
+                on_trade=lambda trade: self.events.put(('tick', None)),
+                depth_levels=self.order_book_depth
+            )
+            self.book = self.feed.book
+            self.order_book = self.feed.order_book
+            self.trades_buffer = self.feed.trades_buffer
+            self.klines_buffer = self.feed.klines_buffer
+        
+        # 订单/账户推送（Binance用户数据流），断线重连后轮询一次补齐
+        self.user_stream = None
+        self.orders_resync = True
+        if self.exchange_name == 'binance':
+            self.user_stream = BinanceUserDataStream(self.exchange)
+            self.user_stream.add_listener(
+                on_order=lambda order: self.events.put(('order', order)),
+                on_account=self.on_account_update,
+                on_reconnect=self.on_user_stream_reconnect
+            )
+
         logger.info(f"交易机器人初始化完成 - 交易所: {self.exchange_name}, 交易对: {self.trading_pair}, 杠杆: {self.leverage}x")
 
     def get_account_balance(self):
@@ -123,15 +175,14 @@ class BinanceTradingBot:
             raise
 
     def get_historical_data(self, interval='1m', limit=100):
-        """获取历史K线数据"""
+        """获取历史K线数据（有实时行情时直接使用推送缓冲区）"""
         try:
-            klines = self.exchange.fetch_ohlcv(self.trading_pair, interval, limit)
+            if self.feed is not None and interval == self.feed.interval:
+                klines = self.feed.snapshot_klines()[-limit:]
+            else:
+                klines = self.exchange.fetch_ohlcv(self.trading_pair, interval, limit=limit)
             
-            df = pd.DataFrame(klines, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-                'taker_buy_quote', 'ignore'
-            ])
+            df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             
             df['close'] = df['close'].astype(float)
             df['high'] = df['high'].astype(float)
@@ -201,6 +252,8 @@ class BinanceTradingBot:
     def setup_grid(self, current_price: float):
         """设置网格交易水平"""
         try:
+            # 重新布置网格前撤销旧网格的挂单
+            self.cancel_grid_orders()
             self.grid_levels.clear()
             grid_range = self.grid_size * self.grid_spacing / 100
             
@@ -220,27 +273,67 @@ class BinanceTradingBot:
             logger.error(f"设置网格失败: {str(e)}")
 
     def place_grid_orders(self):
-        """放置网格订单"""
+        """放置网格订单（尚未挂单的水平一次批量提交）"""
         try:
-            for level in self.grid_levels:
-                if not level.filled:
-                    order = self.exchange.create_order(
-                        symbol=self.trading_pair,
-                        type='limit',
-                        side=level.side,
-                        amount=level.quantity,
-                        price=level.price
-                    )
-                    level.order_id = order['id']
-                    self.active_orders[str(order['id'])] = {
+            with self.orders_lock:
+                pending = [level for level in self.grid_levels
+                           if not level.filled and not level.placing and str(level.order_id) not in self.active_orders]
+                for level in pending:
+                    level.placing = True
+            if not pending:
+                return
+
+            try:
+                results = self.api.place_orders(self.trading_pair, [
+                    {'side': level.side, 'quantity': level.quantity, 'price': level.price}
+                    for level in pending
+                ])
+            finally:
+                with self.orders_lock:
+                    for level in pending:
+                        level.placing = False
+            for level, result in zip(pending, results):
+                if not result['success']:
+                    logger.error(f"网格订单放置失败: {level.side} @ {level.price}: {result['error']}")
+                    continue
+                order_id = get_order_id(result['order'])
+                level.order_id = order_id
+                with self.orders_lock:
+                    self.active_orders[order_id] = {
                         'price': level.price,
                         'side': level.side,
                         'quantity': level.quantity
                     }
-                    logger.info(f"网格订单放置成功: {level.side} @ {level.price}")
+                    # 成交推送可能早于下单请求返回
+                    filled_early = self.early_fills.pop(order_id, False)
+                logger.info(f"网格订单放置成功: {level.side} @ {level.price}")
+                if filled_early:
+                    self.on_grid_order_filled(order_id)
         except Exception as e:
             logger.error(f"放置网格订单失败: {str(e)}")
 
+    def cancel_grid_orders(self):
+        """撤销全部网格挂单；只移除确认撤销成功的订单，撤销失败的继续跟踪其成交状态"""
+        with self.orders_lock:
+            order_ids = list(self.active_orders)
+        if not order_ids:
+            return
+
+        try:
+            results = self.api.cancel_orders(self.trading_pair, order_ids)
+        except Exception as e:
+            logger.error(f"撤销网格订单失败: {str(e)}")
+            return
+        failed = []
+        with self.orders_lock:
+            for order_id, result in zip(order_ids, results):
+                if result['success']:
+                    self.active_orders.pop(order_id, None)
+                else:
+                    failed.append(order_id)
+                    logger.error(f"撤销网格订单失败 {order_id}: {result['error']}")
+        logger.info(f"网格订单已撤销: {len(order_ids) - len(failed)}/{len(order_ids)}")
+
     def check_scalping_opportunity(self, df) -> Tuple[bool, str]:
         """检查剥头皮交易机会"""
         try:
@@ -307,8 +400,95 @@ class BinanceTradingBot:
         except Exception as e:
             logger.error(f"执行剥头皮交易失败: {str(e)}")
 
+    def on_kline(self, kline: List[float]):
+        """K线推送（交易线程中执行）：重新评估趋势和剥头皮机会"""
+        try:
+            df = self.get_historical_data()
+            if df is None or len(df) < self.trend_ema_slow:
+                return
+            
+            df = self.calculate_indicators(df)
+            if df is None:
+                return
+            
+            # 检查趋势
+            trend = self.check_trend(df)
+            
+            # 检查剥头皮机会（同一根K线只交易一次）
+            scalping_opportunity, scalping_side = self.check_scalping_opportunity(df)
+            
+            if scalping_opportunity and trend != 'SIDEWAYS' and self.last_scalping_kline != kline[0]:
+                self.last_scalping_kline = kline[0]
+                self.execute_scalping_trade(scalping_side)
+            
+            # 更新网格
+            if not self.grid_levels:
+                self.setup_grid(kline[4])
+        except Exception as e:
+            logger.error(f"处理K线推送错误: {str(e)}")
+
+    def next_events(self, timeout: float) -> List[Tuple[str, object]]:
+        """等待并取出队列中的全部事件；积压的K线和盘口推送各只保留最新一条"""
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        latest = {kind: i for i, (kind, _) in enumerate(events) if kind in COALESCED_EVENTS}
+        return [event for i, event in enumerate(events)
+                if event[0] not in COALESCED_EVENTS or latest[event[0]] == i]
+
+    def handle_event(self, kind: str, payload):
+        if kind == 'kline':
+            self.on_kline(payload)
+        elif kind == 'order':
+            self.on_order_update(payload)
+        elif kind == 'tick':
+            self.check_trading_opportunity()
+
     def run(self):
         """运行交易机器人"""
+        if self.feed is None:
+            return self.run_polling()
+        
+        logger.info("交易机器人启动（实时行情）...")
+        last_reset_time = datetime.now().date()
+        self.feed.start()
+        self.user_stream.start()
+        
+        next_check = 0.0
+        try:
+            while True:
+                try:
+                    # 每15秒检查一次每日统计和网格订单状态，其余时间处理推送事件
+                    if time.monotonic() >= next_check:
+                        current_time = datetime.now()
+                        
+                        # 检查是否需要重置每日统计
+                        if current_time.date() != last_reset_time:
+                            self.reset_daily_stats()
+                            last_reset_time = current_time.date()
+                        
+                        # 检查网格订单状态
+                        self.check_grid_orders()
+                        next_check = time.monotonic() + 15
+                    
+                    for kind, payload in self.next_events(max(0.0, next_check - time.monotonic())):
+                        self.handle_event(kind, payload)
+                    
+                except Exception as e:
+                    logger.error(f"运行错误: {str(e)}")
+                    time.sleep(60)
+        finally:
+            self.feed.stop()
+            self.user_stream.stop()
+
+    def run_polling(self):
+        """轮询模式运行交易机器人（无实时行情的交易所）"""
         logger.info("交易机器人启动...")
         last_reset_time = datetime.now().date()
         
@@ -357,28 +537,67 @@ class BinanceTradingBot:
                 time.sleep(60)
 
     def check_grid_orders(self):
-        """检查网格订单状态"""
+        """检查网格订单状态（用户数据流正常时由推送驱动，只在无推送或重连后轮询）"""
+        if self.user_stream is not None and self.user_stream.live and not self.orders_resync:
+            return
         try:
-            for order_id, order_info in list(self.active_orders.items()):
-                order = self.exchange.fetch_order(self.trading_pair, order_id)
-                
-                if order['status'] == 'FILLED':
-                    # 订单已成交，执行对冲订单
-                    self.execute_hedge_order(order_info)
-                    del self.active_orders[order_id]
-                    
-                    # 更新网格水平
-                    for level in self.grid_levels:
-                        if level.order_id == order_id:
-                            level.filled = True
-                            break
-                    
-                    # 放置新的网格订单
-                    self.place_grid_orders()
+            # 先清除标记：轮询期间发生的重连会再次置位
+            self.orders_resync = False
+            for order_id in list(self.active_orders):
+                order = self.exchange.fetch_order(order_id, self.trading_pair)
+                if order['status'] == 'closed' or order['info'].get('status') == 'FILLED':
+                    self.on_grid_order_filled(order_id)
                     
         except Exception as e:
+            self.orders_resync = True
             logger.error(f"检查网格订单状态失败: {str(e)}")
 
+    def on_grid_order_filled(self, order_id: str):
+        """网格订单成交：在锁内更新订单和网格状态，锁外执行对冲订单并补充网格"""
+        with self.orders_lock:
+            order_info = self.active_orders.pop(order_id, None)
+            if order_info is None:
+                return  # 推送和轮询可能报告同一笔成交
+            
+            # 更新网格水平
+            for level in self.grid_levels:
+                if str(level.order_id) == order_id:
+                    level.filled = True
+                    break
+        
+        # 订单已成交，执行对冲订单
+        self.execute_hedge_order(order_info)
+        
+        # 放置新的网格订单
+        self.place_grid_orders()
+
+    def on_order_update(self, order: Dict):
+        """用户数据流订单推送（经事件队列在交易线程中执行）"""
+        if order['symbol'] != self.trading_pair:
+            return
+        with self.orders_lock:
+            if order['id'] not in self.active_orders:
+                if order['status'] == 'FILLED' and order['type'] == 'LIMIT':
+                    self.early_fills[order['id']] = True
+                    if len(self.early_fills) > 100:
+                        self.early_fills.pop(next(iter(self.early_fills)))
+                return
+        if order['status'] == 'FILLED':
+            self.on_grid_order_filled(order['id'])
+        elif order['status'] in ('CANCELED', 'EXPIRED', 'REJECTED'):
+            with self.orders_lock:
+                self.active_orders.pop(order['id'], None)
+            logger.info(f"网格订单已失效: {order['id']} {order['status']}")
+
+    def on_account_update(self, account: Dict):
+        """用户数据流账户推送：更新持仓"""
+        for position in account['positions']:
+            self.account_positions[position['symbol']] = position
+
+    def on_user_stream_reconnect(self):
+        """用户数据流重连：断线期间的订单状态需要轮询一次补齐"""
+        self.orders_resync = True
+
     def execute_hedge_order(self, order_info: Dict):
         """执行对冲订单"""
         try:
@@ -400,15 +619,18 @@ class BinanceTradingBot:
         self.initial_balance = self.get_account_balance()
         logger.info("每日统计数据已重置")
 
-    async def check_trading_opportunity(self, best_bid: float, best_ask: float):
-        """检查交易机会"""
+    def check_trading_opportunity(self):
+        """盘口/逐笔成交推送（交易线程中执行）：综合盘口失衡度、订单流、波动率和动量检查交易机会"""
         try:
-            # 计算市场深度
-            bid_depth = sum(float(bid[1]) for bid in self.order_book['bids'][:self.order_book_depth])
-            ask_depth = sum(float(ask[1]) for ask in self.order_book['asks'][:self.order_book_depth])
+            # 每根K线至多一笔信号交易，并受每日交易次数限制
+            if not self.klines_buffer or self.daily_trades >= self.max_daily_trades:
+                return
+            kline_open = self.klines_buffer[-1][0]
+            if self.last_signal_kline == kline_open:
+                return
             
-            # 计算价格压力
-            price_pressure = (bid_depth - ask_depth) / (bid_depth + ask_depth)
+            # 价格压力：前order_book_depth档的盘口失衡度，由本地订单簿随增量更新维护
+            price_pressure = self.book.imbalance
             
             # 计算订单流
             order_flow = self.calculate_order_flow()
@@ -424,8 +646,9 @@ class BinanceTradingBot:
             
             # 检查交易信号
             if abs(signal) > 0.5:  # 信号阈值
-                side = 'BUY' if signal > 0 else 'SELL'
-                await self.execute_trade(side, best_bid, best_ask)
+                self.last_signal_kline = kline_open
+                self.daily_trades += 1
+                self.execute_scalping_trade('BUY' if signal > 0 else 'SELL')
                 
         except Exception as e:
             logger.error(f"检查交易机会错误: {str(e)}")
@@ -433,12 +656,15 @@ class BinanceTradingBot:
     def calculate_order_flow(self) -> float:
         """计算订单流"""
         try:
-            if len(self.trades_buffer) < 2:
+            # 成交缓冲区由推送线程写入，复制后再计算
+            with self.feed.lock:
+                trades = list(self.trades_buffer)
+            if len(trades) < 2:
                 return 0.0
                 
             # 计算最近交易的买卖压力
-            buy_volume = sum(trade['quantity'] for trade in self.trades_buffer if trade['side'] == 'BUY')
-            sell_volume = sum(trade['quantity'] for trade in self.trades_buffer if trade['side'] == 'SELL')
+            buy_volume = sum(trade['quantity'] for trade in trades if trade['side'] == 'BUY')
+            sell_volume = sum(trade['quantity'] for trade in trades if trade['side'] == 'SELL')
             
             # 计算订单流指标
             order_flow = (buy_volume - sell_volume) / (buy_volume + sell_volume)
@@ -452,11 +678,12 @@ class BinanceTradingBot:
     def calculate_volatility(self) -> float:
         """计算波动率"""
         try:
-            if len(self.klines_buffer) < 20:
+            klines = self.feed.snapshot_klines()
+            if len(klines) < 20:
                 return 0.0
                 
             # 计算价格变化
-            prices = [float(kline[4]) for kline in self.klines_buffer]
+            prices = [float(kline[4]) for kline in klines]
             returns = np.diff(prices) / prices[:-1]
             
             # 计算波动率
@@ -471,11 +698,12 @@ class BinanceTradingBot:
     def calculate_momentum(self) -> float:
         """计算动量"""
         try:
-            if len(self.klines_buffer) < 10:
+            klines = self.feed.snapshot_klines()
+            if len(klines) < 10:
                 return 0.0
                 
             # 计算价格动量
-            prices = [float(kline[4]) for kline in self.klines_buffer]
+            prices = [float(kline[4]) for kline in klines]
             momentum = (prices[-1] - prices[0]) / prices[0]
             
             return momentum
@@ -512,134 +740,6 @@ class BinanceTradingBot:
         except Exception as e:
             logger.error(f"生成信号错误: {str(e)}")
             return 0.0
-            
-    async def execute_trade(self, side: str, bid: float, ask: float):
-        """执行交易"""
-        try:
-            # 检查风险限制
-            if not self.check_risk_limits():
-                return
-                
-            # 计算交易价格和数量
-            price = bid if side == 'BUY' else ask
-            quantity = self.calculate_position_size(price)
-            
-            # 确定交易方向（做多/做空）
-            position_type = 'LONG' if side == 'BUY' else 'SHORT'
-            
-            # 构建订单
-            order = {
-                'symbol': self.trading_pair,
-                'type': 'limit',
-                'side': side,
-                'amount': quantity,
-                'price': price
-            }
-            
-            # 发送订单
-            response = await self.send_order(order)
-            
-            if response and response['status'] == 'FILLED':
-                # 更新持仓
-                self.update_position(side, price, quantity)
-                
-                # 记录交易
-                self.record_trade(side, price, quantity, position_type)
-                
-                # 设置动态止盈止损
-                self.set_dynamic_take_profit_stop_loss(side, price)
-                
-        except Exception as e:
-            logger.error(f"执行交易错误: {str(e)}")
-            
-    def calculate_position_size(self, price: float) -> float:
-        """计算仓位大小"""
-        try:
-            # 获取账户余额
-            balance = self.get_account_balance()
-            
-            # 计算风险金额
-            risk_amount = balance * 0.01  # 风险1%的资金
-            
-            # 计算波动率
-            volatility = self.calculate_volatility()
-            
-            # 根据波动率调整仓位
-            position_size = risk_amount / (price * volatility)
-            
-            # 确保不超过最大仓位
-            position_size = min(position_size, self.quantity)
-            
-            return position_size
-            
-        except Exception as e:
-            logger.error(f"计算仓位大小错误: {str(e)}")
-            return self.quantity
-            
-    def set_dynamic_take_profit_stop_loss(self, side: str, entry_price: float):
-        """设置动态止盈止损"""
-        try:
-            # 计算波动率
-            volatility = self.calculate_volatility()
-            
-            # 根据波动率调整止盈止损比例
-            take_profit_ratio = max(self.min_profit_threshold, volatility * 2)
-            stop_loss_ratio = max(self.min_profit_threshold, volatility)
-            
-            # 计算止盈止损价格
-            if side == 'BUY':
-                take_profit = entry_price * (1 + take_profit_ratio)
-                stop_loss = entry_price * (1 - stop_loss_ratio)
-            else:
-                take_profit = entry_price * (1 - take_profit_ratio)
-                stop_loss = entry_price * (1 + stop_loss_ratio)
-                
-            # 发送止盈止损订单
-            self.executor.submit(
-                self.exchange.create_order,
-                symbol=self.trading_pair,
-                type='TAKE_PROFIT_MARKET',
-                side='SELL' if side == 'BUY' else 'BUY',
-                amount=self.quantity,
-                price=take_profit
-            )
-            
-            self.executor.submit(
-                self.exchange.create_order,
-                symbol=self.trading_pair,
-                type='STOP_MARKET',
-                side='SELL' if side == 'BUY' else 'BUY',
-                amount=self.quantity,
-                price=stop_loss
-            )
-            
-        except Exception as e:
-            logger.error(f"设置动态止盈止损错误: {str(e)}")
-
-    def record_trade(self, side: str, price: float, quantity: float, position_type: str):
-        """记录交易"""
-        try:
-            trade = TradeHistory(
-                exchange='Binance',
-                symbol=self.trading_pair,
-                side=side,
-                position_type=position_type,
-                price=price,
-                quantity=quantity,
-                status='OPEN',
-                strategy=self.strategy,
-                strategy_params=json.dumps({
-                    'leverage': self.leverage,
-                    'stop_loss': self.stop_loss,
-                    'take_profit': self.take_profit
-                })
-            )
-            db.session.add(trade)
-            db.session.commit()
-            logger.info(f"交易记录已保存: {side} {quantity} {self.trading_pair} @ {price}")
-        except Exception as e:
-            logger.error(f"保存交易记录失败: {str(e)}")
-            db.session.rollback()
 
 if __name__ == "__main__":
     bot = BinanceTradingBot()
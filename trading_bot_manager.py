@@ -1,55 +1,289 @@
-from typing import Dict, List
+import fcntl
+import logging
+import os
 import threading
 import time
-import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
-class TradingBotManager:
-    def __init__(self):
-        self.bots: Dict[str, 'TradingBot'] = {}
-        self.lock = threading.Lock()
-        self.logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
 
-    def add_bot(self, bot_id: str, bot: 'TradingBot') -> bool:
-        with self.lock:
-            if bot_id in self.bots:
-                return False
-            self.bots[bot_id] = bot
-            return True
+# load_bots() -> 全部机器人配置（字典，至少包含 id、desired_status、updated_at）
+BotLoader = Callable[[], List[Dict[str, Any]]]
+# save_states({bot_id: {列名: 值}}) 在一个事务中写回运行状态
+StateSaver = Callable[[Dict[int, Dict[str, Any]]], None]
+# set_desired(bot_id, 'RUNNING'/'STOPPED') -> 机器人是否存在
+DesiredSetter = Callable[[int, str], bool]
+# build_bot(config) -> 具有 step() 方法（可选 close()、interval）的机器人对象
+BotFactory = Callable[[Dict[str, Any]], Any]
 
-    def remove_bot(self, bot_id: str) -> bool:
-        with self.lock:
-            if bot_id not in self.bots:
-                return False
-            del self.bots[bot_id]
-            return True
 
-    def get_bot(self, bot_id: str) -> 'TradingBot':
-        return self.bots.get(bot_id)
+class BotWorker:
+    """
+    单个机器人的工作线程
 
-    def get_all_bots(self) -> List['TradingBot']:
-        return list(self.bots.values())
+    循环调用 bot.step()，每次完成后更新心跳；单次异常只记录，
+    连续失败max_errors次后线程退出，由管理器按退避时间重启。
+    慢的交易所请求只会阻塞本线程，不影响其他机器人。
+    """
 
-    def start_bot(self, bot_id: str) -> bool:
-        bot = self.get_bot(bot_id)
-        if not bot:
-            return False
+    def __init__(self, config: Dict[str, Any], build_bot: BotFactory, max_errors: int = 5):
+        self.config = config
+        self.bot_id = config['id']
+        self.build_bot = build_bot
+        self.max_errors = max_errors
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"bot-{self.bot_id}", daemon=True)
+        self.started_at = time.time()
+        self.heartbeat = time.time()
+        self.steps = 0
+        self.consecutive_errors = 0
+        self.last_error: Optional[str] = None
+        self.crashed = False
+        self.stalled = False
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """请求停止，当前step执行完后退出"""
+        self.stop_event.set()
+
+    @property
+    def alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def _run(self):
+        bot = None
         try:
-            bot.start()
-            return True
+            bot = self.build_bot(self.config)
+            interval = getattr(bot, 'interval', 60)
+            logger.info(f"Bot {self.bot_id} started")
+            while not self.stop_event.is_set():
+                try:
+                    bot.step()
+                    self.consecutive_errors = 0
+                except Exception as e:
+                    self.consecutive_errors += 1
+                    self.last_error = str(e)
+                    logger.error(f"Bot {self.bot_id} step failed ({self.consecutive_errors}/{self.max_errors}): {str(e)}")
+                    if self.consecutive_errors >= self.max_errors:
+                        self.crashed = True
+                        return
+                self.steps += 1
+                self.heartbeat = time.time()
+                self.stop_event.wait(interval)
         except Exception as e:
-            self.logger.error(f"Failed to start bot {bot_id}: {str(e)}")
+            self.crashed = True
+            self.last_error = str(e)
+            logger.error(f"Bot {self.bot_id} crashed: {str(e)}")
+        finally:
+            if bot is not None and hasattr(bot, 'close'):
+                try:
+                    bot.close()
+                except Exception as e:
+                    logger.warning(f"Bot {self.bot_id} close failed: {str(e)}")
+            logger.info(f"Bot {self.bot_id} exited")
+
+
+class TradingBotManager:
+    """
+    交易机器人监督器
+
+    机器人的目标状态（desired_status）保存在数据库中，任何进程的接口都只修改目标状态；
+    同一主机上只有持有文件锁的一个进程运行监督循环，避免多个gunicorn worker重复启动机器人，
+    持锁进程退出后由其他进程接管。监督循环按目标状态启动/停止工作线程，
+    配置更新后重启，异常退出后按指数退避重启，并把 RUNNING/STOPPED/ERROR/STALLED、
+    心跳和最近错误写回数据库。
+    """
+
+    def __init__(self, load_bots: BotLoader, save_states: StateSaver, set_desired: DesiredSetter,
+                 build_bot: BotFactory,
+                 lock_path: Optional[str] = None,
+                 interval: Optional[float] = None,
+                 stall_timeout: Optional[float] = None,
+                 max_backoff: float = 300):
+        """
+        Args:
+            lock_path: 监督锁文件（默认读取 BOT_SUPERVISOR_LOCK，缺省 bot_supervisor.lock）
+            interval: 监督循环间隔秒数，同时是心跳写回间隔（默认读取 BOT_SUPERVISOR_INTERVAL，缺省5）
+            stall_timeout: 心跳超过该秒数未更新视为卡住（默认读取 BOT_STALL_TIMEOUT，缺省300）
+            max_backoff: 重启退避的上限秒数
+        """
+        self.load_bots = load_bots
+        self.save_states = save_states
+        self.set_desired = set_desired
+        self.build_bot = build_bot
+        self.lock_path = lock_path or os.getenv('BOT_SUPERVISOR_LOCK', 'bot_supervisor.lock')
+        self.interval = interval or float(os.getenv('BOT_SUPERVISOR_INTERVAL', '5'))
+        self.stall_timeout = stall_timeout or float(os.getenv('BOT_STALL_TIMEOUT', '300'))
+        self.max_backoff = max_backoff
+
+        self.workers: Dict[int, BotWorker] = {}
+        self.restarts: Dict[int, Dict[str, float]] = {}  # bot_id -> {'count', 'next_at'}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.lock_file = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock_file is not None
+
+    def start(self):
+        """启动监督线程（未取得锁时定期重试）"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='bot-supervisor', daemon=True)
+        self.thread.start()
+
+    def start_bot(self, bot_id: int) -> bool:
+        """把机器人目标状态设为运行，由监督循环启动"""
+        if not self.set_desired(bot_id, 'RUNNING'):
             return False
+        self.wakeup.set()
+        return True
 
-    def stop_bot(self, bot_id: str) -> bool:
-        bot = self.get_bot(bot_id)
-        if not bot:
+    def stop_bot(self, bot_id: int) -> bool:
+        """把机器人目标状态设为停止，由监督循环优雅停止"""
+        if not self.set_desired(bot_id, 'STOPPED'):
             return False
-        try:
-            bot.stop()
+        self.wakeup.set()
+        return True
+
+    def _acquire_lock(self) -> bool:
+        if self.lock_file is not None:
             return True
-        except Exception as e:
-            self.logger.error(f"Failed to stop bot {bot_id}: {str(e)}")
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
             return False
+        self.lock_file = lock_file
+        logger.info(f"Bot supervisor acquired {self.lock_path} (pid {os.getpid()})")
+        return True
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                if self._acquire_lock():
+                    self.reconcile()
+            except Exception as e:
+                logger.error(f"Bot supervisor error: {str(e)}")
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+    def reconcile(self):
+        """按数据库中的目标状态调整工作线程，并写回运行状态和心跳"""
+        now = time.time()
+        configs = {config['id']: config for config in self.load_bots()}
+        updates: Dict[int, Dict[str, Any]] = {}
+
+        with self.lock:
+            # 已结束的线程：正常停止或崩溃
+            for bot_id, worker in list(self.workers.items()):
+                if worker.alive:
+                    continue
+                del self.workers[bot_id]
+                if worker.crashed:
+                    restart = self.restarts.setdefault(bot_id, {'count': 0, 'next_at': 0})
+                    restart['count'] += 1
+                    restart['next_at'] = now + min(2 ** restart['count'], self.max_backoff)
+                    updates[bot_id] = {'status': 'ERROR', 'last_error': worker.last_error,
+                                       'restart_count': int(restart['count'])}
+                    logger.warning(f"Bot {bot_id} exited with error, restarting in "
+                                   f"{restart['next_at'] - now:.0f}s")
+                else:
+                    self.restarts.pop(bot_id, None)
+                    updates[bot_id] = {'status': 'STOPPED'}
+
+            # 目标为停止、已删除或配置已修改的机器人：请求停止（配置修改的在线程退出后按新配置启动）
+            for bot_id, worker in self.workers.items():
+                config = configs.get(bot_id)
+                if config is None or config.get('desired_status') != 'RUNNING' \
+                        or config.get('updated_at') != worker.config.get('updated_at'):
+                    worker.stop()
+
+            # 目标为运行且没有线程的机器人：启动（崩溃后等待退避时间）
+            for bot_id, config in configs.items():
+                if config.get('desired_status') != 'RUNNING':
+                    self.restarts.pop(bot_id, None)
+                    if config.get('status') not in ('STOPPED', None) and bot_id not in self.workers:
+                        updates.setdefault(bot_id, {'status': 'STOPPED'})
+                    continue
+                if bot_id in self.workers or now < self.restarts.get(bot_id, {}).get('next_at', 0):
+                    continue
+                worker = BotWorker(config, self.build_bot)
+                worker.start()
+                self.workers[bot_id] = worker
+                updates[bot_id] = {**updates.get(bot_id, {}), 'status': 'RUNNING', 'last_error': None}
+
+            # 心跳：所有运行中的机器人合并为一次写入；超过stall_timeout没有完成step的标记为卡住
+            for bot_id, worker in self.workers.items():
+                if worker.stop_event.is_set():
+                    continue
+                state = updates.setdefault(bot_id, {})
+                state['heartbeat_at'] = datetime.utcfromtimestamp(worker.heartbeat)
+                if now - worker.heartbeat > self.stall_timeout:
+                    state['status'] = 'STALLED'
+                    if not worker.stalled:
+                        worker.stalled = True
+                        logger.warning(f"Bot {bot_id} has not completed a step for {now - worker.heartbeat:.0f}s")
+                else:
+                    worker.stalled = False
+                    state.setdefault('status', 'RUNNING')
+                if worker.last_error:
+                    state['last_error'] = worker.last_error
+
+        if updates:
+            self.save_states(updates)
 
-# 创建全局实例
-trading_bot_manager = TradingBotManager() 
\ No newline at end of file
+    def shutdown(self, timeout: float = 10):
+        """优雅停止：停止监督循环和全部工作线程，写回STOPPED并释放锁（目标状态保持不变）"""
+        self.stop_event.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+        with self.lock:
+            workers = list(self.workers.values())
+            for worker in workers:
+                worker.stop()
+        deadline = time.time() + timeout
+        for worker in workers:
+            worker.thread.join(timeout=max(0.0, deadline - time.time()))
+        if workers:
+            try:
+                self.save_states({worker.bot_id: {'status': 'STOPPED'} for worker in workers})
+            except Exception as e:
+                logger.error(f"Failed to save bot states on shutdown: {str(e)}")
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def get_bot_status(self, bot_id: int) -> Optional[Dict[str, Any]]:
+        """本进程中工作线程的运行信息（非监督进程或未运行时为None）"""
+        with self.lock:
+            worker = self.workers.get(bot_id)
+            if worker is None:
+                return None
+            return {
+                'alive': worker.alive,
+                'steps': worker.steps,
+                'started_at': worker.started_at,
+                'heartbeat_age': time.time() - worker.heartbeat,
+                'consecutive_errors': worker.consecutive_errors,
+                'last_error': worker.last_error
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'leader': self.is_leader,
+                'pid': os.getpid(),
+                'workers': len(self.workers),
+                'restarts': {bot_id: int(r['count']) for bot_id, r in self.restarts.items()}
+            }
@@ -0,0 +1,206 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import websocket
+
+from market_feed import BINANCE_FUTURES_WS_URL
+
+logger = logging.getLogger(__name__)
+
+# listenKey 60分钟无续期即失效，按官方建议每30分钟续期一次
+LISTEN_KEY_KEEPALIVE = 30 * 60
+
+
+class BinanceUserDataStream:
+    """
+    Binance合约用户数据流
+
+    通过listenKey订阅账户推送，将 ORDER_TRADE_UPDATE / ACCOUNT_UPDATE
+    解析后分发给注册的回调，后台线程定期续期listenKey。
+    断线后按指数退避重连；重连成功时调用on_reconnect，
+    订阅方应据此用REST轮询一次，补齐断线期间可能漏掉的订单状态。
+    回调在推送线程中执行。
+    """
+
+    def __init__(self, exchange, ws_url: str = BINANCE_FUTURES_WS_URL,
+                 keepalive_interval: float = LISTEN_KEY_KEEPALIVE):
+        """
+        Args:
+            exchange: ccxt binance 实例（需要API密钥）
+            ws_url: WebSocket根地址
+            keepalive_interval: listenKey续期间隔秒数
+        """
+        self.exchange = exchange
+        self.ws_url = ws_url
+        self.keepalive_interval = keepalive_interval
+
+        self.listen_key: Optional[str] = None
+        self.listeners: List[Dict[str, Callable]] = []
+        self.ws = None
+        self.thread = None
+        self.keepalive_thread = None
+        self.running = False
+        self.connected = threading.Event()
+        self.stop_event = threading.Event()
+        self.stats = {'messages': 0, 'orders': 0, 'accounts': 0, 'reconnects': 0, 'key_renewals': 0}
+
+    @property
+    def live(self) -> bool:
+        """推送连接是否正常，为False时订阅方需要回退到轮询"""
+        return self.running and self.connected.is_set()
+
+    def add_listener(self,
+                     on_order: Optional[Callable[[Dict], None]] = None,
+                     on_account: Optional[Callable[[Dict], None]] = None,
+                     on_reconnect: Optional[Callable[[], None]] = None):
+        """注册回调：订单更新、账户更新、断线重连"""
+        self.listeners.append({'on_order': on_order, 'on_account': on_account, 'on_reconnect': on_reconnect})
+
+    def start(self):
+        """申请listenKey并启动推送线程和续期线程"""
+        if self.running:
+            return
+        self.running = True
+        self.stop_event.clear()
+        self.listen_key = self._create_listen_key()
+        self.thread = threading.Thread(target=self._run, name='user-data-stream', daemon=True)
+        self.thread.start()
+        self.keepalive_thread = threading.Thread(target=self._keepalive_loop, name='user-data-keepalive', daemon=True)
+        self.keepalive_thread.start()
+
+    def stop(self):
+        """停止推送并关闭listenKey"""
+        self.running = False
+        self.stop_event.set()
+        if self.ws is not None:
+            self.ws.close()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        try:
+            self.exchange.fapiPrivateDeleteListenKey()
+        except Exception as e:
+            logger.warning(f"Failed to close listenKey: {str(e)}")
+
+    def _create_listen_key(self) -> str:
+        return self.exchange.fapiPrivatePostListenKey()['listenKey']
+
+    def _renew_listen_key(self):
+        """重新申请listenKey并断开当前连接，由重连逻辑使用新的key"""
+        try:
+            self.listen_key = self._create_listen_key()
+            self.stats['key_renewals'] += 1
+        except Exception as e:
+            logger.error(f"Failed to create listenKey: {str(e)}")
+        if self.ws is not None:
+            self.ws.close()
+
+    def _keepalive_loop(self):
+        while not self.stop_event.wait(self.keepalive_interval):
+            try:
+                self.exchange.fapiPrivatePutListenKey()
+                logger.debug("listenKey kept alive")
+            except Exception as e:
+                logger.warning(f"listenKey keepalive failed, renewing: {str(e)}")
+                self._renew_listen_key()
+
+    def _run(self):
+        backoff = 1
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                f"{self.ws_url}/{self.listen_key}",
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: logger.error(f"User data stream error: {error}"),
+                on_close=lambda ws, code, msg: logger.info(f"User data stream closed: {code} {msg}")
+            )
+            started = time.time()
+            self.ws.run_forever(ping_interval=20, ping_timeout=10)
+            self.connected.clear()
+            if not self.running:
+                break
+
+            # 连接稳定运行过一段时间后重置退避
+            if time.time() - started > 60:
+                backoff = 1
+            self.stats['reconnects'] += 1
+            logger.warning(f"User data stream disconnected, reconnecting in {backoff}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _on_open(self, ws):
+        logger.info("User data stream connected")
+        self.connected.set()
+        if self.stats['reconnects']:
+            self._dispatch('on_reconnect')
+
+    def _on_message(self, ws, message: str):
+        try:
+            data = json.loads(message)
+            event = data.get('e')
+            self.stats['messages'] += 1
+
+            if event == 'ORDER_TRADE_UPDATE':
+                self.stats['orders'] += 1
+                self._dispatch('on_order', self._parse_order(data))
+            elif event == 'ACCOUNT_UPDATE':
+                self.stats['accounts'] += 1
+                self._dispatch('on_account', self._parse_account(data))
+            elif event == 'listenKeyExpired':
+                logger.warning("listenKey expired, renewing")
+                self._renew_listen_key()
+        except Exception as e:
+            logger.error(f"User data stream message error: {str(e)}")
+
+    def _dispatch(self, name: str, *args):
+        for listener in self.listeners:
+            callback = listener.get(name)
+            if callback is None:
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"User data stream {name} callback error: {str(e)}")
+
+    @staticmethod
+    def _parse_order(data: Dict) -> Dict:
+        o = data['o']
+        return {
+            'id': str(o['i']),
+            'client_order_id': o['c'],
+            'symbol': o['s'],
+            'side': o['S'],
+            'type': o['o'],
+            'status': o['X'],           # NEW / PARTIALLY_FILLED / FILLED / CANCELED / EXPIRED ...
+            'execution_type': o['x'],   # NEW / TRADE / CANCELED / EXPIRED ...
+            'price': float(o['p']),
+            'avg_price': float(o['ap']),
+            'quantity': float(o['q']),
+            'filled_quantity': float(o['z']),
+            'last_filled_quantity': float(o['l']),
+            'last_filled_price': float(o['L']),
+            'realized_pnl': float(o.get('rp', 0)),
+            'time': int(data['T'])
+        }
+
+    @staticmethod
+    def _parse_account(data: Dict) -> Dict:
+        a = data['a']
+        return {
+            'reason': a['m'],
+            'balances': [{
+                'asset': b['a'],
+                'wallet_balance': float(b['wb']),
+                'cross_wallet_balance': float(b['cw'])
+            } for b in a.get('B', [])],
+            'positions': [{
+                'symbol': p['s'],
+                'amount': float(p['pa']),
+                'entry_price': float(p['ep']),
+                'unrealized_pnl': float(p['up']),
+                'position_side': p['ps']
+            } for p in a.get('P', [])],
+            'time': int(data['T'])
+        }